@@ -21,7 +21,8 @@ GPL (http://www.gnu.org/licenses/gpl.html).
 
 PLATFORMS: The cube is rendered in 2D using the graphics.py library developed by
 John Zelle as a companion to his book "Python Programming: An Introduction to Computer
-Science" (Franklin, Beedle & Associates).
+Science" (Franklin, Beedle & Associates). The graphics library is only imported when the cube is first drawn,
+so Cube() and Solve() can be used on their own (eg. on a server without a display).
 
 OVERVIEW: There are 4 primary classes in this program: cube(), render(), play(), and solve()
 - cube() provides a 3D coordinate map of the cube and methods that simulate moves upon it:
@@ -87,10 +88,39 @@ OVERVIEW: There are 4 primary classes in this program: cube(), render(), play(),
 #   * initializes 6-sided cube, draws single side specified by user via command line
 
 
+import os
 import random
-import typing
 import datetime
-from graphics1 import *
+import time
+import operator
+import functools
+import heapq
+import collections
+import dbm
+from collections.abc import MutableMapping
+
+
+##########################################################################
+class CubeInvalidError(Exception):
+    # raised when a cube fails validation
+    #   reason - what failed (eg. 'color count', 'repeated cubelet', 'corner twist')
+    #   details - dict of the offending values
+
+    def __init__(self, reason, details):
+        super().__init__(f'Cube Invalid - {reason} - {details}')
+        self.reason = reason
+        self.details = details
+
+
+class SolveAbortedError(Exception):
+    # raised by Solve.move_cube() to end a solve that can not finish - caught by Solve, which reports a failed solve
+    #   reason - what ended the solve ('cycle', 'move budget', 'timeout')
+    #   details - dict describing it
+
+    def __init__(self, reason, details):
+        super().__init__(f'Solve Aborted - {reason} - {details}')
+        self.reason = reason
+        self.details = details
 
 
 ##########################################################################
@@ -103,13 +133,30 @@ class Cube:
     #   find() - returns a list of coordinates that locate requested cubes
     #   reset() - returns the cube to it's original (solved) state
 
+    # slice commands for 3x3 cube
+    SLICE_COMMANDS = (
+        ('l', 'Left'), ('li', 'Left Inverted'),
+        ('m', 'Middle'), ('mi', 'Middle Inverted'),
+        ('r', 'Right'), ('ri', 'Right Inverted'),
+        ('u', 'Up'), ('ui', 'Up Inverted'),
+        ('e', 'Equatorial'), ('ei', 'Equatorial Inverted'),
+        ('d', 'Down'), ('di', 'Down Inverted'),
+        ('f', 'Front'), ('fi', 'Front Inverted'),
+        ('s', 'Standing'), ('si', 'Standing Inverted'),
+        ('b', 'Back'), ('bi', 'Back Inverted'))
+
+    # flat state layout - index i of the state holds the color of square SQUARE_KEYS[i]
+    # (faces in FACES order, then column, then row - eg. 'b00', 'b01', 'b02', 'b10', ...)
+    SQUARE_KEYS = tuple(face + str(column) + str(row) for face in 'budlfr' for column in range(3) for row in range(3))
+    SQUARE_INDEX = {key: i for i, key in enumerate(SQUARE_KEYS)}
+
     def __init__(self):
         # global cube attributes
-        self.squares = {} # current state
-        self.squares_to_render = {} # accumulated moves
-        self.squares_restart = {} # solved
-        self.squares_reset = {}  # scrambled
-        self.squares_buffer = {}
+        self._state = ()  # current state - tuple of indexes into COLORS, laid out as SQUARE_KEYS
+        self.locations = ()  # piece-location index - current state index of each sticker (see locate_stickers)
+        self.squares_dirty = set()  # indexes of squares changed since the last render
+        self.state_restart = ()  # solved
+        self.state_reset = ()  # scrambled
 
         # faces
         self.FACES = {'b': ('Back', {'u': 'd', 'd': 'u', 'l': 'l', 'r': 'r'}),
@@ -122,29 +169,57 @@ class Cube:
         # 3x3 cube attributes (eventually should be instance attributes in inherited class of cube)
         self.squares_per_side = 3
         self.COLORS = ('skyblue1', 'white', 'yellow', 'orange', 'lawn green', 'red')
+        self.color_index = {color: i for i, color in enumerate(self.COLORS)}
 
-        # slice commands for 3x3 cube
-        self.SLICE_COMMANDS = (
-            ('l', 'Left'), ('li', 'Left Inverted'),
-            ('m', 'Middle'), ('mi', 'Middle Inverted'),
-            ('r', 'Right'), ('ri', 'Right Inverted'),
-            ('u', 'Up'), ('ui', 'Up Inverted'),
-            ('e', 'Equatorial'), ('ei', 'Equatorial Inverted'),
-            ('d', 'Down'), ('di', 'Down Inverted'),
-            ('f', 'Front'), ('fi', 'Front Inverted'),
-            ('s', 'Standing'), ('si', 'Standing Inverted'),
-            ('b', 'Back'), ('bi', 'Back Inverted'))
+        # validation - see set_validation()
+        self.validation = 'state'
+        self.validation_interval = 1000
+        self.validation_moves_cnt = 0
 
-        # initialize squares on cube sides
-        for i, side_key in enumerate(self.FACES):
-            for column in range(self.squares_per_side):
-                for row in range(self.squares_per_side):
-                    key = side_key + str(column) + str(row)
-                    self.squares[key] = self.COLORS[i]
+        if not self.MOVES:
+            self.compile_moves()
 
-        self.squares_to_render = self.squares.copy()
-        self.squares_restart = self.squares.copy()
-        self.squares_reset = self.squares.copy()
+        # initialize squares on cube sides
+        self.state = tuple(i for i in range(len(self.FACES)) for _ in range(self.squares_per_side ** 2))
+        self.squares_dirty = set(range(len(self.state)))
+        self.state_restart = self.state
+        self.state_reset = self.state
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        # rebuilds the piece-location index from the colors of the new state, and checks its invariants unless
+        # validation is 'off' - a state that fails is not taken, the CubeInvalidError is raised instead
+        previous = self._state, self.locations
+        self._state = tuple(state)
+        self.locations = self.locate_stickers(self._state)
+        if self.validation != 'off':
+            try:
+                self.check_invariants()
+            except CubeInvalidError:
+                self._state, self.locations = previous
+                raise
+
+    @property
+    def squares(self):
+        # dict-like view of the current state keyed by square - eg. squares['f11']
+        return Squares(self)
+
+    @squares.setter
+    def squares(self, squares):
+        self.state = tuple(self.COLORS.index(squares[key]) for key in self.SQUARE_KEYS)
+
+    @property
+    def squares_to_render(self):
+        # accumulated moves
+        return {self.SQUARE_KEYS[i]: self.COLORS[self.state[i]] for i in self.squares_dirty}
+
+    @squares_to_render.setter
+    def squares_to_render(self, squares):
+        self.squares_dirty = {self.SQUARE_INDEX[key] for key in squares}
 
     def get_faces(self):
         list_of_faces = []
@@ -160,141 +235,166 @@ class Cube:
 
     ######### rotation methods
 
-    def move(self, commands):
-        # executes a list of commands that manipulate the cube and it's perspective to the user
-
-        # two types of actions - slice and turn
-
-        # slices...
-        #   9 base slice moves
-        #       - l (left), m (middle), r (right), u (up), e (equatorial), d (down), f (front), s (standing), b (back)
-        #       - each move turns a row or column of the puzzle in a clockwise direction from the player's perspective
-        #       - if she held the puzzle facing one side and another side parallel to the ground
-        #   9 inversion slice moves - li, mi, ri, ui, ei, di, fi, si, bi
-        #       - target the same squares as the slices, but turn them counter clockwise
-
-        # turns - rotate the entire cube in one of 4 directions
-        #   - tu (turn up), td (turn down), tl (turn left), tr (turn right)
-
-        # plans define how the COLORS will be changed to create the effect of slicing or turning squares on the cube
-        # each plan is a set of pairs for which the squares identified by the second value are replaced
-        # by the squares identified by the first value
-        # some actions require to sets of moves - eg. a left turn requires the squares in the 0 column and left face
-        # to be moved
-
-        # row slice moves - new column positions same as old
-        PLAN_ROW = ('fl', 'lb', 'br', 'rf')
+    # two types of actions - slice and turn
+
+    # slices...
+    #   9 base slice moves
+    #       - l (left), m (middle), r (right), u (up), e (equatorial), d (down), f (front), s (standing), b (back)
+    #       - each move turns a row or column of the puzzle in a clockwise direction from the player's perspective
+    #       - if she held the puzzle facing one side and another side parallel to the ground
+    #   9 inversion slice moves - li, mi, ri, ui, ei, di, fi, si, bi
+    #       - target the same squares as the slices, but turn them counter clockwise
+
+    # turns - rotate the entire cube in one of 4 directions
+    #   - tu (turn up), td (turn down), tl (turn left), tr (turn right)
+
+    # plans define how the COLORS will be changed to create the effect of slicing or turning squares on the cube
+    # each plan is a set of pairs for which the squares identified by the second value are replaced
+    # by the squares identified by the first value
+    # some actions require to sets of moves - eg. a left turn requires the squares in the 0 column and left face
+    # to be moved
+
+    # row slice moves - new column positions same as old
+    PLAN_ROW = ('fl', 'lb', 'br', 'rf')
+
+    # coordinate slice moves - all 12 color swaps are defined
+    PLAN_LEFT = (
+        ('f00', 'd00'), ('f01', 'd01'), ('f02', 'd02'),
+        ('d00', 'b22'), ('d01', 'b21'), ('d02', 'b20'),
+        ('b22', 'u00'), ('b21', 'u01'), ('b20', 'u02'),
+        ('u00', 'f00'), ('u01', 'f01'), ('u02', 'f02'))
+
+    PLAN_MIDDLE = (
+        ('f10', 'd10'), ('f11', 'd11'), ('f12', 'd12'),
+        ('d10', 'b12'), ('d11', 'b11'), ('d12', 'b10'),
+        ('b12', 'u10'), ('b11', 'u11'), ('b10', 'u12'),
+        ('u10', 'f10'), ('u11', 'f11'), ('u12', 'f12'))
+
+    PLAN_RIGHT = (
+        ('f20', 'u20'), ('f21', 'u21'), ('f22', 'u22'),
+        ('u20', 'b02'), ('u21', 'b01'), ('u22', 'b00'),
+        ('b02', 'd20'), ('b01', 'd21'), ('b00', 'd22'),
+        ('d20', 'f20'), ('d21', 'f21'), ('d22', 'f22'))
+
+    PLAN_FRONT = (
+        ('u02', 'r00'), ('u12', 'r01'), ('u22', 'r02'),
+        ('r00', 'd20'), ('r01', 'd10'), ('r02', 'd00'),
+        ('d20', 'l22'), ('d10', 'l21'), ('d00', 'l20'),
+        ('l22', 'u02'), ('l21', 'u12'), ('l20', 'u22'))
+
+    PLAN_STANDING = (
+        ('u01', 'r10'), ('u11', 'r11'), ('u21', 'r12'),
+        ('r10', 'd21'), ('r11', 'd11'), ('r12', 'd01'),
+        ('d21', 'l12'), ('d11', 'l11'), ('d01', 'l10'),
+        ('l12', 'u01'), ('l11', 'u11'), ('l10', 'u21'))
+
+    PLAN_BACK = (
+        ('u00', 'l02'), ('u10', 'l01'), ('u20', 'l00'),
+        ('l00', 'd02'), ('l01', 'd12'), ('l02', 'd22'),
+        ('d02', 'r22'), ('d12', 'r21'), ('d22', 'r20'),
+        ('r22', 'u20'), ('r21', 'u10'), ('r20', 'u00'))
+
+    # face turns
+    PLAN_FACE = (
+        ('00', '20'), ('10', '21'), ('20', '22'),
+        ('01', '10'), ('11', '11'), ('21', '12'),
+        ('02', '00'), ('12', '01'), ('22', '02'))
+
+    # cube rotation plans
+    PLAN_ROTATE_LEFT = ('fl', 'lb', 'br', 'rf')
+    PLAN_ROTATE_UP = ('fu', 'ub*', 'bd*', 'df')
+    PLAN_ROTATE_DOWN = ('uf', 'bu*', 'db*', 'fd')
+    PLAN_ROTATE_BACK = (
+        ('20', '02'), ('10', '12'), ('00', '22'),
+        ('21', '01'), ('11', '11'), ('01', '21'),
+        ('22', '00'), ('12', '10'), ('02', '20'))
+
+    TURN_COMMANDS = ('tl', 'tr', 'tu', 'td')
+
+    # compiled moves - each command is compiled once (see compile_moves) into an index permutation over the flat
+    # state, so that state[i] after the move is state[MOVES[command][i]] before it
+    MOVES = {}
+
+    # stickers - every square of the solved cube is a sticker, identified by the colors of its cubelet and its own
+    # color, and numbered by its index in the solved state
+    STICKERS = {}  # (frozenset of cubelet colors, color): sticker
+    CUBELET_INDEXES = ()  # state indexes of each center, edge and corner cubelet
+
+    # invariants - corner squares listed clockwise from their up/down square, edge squares from their up/down
+    # (or front/back) square; twists and flips are counted along this order
+    CORNER_REFERENCE = (
+        ('u22', 'r00', 'f20'), ('u02', 'f00', 'l20'), ('u00', 'l00', 'b20'), ('u20', 'b00', 'r20'),
+        ('d20', 'f22', 'r02'), ('d00', 'l22', 'f02'), ('d02', 'b22', 'l02'), ('d22', 'r22', 'b02'))
+    EDGE_REFERENCE = (
+        ('u21', 'r10'), ('u12', 'f10'), ('u01', 'l10'), ('u10', 'b10'),
+        ('d21', 'r12'), ('d10', 'f12'), ('d01', 'l12'), ('d12', 'b12'),
+        ('f21', 'r01'), ('f01', 'l21'), ('b21', 'l01'), ('b01', 'r21'))
+    CENTER_REFERENCE = ('u11', 'r11', 'f11', 'd11', 'l11', 'b11')
+
+    ORIENTATION = ()  # state index: position of the square within its reference cubelet
+    POSITION = ()  # state index: number of its reference cubelet
+    CORNER_REFERENCE_STICKERS = ()  # sticker on the first square of each corner
+    EDGE_REFERENCE_STICKERS = ()  # sticker on the first square of each edge
+    CENTER_STICKERS = ()
+
+    VALIDATION_LEVELS = (
+        'off',  # no checks
+        'state',  # check_invariants() when a state is assigned - the compiled moves can not break them
+        'invariants',  # as 'state', plus check_invariants() after each sequence
+        'sampled',  # as 'invariants', plus check_valid() every validation_interval moves
+        'sequence',  # as 'invariants', plus check_valid() after each sequence
+        'full')  # check_invariants() and check_valid() after every single command
+
+    @classmethod
+    def compile_move(cls, command):
+        # returns {key_target: key_source} for a single command, or None if the command is not defined
+        buffer = {}
+        squares_per_side = 3
+
+        def slice_row_inverted(plan, col):
+            slice_row(invert_plan(plan), col)
+
+        def slice_row(plan, row):
+            for change in plan:
+                for col in range(squares_per_side):
+                    add_change(change[0] + str(col) + str(row), change[1] + str(col) + str(row))
 
-        def slice_row_inverted(squares, plan, col):
-            plan_inverted = invert_plan(plan)
-            slice_row(squares, plan_inverted, col)
+        def slice_coordinates_inverted(plan):
+            slice_coordinates(invert_plan(plan))
 
-        def slice_row(squares, plan, row):
-            for change in plan:
-                for col in range(self.squares_per_side):
-                    key_source = change[0] + str(col) + str(row)
-                    key_target = change[1] + str(col) + str(row)
-                    add_change(squares, key_source, key_target)
-
-        # coordinate slice moves - all 12 color swaps are defined
-        PLAN_LEFT = (
-            ('f00', 'd00'), ('f01', 'd01'), ('f02', 'd02'),
-            ('d00', 'b22'), ('d01', 'b21'), ('d02', 'b20'),
-            ('b22', 'u00'), ('b21', 'u01'), ('b20', 'u02'),
-            ('u00', 'f00'), ('u01', 'f01'), ('u02', 'f02'))
-
-        PLAN_MIDDLE = (
-            ('f10', 'd10'), ('f11', 'd11'), ('f12', 'd12'),
-            ('d10', 'b12'), ('d11', 'b11'), ('d12', 'b10'),
-            ('b12', 'u10'), ('b11', 'u11'), ('b10', 'u12'),
-            ('u10', 'f10'), ('u11', 'f11'), ('u12', 'f12'))
-
-        PLAN_RIGHT = (
-            ('f20', 'u20'), ('f21', 'u21'), ('f22', 'u22'),
-            ('u20', 'b02'), ('u21', 'b01'), ('u22', 'b00'),
-            ('b02', 'd20'), ('b01', 'd21'), ('b00', 'd22'),
-            ('d20', 'f20'), ('d21', 'f21'), ('d22', 'f22'))
-
-        PLAN_FRONT = (
-            ('u02', 'r00'), ('u12', 'r01'), ('u22', 'r02'),
-            ('r00', 'd20'), ('r01', 'd10'), ('r02', 'd00'),
-            ('d20', 'l22'), ('d10', 'l21'), ('d00', 'l20'),
-            ('l22', 'u02'), ('l21', 'u12'), ('l20', 'u22'))
-
-        PLAN_STANDING = (
-            ('u01', 'r10'), ('u11', 'r11'), ('u21', 'r12'),
-            ('r10', 'd21'), ('r11', 'd11'), ('r12', 'd01'),
-            ('d21', 'l12'), ('d11', 'l11'), ('d01', 'l10'),
-            ('l12', 'u01'), ('l11', 'u11'), ('l10', 'u21'))
-
-        PLAN_BACK = (
-            ('u00', 'l02'), ('u10', 'l01'), ('u20', 'l00'),
-            ('l00', 'd02'), ('l01', 'd12'), ('l02', 'd22'),
-            ('d02', 'r22'), ('d12', 'r21'), ('d22', 'r20'),
-            ('r22', 'u20'), ('r21', 'u10'), ('r20', 'u00'))
-
-        def slice_coordinates_inverted(squares, plan):
-            plan_inverted = invert_plan(plan)
-            slice_coordinates(squares, plan_inverted)
-
-        def slice_coordinates(squares, plan):
+        def slice_coordinates(plan):
             for change in plan:
-                key_source = change[0]
-                key_target = change[1]
-                add_change(squares, key_source, key_target)
-
-        # face turns
-        PLAN_FACE = (
-            ('00', '20'), ('10', '21'), ('20', '22'),
-            ('01', '10'), ('11', '11'), ('21', '12'),
-            ('02', '00'), ('12', '01'), ('22', '02'))
+                add_change(change[0], change[1])
 
-        def rotate_face_inverted(squares, plan, face):
+        def rotate_face_inverted(plan, face):
             # counter-clockwise
-            plan_inverted = invert_plan(plan)
-            rotate_face(squares, plan_inverted, face)
+            rotate_face(invert_plan(plan), face)
 
-        def rotate_face(squares, plan, face):
+        def rotate_face(plan, face):
             # clockwise
             for change in plan:
-                key_source = face + change[0]
-                key_target = face + change[1]
-                add_change(squares, key_source, key_target)
-
-        # cube rotation functions
-        PLAN_ROTATE_LEFT = ('fl', 'lb', 'br', 'rf')
-        PLAN_ROTATE_UP = ('fu', 'ub*', 'bd*', 'df')
-        PLAN_ROTATE_DOWN = ('uf', 'bu*', 'db*', 'fd')
-        PLAN_ROTATE_BACK = (
-            ('20', '02'), ('10', '12'), ('00', '22'),
-            ('21', '01'), ('11', '11'), ('01', '21'),
-            ('22', '00'), ('12', '10'), ('02', '20'))
-
-        def turn_inverted(squares, plan):
-            plan_inverted = invert_plan(plan)
-            turn(squares, plan_inverted)
-
-        def turn(squares, plan):
+                add_change(face + change[0], face + change[1])
+
+        def turn_inverted(plan):
+            turn(invert_plan(plan))
+
+        def turn(plan):
             for change in plan:
                 face_source = change[0]
                 face_target = change[1]
                 if len(change) == 2:
-                    turn_face(squares, face_source, face_target)
+                    turn_face(face_source, face_target)
                 else:
-                    turn_face_coordinates(squares, face_source, face_target, PLAN_ROTATE_BACK)
+                    turn_face_coordinates(face_source, face_target, cls.PLAN_ROTATE_BACK)
 
-        def turn_face(squares, face_source, face_target):
-            for column in range(self.squares_per_side):
-                for row in range(self.squares_per_side):
-                    key_source = face_source + str(column) + str(row)
-                    key_target = face_target + str(column) + str(row)
-                    add_change(squares, key_source, key_target)
+        def turn_face(face_source, face_target):
+            for column in range(squares_per_side):
+                for row in range(squares_per_side):
+                    add_change(face_source + str(column) + str(row), face_target + str(column) + str(row))
 
-        def turn_face_coordinates(squares, face_source, face_target, plan):
+        def turn_face_coordinates(face_source, face_target, plan):
             for change in plan:
-                key_source = face_source + change[0]
-                key_target = face_target + change[1]
-                add_change(squares, key_source, key_target)
+                add_change(face_source + change[0], face_target + change[1])
 
         def invert_plan(plan):
             plan_inverted = []
@@ -302,93 +402,174 @@ class Cube:
                 plan_inverted.append(item[::-1])
             return plan_inverted
 
-        def add_change(squares, key_source, key_target):
-            color = squares.get(key_source)
-            self.squares_buffer[key_target] = color
-            self.squares_to_render[key_target] = color
+        def add_change(key_source, key_target):
+            # every change reads the squares as they were before the command
+            buffer[key_target] = key_source
+
+        # compile_move()
+        # slices
+        if command == 'l':
+            slice_coordinates(cls.PLAN_LEFT)
+            rotate_face(cls.PLAN_FACE, 'l')
+        elif command == 'li':
+            slice_coordinates_inverted(cls.PLAN_LEFT)
+            rotate_face_inverted(cls.PLAN_FACE, 'l')
+        elif command == 'm':
+            slice_coordinates(cls.PLAN_MIDDLE)
+        elif command == 'mi':
+            slice_coordinates_inverted(cls.PLAN_MIDDLE)
+        elif command == 'r':
+            slice_coordinates(cls.PLAN_RIGHT)
+            rotate_face(cls.PLAN_FACE, 'r')
+        elif command == 'ri':
+            slice_coordinates_inverted(cls.PLAN_RIGHT)
+            rotate_face_inverted(cls.PLAN_FACE, 'r')
+
+        elif command == 'u':
+            slice_row(cls.PLAN_ROW, 0)
+            rotate_face(cls.PLAN_FACE, 'u')
+        elif command == 'ui':
+            slice_row_inverted(cls.PLAN_ROW, 0)
+            rotate_face_inverted(cls.PLAN_FACE, 'u')
+        elif command == 'e':
+            slice_row_inverted(cls.PLAN_ROW, 1)
+        elif command == 'ei':
+            slice_row(cls.PLAN_ROW, 1)
+        elif command == 'd':
+            slice_row_inverted(cls.PLAN_ROW, 2)
+            rotate_face(cls.PLAN_FACE, 'd')
+        elif command == 'di':
+            slice_row(cls.PLAN_ROW, 2)
+            rotate_face_inverted(cls.PLAN_FACE, 'd')
+
+        elif command == 'f':
+            slice_coordinates(cls.PLAN_FRONT)
+            rotate_face(cls.PLAN_FACE, 'f')
+        elif command == 'fi':
+            slice_coordinates_inverted(cls.PLAN_FRONT)
+            rotate_face_inverted(cls.PLAN_FACE, 'f')
+        elif command == 's':
+            slice_coordinates(cls.PLAN_STANDING)
+        elif command == 'si':
+            slice_coordinates_inverted(cls.PLAN_STANDING)
+        elif command == 'b':
+            slice_coordinates(cls.PLAN_BACK)
+            rotate_face(cls.PLAN_FACE, 'b')
+        elif command == 'bi':
+            slice_coordinates_inverted(cls.PLAN_BACK)
+            rotate_face_inverted(cls.PLAN_FACE, 'b')
+
+        # turns
+        elif command == 'tl':
+            turn(cls.PLAN_ROTATE_LEFT)
+            rotate_face(cls.PLAN_FACE, 'u')
+            rotate_face_inverted(cls.PLAN_FACE, 'd')
+        elif command == 'tr':
+            turn_inverted(cls.PLAN_ROTATE_LEFT)
+            rotate_face_inverted(cls.PLAN_FACE, 'u')
+            rotate_face(cls.PLAN_FACE, 'd')
+        elif command == 'tu':
+            turn(cls.PLAN_ROTATE_UP)
+            rotate_face_inverted(cls.PLAN_FACE, 'l')
+            rotate_face(cls.PLAN_FACE, 'r')
+        elif command == 'td':
+            turn(cls.PLAN_ROTATE_DOWN)
+            rotate_face(cls.PLAN_FACE, 'l')
+            rotate_face_inverted(cls.PLAN_FACE, 'r')
 
-        def apply_buffer(squares):
-            for key, color in self.squares_buffer.items():
-                squares[key] = color
-            self.squares_buffer.clear()
-            self.cube_valid()
+        else:
+            return None
 
-        # move()
+        return buffer
+
+    @classmethod
+    def compile_moves(cls):
+        # compiles the 18 slice and 4 turn commands into permutations of the flat state
+        commands = [command[0] for command in cls.SLICE_COMMANDS] + list(cls.TURN_COMMANDS)
+        for command in commands:
+            perm = list(range(len(cls.SQUARE_KEYS)))
+            for key_target, key_source in cls.compile_move(command).items():
+                perm[cls.SQUARE_INDEX[key_target]] = cls.SQUARE_INDEX[key_source]
+            cls.MOVES[command] = tuple(perm)
+
+        cls.CUBELET_INDEXES = tuple(tuple(cls.SQUARE_INDEX[key] for key in cubelet)
+                                    for cubelet in cls.CENTER_CUBELETS + cls.EDGE_CUBELETS + cls.CORNER_CUBELETS)
+        solved = [i // 9 for i in range(len(cls.SQUARE_KEYS))]
+        for cubelet in cls.CUBELET_INDEXES:
+            piece = frozenset(solved[i] for i in cubelet)
+            for i in cubelet:
+                cls.STICKERS[(piece, solved[i])] = i
+
+        orientation = [0] * len(cls.SQUARE_KEYS)
+        position = [0] * len(cls.SQUARE_KEYS)
+        for cubelets in (cls.CORNER_REFERENCE, cls.EDGE_REFERENCE, [[key] for key in cls.CENTER_REFERENCE]):
+            for i, cubelet in enumerate(cubelets):
+                for j, key in enumerate(cubelet):
+                    orientation[cls.SQUARE_INDEX[key]] = j
+                    position[cls.SQUARE_INDEX[key]] = i
+        cls.ORIENTATION = tuple(orientation)
+        cls.POSITION = tuple(position)
+        cls.CORNER_REFERENCE_STICKERS = tuple(cls.SQUARE_INDEX[cubelet[0]] for cubelet in cls.CORNER_REFERENCE)
+        cls.EDGE_REFERENCE_STICKERS = tuple(cls.SQUARE_INDEX[cubelet[0]] for cubelet in cls.EDGE_REFERENCE)
+        cls.CENTER_STICKERS = tuple(cls.SQUARE_INDEX[key] for key in cls.CENTER_REFERENCE)
+
+    SEQUENCE_CACHE_SIZE = 1024  # compiled command sequences kept by compile_sequence
+
+    @classmethod
+    @functools.lru_cache(maxsize=SEQUENCE_CACHE_SIZE)
+    def compile_sequence(cls, commands):
+        # folds a normalized command string (single spaces) into one composed permutation
+        # returns (gather, inverse, changed indexes, undefined commands) - memoized, as Solve replays the same
+        # algorithms
+        composed = tuple(range(len(cls.SQUARE_KEYS)))
+        undefined = []
         for command in commands.split():
-            # slices
-            if command == 'l':
-                slice_coordinates(self.squares, PLAN_LEFT)
-                rotate_face(self.squares, PLAN_FACE, 'l')
-            elif command == 'li':
-                slice_coordinates_inverted(self.squares, PLAN_LEFT)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'l')
-            elif command == 'm':
-                slice_coordinates(self.squares, PLAN_MIDDLE)
-            elif command == 'mi':
-                slice_coordinates_inverted(self.squares, PLAN_MIDDLE)
-            elif command == 'r':
-                slice_coordinates(self.squares, PLAN_RIGHT)
-                rotate_face(self.squares, PLAN_FACE, 'r')
-            elif command == 'ri':
-                slice_coordinates_inverted(self.squares, PLAN_RIGHT)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'r')
-
-            elif command == 'u':
-                slice_row(self.squares, PLAN_ROW, 0)
-                rotate_face(self.squares, PLAN_FACE, 'u')
-            elif command == 'ui':
-                slice_row_inverted(self.squares, PLAN_ROW, 0)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'u')
-            elif command == 'e':
-                slice_row_inverted(self.squares, PLAN_ROW, 1)
-            elif command == 'ei':
-                slice_row(self.squares, PLAN_ROW, 1)
-            elif command == 'd':
-                slice_row_inverted(self.squares, PLAN_ROW, 2)
-                rotate_face(self.squares, PLAN_FACE, 'd')
-            elif command == 'di':
-                slice_row(self.squares, PLAN_ROW, 2)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'd')
-
-            elif command == 'f':
-                slice_coordinates(self.squares, PLAN_FRONT)
-                rotate_face(self.squares, PLAN_FACE, 'f')
-            elif command == 'fi':
-                slice_coordinates_inverted(self.squares, PLAN_FRONT)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'f')
-            elif command == 's':
-                slice_coordinates(self.squares, PLAN_STANDING)
-            elif command == 'si':
-                slice_coordinates_inverted(self.squares, PLAN_STANDING)
-            elif command == 'b':
-                slice_coordinates(self.squares, PLAN_BACK)
-                rotate_face(self.squares, PLAN_FACE, 'b')
-            elif command == 'bi':
-                slice_coordinates_inverted(self.squares, PLAN_BACK)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'b')
-
-            # turns
-            elif command == 'tl':
-                turn(self.squares, PLAN_ROTATE_LEFT)
-                rotate_face(self.squares, PLAN_FACE, 'u')
-                rotate_face_inverted(self.squares, PLAN_FACE, 'd')
-            elif command == 'tr':
-                turn_inverted(self.squares, PLAN_ROTATE_LEFT)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'u')
-                rotate_face(self.squares, PLAN_FACE, 'd')
-            elif command == 'tu':
-                turn(self.squares, PLAN_ROTATE_UP)
-                rotate_face_inverted(self.squares, PLAN_FACE, 'l')
-                rotate_face(self.squares, PLAN_FACE, 'r')
-            elif command == 'td':
-                turn(self.squares, PLAN_ROTATE_DOWN)
-                rotate_face(self.squares, PLAN_FACE, 'l')
-                rotate_face_inverted(self.squares, PLAN_FACE, 'r')
-
+            perm = cls.MOVES.get(command)
+            if perm is None:
+                undefined.append(command)
             else:
-                print('No case defined for command:', command, '\n')
+                composed = tuple(composed[i] for i in perm)
+        changes = frozenset(i for i, source in enumerate(composed) if i != source)
+        inverse = [0] * len(composed)
+        for i, source in enumerate(composed):
+            inverse[source] = i
+        return operator.itemgetter(*composed), tuple(inverse), changes, tuple(undefined)
+
+    def move(self, commands):
+        # executes a list of commands that manipulate the cube and it's perspective to the user
+        commands = ' '.join(commands.split())
+        if commands == '':
+            return
 
-            apply_buffer(self.squares)
+        if self.validation == 'full':
+            # paranoid - validate every single command
+            for command in commands.split():
+                self.apply_sequence(command)
+                self.check_valid()
+                self.check_invariants()
+            return
+
+        self.apply_sequence(commands)
+        if self.validation in ('off', 'state'):
+            return
+        elif self.validation == 'sequence':
+            self.check_valid()
+        elif self.validation == 'sampled':
+            self.validation_moves_cnt += commands.count(' ') + 1
+            if self.validation_moves_cnt >= self.validation_interval:
+                self.validation_moves_cnt = 0
+                self.check_valid()
+        self.check_invariants()
+
+    def apply_sequence(self, commands):
+        gather, inverse, changes, undefined = self.compile_sequence(commands)
+        for command in undefined:
+            print('No case defined for command:', command, '\n')
+        self._state = gather(self._state)
+        if self.locations is not None:
+            # a sticker at index i moves to index inverse[i]
+            self.locations = operator.itemgetter(*self.locations)(inverse)
+        self.squares_dirty |= changes
 
     ######### cube methods - find
     CENTER_CUBELETS = (['l11'], ['f11'], ['r11'], ['u11'], ['b11'], ['d11'])
@@ -406,111 +587,146 @@ class Cube:
 
     def color_in_cubelet(self, cublet, color):
         for key in cublet:
-            if self.squares[key] == color:
+            if self.get_color(key) == color:
                 return True
         return False
 
-    def find_cubelet(self, *colors):
-        # returns cubelet consisting of *COLORS
-
-        def find_cubelet_type(cubelets, *colors):
-
-            def get_cubelet(cublet, *colors):
-
-                def get_cubelet_color_key(cubelet, color):
-                    for key in cubelet:
-                        if self.squares[key] == color:
-                            return key
-                    else:
-                        return False
-
-                # get_cubelet
-                rtn_cubelet = []
-                for color in colors:
-                    key = get_cubelet_color_key(cubelet, color)
-                    if key:
-                        rtn_cubelet.append(key)
-                    else:
-                        return None
-                else:
-                    return rtn_cubelet
-
-            # find_cubelet_type
-            for cubelet in cubelets:
-                target_cubelet = get_cubelet(cubelet, *colors)
-                if target_cubelet:
-                    return target_cubelet
-            else:
+    def locate_stickers(self, state):
+        # returns the state index of each sticker, or None if the colors of the state do not form valid cubelets
+        # a cubelet with a repeated color (eg. white, red, red) has fewer colors than squares, and would otherwise
+        # match the stickers of a smaller cubelet - each sticker must be found exactly once
+        locations = [None] * len(state)
+        for cubelet in self.CUBELET_INDEXES:
+            piece = frozenset(state[i] for i in cubelet)
+            if len(piece) != len(cubelet):
                 return None
+            for i in cubelet:
+                sticker = self.STICKERS.get((piece, state[i]))
+                if sticker is None or locations[sticker] is not None:
+                    return None
+                locations[sticker] = i
+        return tuple(locations)
 
-        # find_cubelet
-        color_cnt = len(colors)
-        if 1 == color_cnt:
-            return find_cubelet_type(self.CENTER_CUBELETS, *colors)
-        elif 2 == color_cnt:
-            return find_cubelet_type(self.EDGE_CUBELETS, *colors)
-        elif 3 == color_cnt:
-            return find_cubelet_type(self.CORNER_CUBELETS, *colors)
-        else:
+    def find_cubelet(self, *colors):
+        # returns cubelet consisting of *COLORS - the keys of its squares, in the order of the requested colors
+        # raises CubeInvalidError if the colors of the cube do not form valid cubelets
+
+        if not 1 <= len(colors) <= 3:
             print('cube.find_cubelet - no case defined for COLORS:', *colors)
             return None
+        if self.locations is None:
+            raise CubeInvalidError('cubelets', {'state': self.state})
 
-    def cube_valid(self):
-        def cube_valid_squares():
+        color_indexes = [self.color_index[color] for color in colors]
+        piece = frozenset(color_indexes)
+        if len(piece) != len(colors):
+            return None
+        rtn_cubelet = []
+        for color in color_indexes:
+            sticker = self.STICKERS.get((piece, color))
+            if sticker is None:
+                return None
+            rtn_cubelet.append(self.SQUARE_KEYS[self.locations[sticker]])
+        return rtn_cubelet
+
+    def check_valid(self):
+        # raises CubeInvalidError if the colors of the squares can not form a cube
+        def check_valid_squares():
             colors = {}
-            for color in self.squares.values():
+            for color in self.state:
                 # build histogram
                 colors[color] = colors.get(color, 0) + 1
             for color, color_cnt in colors.items():
                 if color_cnt != 9:
-                    print(f'Cube Invalid - color {color} - color_count{color_cnt}')
-                    return False
-            #print(f'Cube COLORS are valid')
-            return True
+                    raise CubeInvalidError('color count', {'color': self.COLORS[color], 'color_cnt': color_cnt})
 
-        def cube_valid_type(cubelets):
+        def check_valid_type(cubelets):
             valid_cubelets = {}
             for cubelet in cubelets:
                 colors = []
                 for key in cubelet:
-                    color = self.squares[key]
+                    color = self.get_color(key)
                     if color in colors:
                         colors.append(color)
-                        print('Cube Invalid:', cubelet, colors)
-                        return False
+                        raise CubeInvalidError('repeated color', {'cubelet': tuple(cubelet), 'colors': colors})
                     else:
                         colors.append(color)
 
                 # cubelet
-                #cubelet.sort()
-                key = ''.join(cubelet)
-                colors.sort()
+                key = ''.join(sorted(colors))
                 if key in valid_cubelets:
-                    print(f'Cube Invalid - cubelet {cubelet} - color{colors}')
-                    return False
+                    raise CubeInvalidError('repeated cubelet', {'cubelet': tuple(cubelet), 'colors': colors,
+                                                                'repeats': valid_cubelets[key]})
                 else:
-                    valid_cubelets[key] = colors
-                #print(f'Cublet is valid: {cubelet} - COLORS {COLORS}')
-            return True
+                    valid_cubelets[key] = tuple(cubelet)
 
-        if not cube_valid_squares(): return False
+        check_valid_squares()
+        check_valid_type(self.CENTER_CUBELETS)
+        check_valid_type(self.EDGE_CUBELETS)
+        check_valid_type(self.CORNER_CUBELETS)
 
-        if not cube_valid_type(self.CENTER_CUBELETS): return False
-        if not cube_valid_type(self.EDGE_CUBELETS) : return False
-        if not cube_valid_type(self.CORNER_CUBELETS) : return False
+    def cube_valid(self):
+        try:
+            self.check_valid()
+        except CubeInvalidError:
+            return False
         return True
 
+    def check_invariants(self):
+        # raises CubeInvalidError unless the cube can be reached by turning a solved cube - checked on the sticker
+        # locations, which makes it cheap enough to run after every move
+        # - corner twists sum to 0 (mod 3), edge flips sum to 0 (mod 2)
+        # - the permutation parities of corners, edges and centers cancel out
+        if self.locations is None:
+            raise CubeInvalidError('cubelets', {'state': self.state})
+
+        twist = 0
+        for sticker in self.CORNER_REFERENCE_STICKERS:
+            twist += self.ORIENTATION[self.locations[sticker]]
+        if twist % 3 != 0:
+            raise CubeInvalidError('corner twist', {'twist': twist % 3})
+
+        flip = 0
+        for sticker in self.EDGE_REFERENCE_STICKERS:
+            flip += self.ORIENTATION[self.locations[sticker]]
+        if flip % 2 != 0:
+            raise CubeInvalidError('edge flip', {'flip': flip % 2})
+
+        def parity(stickers):
+            positions = [self.POSITION[self.locations[sticker]] for sticker in stickers]
+            transpositions = 0
+            for i in range(len(positions)):
+                while positions[i] != i:
+                    j = positions[i]
+                    positions[i], positions[j] = positions[j], j
+                    transpositions += 1
+            return transpositions % 2
+
+        corner_parity = parity(self.CORNER_REFERENCE_STICKERS)
+        edge_parity = parity(self.EDGE_REFERENCE_STICKERS)
+        center_parity = parity(self.CENTER_STICKERS)
+        if corner_parity ^ edge_parity ^ center_parity:
+            raise CubeInvalidError('permutation parity', {'corners': corner_parity, 'edges': edge_parity,
+                                                          'centers': center_parity})
+
+    def set_validation(self, level, interval=1000):
+        # level - one of VALIDATION_LEVELS, interval - quarter turns between validations for 'sampled'
+        if level not in self.VALIDATION_LEVELS:
+            raise ValueError(f'cube.set_validation - no case defined for level: {level}')
+        self.validation = level
+        self.validation_interval = interval
+        self.validation_moves_cnt = 0
 
     ######### cube methods - other
     def get_squares_per_side(self):
         return self.squares_per_side
 
     def get_color(self, color_key):
-        return self.squares[color_key]
+        return self.COLORS[self.state[self.SQUARE_INDEX[color_key]]]
 
     def get_render_que(self):
-        squares_temp = self.squares_to_render.copy()
-        self.squares_to_render.clear()
+        squares_temp = self.squares_to_render
+        self.squares_dirty = set()
         return squares_temp
 
     def get_commands_display(self):
@@ -526,32 +742,655 @@ class Cube:
             list.append(command[0])
         return list
 
-    def scramble(self, commands_cnt):
+    def scramble(self, commands_cnt, rng=random):
+        # rng - source of the random commands, eg. a seeded random.Random()
         commands = self.get_commands_execute()
         commands_list = ''
 
         for i in range(commands_cnt):
-            idx = random.randint(0, len(commands) - 1)
+            idx = rng.randint(0, len(commands) - 1)
             if commands_list != '': commands_list += ' '
             commands_list += commands[idx]
 
         self.move(commands_list)
-        self.squares_reset = self.squares.copy()
+        self.state_reset = self.state
         return commands_list
 
     def reset(self):
-        self.squares = self.squares_reset.copy()
-        self.squares_to_render = self.squares_reset.copy()
+        self.state = self.state_reset
+        self.squares_dirty = set(range(len(self.state)))
 
     def restart(self):
-        self.squares = self.squares_restart.copy()
-        self.squares_to_render = self.squares_restart.copy()
+        self.state = self.state_restart
+        self.squares_dirty = set(range(len(self.state)))
+
+
+class Squares(MutableMapping):
+    # dict-like view of a cube's flat state, so squares can still be read and written by key (eg. 'f11')
+
+    def __init__(self, cube):
+        self.cube = cube
+
+    def __getitem__(self, key):
+        return self.cube.COLORS[self.cube.state[self.cube.SQUARE_INDEX[key]]]
+
+    def __setitem__(self, key, color):
+        # goes through the cube's state setter, so the invariants are checked unless validation is 'off' - a single
+        # repainted square never passes them, so repaint a cube square by square with validation 'off'
+        state = list(self.cube.state)
+        state[self.cube.SQUARE_INDEX[key]] = self.cube.COLORS.index(color)
+        self.cube.state = tuple(state)
+        self.cube.squares_dirty.add(self.cube.SQUARE_INDEX[key])
+
+    def __delitem__(self, key):
+        raise TypeError('squares of a cube can not be deleted')
+
+    def __iter__(self):
+        return iter(self.cube.SQUARE_KEYS)
+
+    def __len__(self):
+        return len(self.cube.SQUARE_KEYS)
+
+    def copy(self):
+        return dict(self.items())
+
+##########################################################################
+class SequenceOptimizer:
+
+    #   primary methods
+    #   optimize() - returns a command string with the same effect on the cube, usually much shorter
+    #   sequence_perm() - the permutation of the state performed by a command string
+
+    # one pass over the commands...
+    #   - whole cube turns are folded away - later slices are relabeled to the face they land on, and the net turn
+    #     is appended once at the end
+    #   - consecutive slices about the same axis commute, so they are summed per slice (cancelling inverse pairs,
+    #     merging repeats and reordering opposite faces), and emptied runs let their neighbors merge
+    #   - a finished run that is cheaper as a whole cube turn plus other slices (eg. 'e d' is 'ui' plus a turn)
+    #     is rewritten, and the turn is folded away like any other
+    # the result is the shortest of that, the same pass without rewriting runs, and the commands themselves
+
+    # slices turning about the same axis, in output order
+    AXES = (('l', 'm', 'r'), ('u', 'e', 'd'), ('f', 's', 'b'))
+    AXIS_OF = {slice_: axis for axis, slices in enumerate(AXES) for slice_ in slices}
+
+    ROTATIONS = {}  # perm of each of the 24 cube orientations: shortest turn commands reaching it
+    CONJUGATES = {}  # (rotation perm, slice command): slice command with the same effect, applied before rotation
+    AXIS_ROTATIONS = {}  # axis: [(quarter turns of each slice of the axis, rotation perm), ...]
+
+    @staticmethod
+    def compose(perm_first, perm_second):
+        # the permutation of applying perm_first, then perm_second (see Cube.compile_sequence)
+        return tuple(perm_first[i] for i in perm_second)
+
+    @classmethod
+    def sequence_perm(cls, commands):
+        if not Cube.MOVES:
+            Cube.compile_moves()
+        perm = tuple(range(len(Cube.SQUARE_KEYS)))
+        for command in commands.split():
+            if command not in Cube.MOVES:
+                raise ValueError(f'SequenceOptimizer - undefined command: {command}')
+            perm = cls.compose(perm, Cube.MOVES[command])
+        return perm
+
+    @classmethod
+    def compile(cls):
+        if not Cube.MOVES:
+            Cube.compile_moves()
+
+        # breadth first search of the orientations reachable by turns
+        identity = tuple(range(len(Cube.SQUARE_KEYS)))
+        cls.ROTATIONS[identity] = ()
+        frontier = [identity]
+        while frontier:
+            next_frontier = []
+            for rotation in frontier:
+                for command in Cube.TURN_COMMANDS:
+                    perm = cls.compose(rotation, Cube.MOVES[command])
+                    if perm not in cls.ROTATIONS:
+                        cls.ROTATIONS[perm] = cls.ROTATIONS[rotation] + (command,)
+                        next_frontier.append(perm)
+            frontier = next_frontier
+
+        slice_commands = {Cube.MOVES[command]: command for command, desc in Cube.SLICE_COMMANDS}
+        for rotation in cls.ROTATIONS:
+            inverse = [0] * len(rotation)
+            for i, source in enumerate(rotation):
+                inverse[source] = i
+            for perm, command in slice_commands.items():
+                cls.CONJUGATES[(rotation, command)] = \
+                    slice_commands[cls.compose(cls.compose(rotation, perm), tuple(inverse))]
+
+        for axis, slices in enumerate(cls.AXES):
+            cls.AXIS_ROTATIONS[axis] = []
+            for turns in ((a, b, c) for a in range(1, 4) for b in range(1, 4) for c in range(1, 4)):
+                perm = cls.sequence_perm(' '.join(' '.join([slice_] * cnt) for slice_, cnt in zip(slices, turns)))
+                if perm in cls.ROTATIONS:
+                    cls.AXIS_ROTATIONS[axis].append((turns, perm))
+
+    @staticmethod
+    def turns_cost(turns):
+        # commands needed for a slice turned 0 - 3 quarter turns clockwise ('x', 'x x', 'xi')
+        return (0, 1, 2, 1)[turns]
+
+    @classmethod
+    def reduce_run(cls, run, rotation):
+        # rewrites run as a whole cube turn plus other slices, if that takes fewer commands
+        # returns the rotation in effect after the run
+        axis, counts = run
+        best_cost = sum(cls.turns_cost(turns) for turns in counts.values())
+        best = None
+        for turns, perm in cls.AXIS_ROTATIONS[axis]:
+            reduced = {slice_: (counts.get(slice_, 0) - cnt) % 4 for slice_, cnt in zip(cls.AXES[axis], turns)}
+            cost = sum(cls.turns_cost(cnt) for cnt in reduced.values())
+            if cost < best_cost:
+                best_cost, best = cost, (reduced, perm)
+        if best is None:
+            return rotation
+        reduced, perm = best
+        run[1] = {slice_: cnt for slice_, cnt in reduced.items() if cnt}
+        return cls.compose(perm, rotation)
+
+    @classmethod
+    def optimize(cls, commands, keep_orientation=True):
+        # commands - command string in the Cube.move() vocabulary
+        # keep_orientation - end with the cube held as the original commands leave it (otherwise the final turns
+        # are dropped, and the result only matches the original up to a whole cube turn)
+        if not cls.ROTATIONS:
+            cls.compile()
+
+        runs, rotation = cls.get_runs(commands, True)
+        candidates = [cls.get_commands(runs, rotation)]
+        if runs:
+            # the last run can shed a turn too - worth it when the final turns are dropped, or come out shorter
+            last_run = [runs[-1][0], dict(runs[-1][1])]
+            candidates.append(cls.get_commands(runs[:-1] + [last_run], cls.reduce_run(last_run, rotation)))
+        # taking turns out of runs can cost more than it saves - so the runs as they are, and the commands
+        # themselves, are candidates too, and the result is never longer than the commands
+        candidates.append(cls.get_commands(*cls.get_runs(commands, False)))
+        candidates.append((commands.split(), []))
+        optimized, turns = min(candidates, key=lambda candidate: len(candidate[0]) + len(candidate[1]) *
+                               keep_orientation)
+
+        if cls.sequence_perm(' '.join(optimized + turns)) != cls.sequence_perm(commands):
+            raise ValueError(f'SequenceOptimizer - optimized commands are not equivalent: {commands}')
+        return ' '.join(optimized + turns if keep_orientation else optimized)
+
+    @classmethod
+    def get_runs(cls, commands, reduce_turns):
+        # returns (runs, net turn) - [axis, {slice: quarter turns clockwise}] for each run of slices about one axis
+        # reduce_turns - a finished run that is cheaper as a whole cube turn plus other slices is rewritten
+        rotation = tuple(range(len(Cube.SQUARE_KEYS)))  # net turn of the commands so far, applied after runs
+        runs = []
+        for command in commands.split():
+            if command in Cube.TURN_COMMANDS:
+                rotation = cls.compose(rotation, Cube.MOVES[command])
+                continue
+            if (rotation, command) not in cls.CONJUGATES:
+                raise ValueError(f'SequenceOptimizer - undefined command: {command}')
+
+            relabeled = cls.CONJUGATES[(rotation, command)]
+            if reduce_turns and runs and runs[-1][0] != cls.AXIS_OF[relabeled[0]]:
+                # the last run is finished - a turn taken out of it changes the relabeling (never the axis)
+                rotation = cls.reduce_run(runs[-1], rotation)
+                relabeled = cls.CONJUGATES[(rotation, command)]
+                if not runs[-1][1]:
+                    runs.pop()
+            command = relabeled
+            slice_ = command[0]
+            axis = cls.AXIS_OF[slice_]
+            if not runs or runs[-1][0] != axis:
+                runs.append([axis, {}])
+            counts = runs[-1][1]
+            counts[slice_] = (counts.get(slice_, 0) + (3 if command.endswith('i') else 1)) % 4
+            if not counts[slice_]:
+                del counts[slice_]
+                if not counts:
+                    runs.pop()
+        return runs, rotation
+
+    @classmethod
+    def get_commands(cls, runs, rotation):
+        # returns ([slice commands], [turn commands])
+        commands = []
+        for axis, counts in runs:
+            for slice_ in cls.AXES[axis]:
+                commands += ([], [slice_], [slice_, slice_], [slice_ + 'i'])[counts.get(slice_, 0)]
+        return commands, list(cls.ROTATIONS[rotation])
+
+##########################################################################
+class SolutionCache:
+
+    #   primary methods
+    #   get() - a cached solution for a state, or one of its symmetric states, in the caller's frame
+    #   put() - caches the solution of a state
+    #   close() - closes the disk tier
+
+    # states that differ only by a whole cube turn (and the colors the faces happen to have) share one entry...
+    #   - a state is keyed by its canonical form - the smallest of its 24 turned states (48 with reflections), each
+    #     with the colors renumbered by the centers they match
+    #   - the cached solution solves the canonical state - it is relabeled to the caller's frame on the way out, and
+    #     from it on the way in (see SequenceOptimizer.CONJUGATES)
+    #   - the most recently used entries are kept in memory, and all of them on disk if a path is given
+
+    # reflection through the plane between the left and right faces - each face's columns are mirrored, and l, r
+    # swap places; the reflected command does the same to the reflected cube
+    MIRROR_COMMANDS = {
+        'l': 'ri', 'li': 'r', 'm': 'm', 'mi': 'mi', 'r': 'li', 'ri': 'l',
+        'u': 'ui', 'ui': 'u', 'e': 'ei', 'ei': 'e', 'd': 'di', 'di': 'd',
+        'f': 'fi', 'fi': 'f', 's': 'si', 'si': 's', 'b': 'bi', 'bi': 'b',
+        'tl': 'tr', 'tr': 'tl', 'tu': 'tu', 'td': 'td'}
+    MIRROR = tuple(Cube.SQUARE_INDEX[{'l': 'r', 'r': 'l'}.get(key[0], key[0]) + str(2 - int(key[1])) + key[2]]
+                   for key in Cube.SQUARE_KEYS)
+    CENTERS = tuple(Cube.SQUARE_INDEX[face + '11'] for face in 'budlfr')
+
+    def __init__(self, max_size=10000, path=None, reflections=False):
+        # max_size - entries kept in memory, path - dbm file of the disk tier (None for memory only)
+        # reflections - also match mirror images of cached states
+        if not SequenceOptimizer.ROTATIONS:
+            SequenceOptimizer.compile()
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()  # canonical state: solution, least recently used first
+        self.disk = dbm.open(path, 'c') if path is not None else None
+        self.hits_cnt = 0
+        self.misses_cnt = 0
+
+        # (state getter, rotation, mirrored) of each symmetry - the turned (then mirrored) state is the state after
+        # the turn commands of the rotation (then reflected)
+        self.symmetries = []
+        for rotation in SequenceOptimizer.ROTATIONS:
+            self.symmetries.append((operator.itemgetter(*rotation), rotation, False))
+            if reflections:
+                self.symmetries.append(
+                    (operator.itemgetter(*SequenceOptimizer.compose(rotation, self.MIRROR)), rotation, True))
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+    def canonical(self, state):
+        # returns (canonical state as bytes, rotation, mirrored) - the symmetry that turns state into it
+        best = None
+        labels = bytearray(256)
+        for getter, rotation, mirrored in self.symmetries:
+            turned = getter(state)
+            for face, center in enumerate(self.CENTERS):
+                labels[turned[center]] = face
+            key = bytes(turned).translate(labels)
+            if best is None or key < best[0]:
+                best = key, rotation, mirrored
+        return best
+
+    @classmethod
+    def relabel(cls, commands, rotation):
+        # returns commands with the same effect as the turn commands of rotation followed by commands, with the
+        # turns moved to the end
+        relabeled = []
+        for command in commands.split():
+            if command in Cube.TURN_COMMANDS:
+                rotation = SequenceOptimizer.compose(rotation, Cube.MOVES[command])
+            else:
+                relabeled.append(SequenceOptimizer.CONJUGATES[(rotation, command)])
+        return ' '.join(relabeled + list(SequenceOptimizer.ROTATIONS[rotation]))
+
+    @classmethod
+    def mirror(cls, commands):
+        return ' '.join(cls.MIRROR_COMMANDS[command] for command in commands.split())
+
+    @staticmethod
+    def invert(rotation):
+        inverse = [0] * len(rotation)
+        for i, source in enumerate(rotation):
+            inverse[source] = i
+        return tuple(inverse)
+
+    def get(self, state):
+        # returns commands that solve state, or None if neither it nor a symmetric state is cached
+        key, rotation, mirrored = self.canonical(state)
+        commands = self.entries.get(key)
+        if commands is not None:
+            self.entries.move_to_end(key)
+        elif self.disk is not None and key in self.disk:
+            commands = self.disk[key].decode()
+            self.store(key, commands)
+        if commands is None:
+            self.misses_cnt += 1
+            return None
+        self.hits_cnt += 1
+        # the canonical state is the caller's state after the turns (and reflection)
+        return self.relabel(self.mirror(commands) if mirrored else commands, rotation)
+
+    def put(self, state, commands):
+        key, rotation, mirrored = self.canonical(state)
+        # solve the turned state - undo the turns, then the caller's solution
+        commands = self.relabel(commands, self.invert(rotation))
+        commands = self.mirror(commands) if mirrored else commands
+        self.store(key, commands)
+        if self.disk is not None:
+            self.disk[key] = commands.encode()
+
+    def store(self, key, commands):
+        self.entries[key] = commands
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+##########################################################################
+class CubeFrame:
+
+    #   primary methods
+    #   move() - executes commands given in the frame, returns the commands executed on the cube
+    #   get_color(), find_cubelet(), state - the cube as seen from the frame
+
+    # a view of a cube held in another orientation - whole cube turns only change the orientation of the frame,
+    # and slices are relabeled to the face they are on in the cube's own orientation before they are executed
+    # (see SequenceOptimizer.CONJUGATES), so the cube itself is never turned
+    # the frame's state is the cube's state after the turn commands of its orientation
+
+    # compiled orientations, numbered (0 is the cube's own) - for each...
+    ROTATIONS = []  # perm of the orientation (see SequenceOptimizer.ROTATIONS)
+    KEYS = []  # (square key in the frame: square key on the cube, the reverse)
+    COMMANDS = []  # slice command: slice command on the cube, turn command: orientation number after it
+
+    def __init__(self, cube, virtual_turns=True):
+        # virtual_turns - False executes turns on the cube like any other command (the frame never rotates)
+        if not self.ROTATIONS:
+            self.compile()
+        self.cube = cube
+        self.virtual_turns = virtual_turns
+        self.orientation = 0
+        self.keys, self.keys_reverse = self.KEYS[0]
+
+    @classmethod
+    def compile(cls):
+        if not SequenceOptimizer.ROTATIONS:
+            SequenceOptimizer.compile()
+        # SequenceOptimizer.ROTATIONS starts with the identity
+        rotations = list(SequenceOptimizer.ROTATIONS)
+        numbers = {rotation: i for i, rotation in enumerate(rotations)}
+        for rotation in rotations:
+            keys = {key: Cube.SQUARE_KEYS[rotation[i]] for i, key in enumerate(Cube.SQUARE_KEYS)}
+            commands = {command: SequenceOptimizer.CONJUGATES[(rotation, command)]
+                        for command, desc in Cube.SLICE_COMMANDS}
+            for command in Cube.TURN_COMMANDS:
+                commands[command] = numbers[SequenceOptimizer.compose(rotation, Cube.MOVES[command])]
+            cls.KEYS.append((keys, {cube_key: key for key, cube_key in keys.items()}))
+            cls.COMMANDS.append(commands)
+        cls.ROTATIONS.extend(rotations)
+
+    @property
+    def state(self):
+        return operator.itemgetter(*self.ROTATIONS[self.orientation])(self.cube.state)
+
+    def get_color(self, color_key):
+        return self.cube.get_color(self.keys[color_key])
+
+    def find_cubelet(self, *colors):
+        cubelet = self.cube.find_cubelet(*colors)
+        return None if cubelet is None else [self.keys_reverse[key] for key in cubelet]
+
+    def move(self, commands):
+        if not self.virtual_turns:
+            self.cube.move(commands)
+            return commands
+
+        cube_commands = []
+        for command in commands.split():
+            if command in Cube.TURN_COMMANDS:
+                self.orientation = self.COMMANDS[self.orientation][command]
+            else:
+                cube_commands.append(self.COMMANDS[self.orientation][command])
+        self.keys, self.keys_reverse = self.KEYS[self.orientation]
+        cube_commands = ' '.join(cube_commands)
+        self.cube.move(cube_commands)
+        return cube_commands
+
+##########################################################################
+class LastLayer:
+
+    #   primary methods
+    #   orient() - commands that orient the top layer of a cube whose first two layers are solved
+    #   permute() - commands that then solve the top layer
+    #   compile() - builds the case tables
+
+    # two look last layer - each look indexes the top layer into a case table, whose entry holds all the commands
+    # of the case - turns of the top face (AUF) and algorithms - so each look is one lookup and one move
+    #   orient table - keyed by which top layer squares show the top color (216 cases)
+    #   permute table - keyed by the side each top layer side square belongs on (288 cases, with the final AUF)
+    # the tables are searched once, cheapest (in commands) first, from the solved top layer backwards through
+    # ALGORITHMS - each also inverted, mirrored (see SolutionCache) and performed from each side of the cube
+
+    # algorithms that only change the top layer
+    ALGORITHMS = (
+        'ri ui fi u f r', 'f r u ri ui fi', 'f u r ui ri fi',  # edge orientation
+        'r u ri u r u u ri', 'r u u ri ui r ui ri',  # sune, anti sune
+        'r u u ri ui r u ri ui r ui ri', 'r u u r r ui r r ui r r u u r', 'r r d ri u u r di ri u u ri',
+        'ri f ri b b r fi ri b b r r', 'f f u l ri f f li r u f f', 'r ui r u r u r ui ri ui r r',  # A, U perms
+        'r u ri ui ri f r r ui ri ui r u ri fi', 'r u ri fi r u ri ui ri f r r ui ri',  # T, J perms
+        'f r ui ri ui r u ri fi r u ri ui ri f r fi', 'm m u m m u u m m u m m')  # Y, H perms
+    AUF = ('', 'u', 'ui', 'u u')
+
+    SQUARES = tuple(key for key in Cube.SQUARE_KEYS if key[0] == 'u' or key[0] in 'frbl' and key[2] == '0')
+    SIDE_SQUARES = tuple(key for key in SQUARES if key[0] != 'u')
+
+    ORIENT_TABLE = {}  # (top color on each of SQUARES): commands
+    PERMUTE_TABLE = {}  # (face of each of SIDE_SQUARES): commands
+
+    @staticmethod
+    def invert_commands(commands):
+        return ' '.join(command[:-1] if command.endswith('i') else command + 'i'
+                        for command in reversed(commands.split()))
+
+    @classmethod
+    def compile(cls):
+        if not SequenceOptimizer.ROTATIONS:
+            SequenceOptimizer.compile()
+
+        # every version of the algorithms, by the permutation of the top layer they make
+        side_rotations = [rotation for rotation, turns in SequenceOptimizer.ROTATIONS.items()
+                          if set(turns) <= {'tl', 'tr'}]
+        index = {Cube.SQUARE_INDEX[key]: i for i, key in enumerate(cls.SQUARES)}
+        algorithms = {}
+        for algorithm in cls.ALGORITHMS:
+            mirrored = SolutionCache.mirror(algorithm)
+            for version in (algorithm, cls.invert_commands(algorithm), mirrored, cls.invert_commands(mirrored)):
+                for rotation in side_rotations:
+                    commands = ' '.join(SequenceOptimizer.CONJUGATES[(rotation, command)]
+                                        for command in version.split())
+                    perm = SequenceOptimizer.sequence_perm(commands)
+                    if any(perm[i] != i for i in range(len(perm)) if i not in index):
+                        raise ValueError(f'LastLayer - algorithm changes the first two layers: {algorithm}')
+                    perm = tuple(index[perm[Cube.SQUARE_INDEX[key]]] for key in cls.SQUARES)
+                    if perm not in algorithms or len(commands.split()) < len(algorithms[perm].split()):
+                        algorithms[perm] = commands
+
+        moves = []  # (commands, permutation of SQUARES)
+        for auf in cls.AUF:
+            for algorithm in algorithms.values():
+                commands = (auf + ' ' + algorithm).strip()
+                perm = SequenceOptimizer.sequence_perm(commands)
+                moves.append((commands, tuple(index[perm[Cube.SQUARE_INDEX[key]]] for key in cls.SQUARES)))
+
+        # the solved top layer, with each square labeled by its face
+        labels = tuple('budlfr'.index(key[0]) for key in cls.SQUARES)
+        oriented = tuple(key[0] == 'u' for key in cls.SQUARES)
+        cls.ORIENT_TABLE.update(cls.search(oriented, moves))
+
+        # the permute table only uses moves that keep the top layer oriented, and ends with the top face turns
+        keep_oriented = [move for move in moves if operator.itemgetter(*move[1])(oriented) == oriented]
+        for auf in cls.AUF[1:]:
+            perm = SequenceOptimizer.sequence_perm(auf)
+            keep_oriented.append((auf, tuple(index[perm[Cube.SQUARE_INDEX[key]]] for key in cls.SQUARES)))
+        sides = [cls.SQUARES.index(key) for key in cls.SIDE_SQUARES]
+        for case, commands in cls.search(labels, keep_oriented).items():
+            cls.PERMUTE_TABLE[tuple(case[i] for i in sides)] = commands
+
+    @staticmethod
+    def search(goal, moves):
+        # returns {case: commands} for every case the moves reach from goal - the cheapest commands that take the
+        # case to goal (cheapest first search, backwards)
+        # moves - (commands, perm) - the square at i after the commands was at perm[i] before
+        backwards = []
+        for commands, perm in moves:
+            inverse = [0] * len(perm)
+            for i, source in enumerate(perm):
+                inverse[source] = i
+            backwards.append((commands, len(commands.split()), operator.itemgetter(*inverse)))
+
+        costs = {goal: 0}
+        solutions = {goal: ''}
+        heap = [(0, goal)]
+        while heap:
+            cost, case = heapq.heappop(heap)
+            if cost > costs[case]:
+                continue
+            for commands, commands_cnt, move_back in backwards:
+                previous = move_back(case)
+                if cost + commands_cnt < costs.get(previous, cost + commands_cnt + 1):
+                    costs[previous] = cost + commands_cnt
+                    solutions[previous] = (commands + ' ' + solutions[case]).strip()
+                    heapq.heappush(heap, (cost + commands_cnt, previous))
+        return solutions
+
+    @classmethod
+    def orient(cls, cube):
+        # cube - a Cube or CubeFrame with its first two layers solved
+        # returns the commands that orient its top layer, or None if the top layer is not a case of the table
+        if not cls.ORIENT_TABLE:
+            cls.compile()
+        top_color = cube.get_color('u11')
+        return cls.ORIENT_TABLE.get(tuple(cube.get_color(key) == top_color for key in cls.SQUARES))
+
+    @classmethod
+    def permute(cls, cube):
+        # cube - a Cube or CubeFrame with its first two layers solved and its top layer oriented
+        # returns the commands that solve its top layer, or None if the top layer is not a case of the table
+        if not cls.PERMUTE_TABLE:
+            cls.compile()
+        faces = {cube.get_color(face + '11'): 'budlfr'.index(face) for face in 'frbl'}
+        return cls.PERMUTE_TABLE.get(tuple(faces.get(cube.get_color(key)) for key in cls.SIDE_SQUARES))
+
+##########################################################################
+class FirstTwoLayers:
+
+    #   primary methods
+    #   insert() - commands that solve the front right pair of a cube whose down face edges (the cross) are solved
+    #   extract() - commands that move a pair's pieces out of the other slots
+    #   compile() - builds the case table and the extractions
+
+    # a pair is the down layer corner and middle layer edge of a slot - the case table is keyed by where the front
+    # right pair's squares are, with both pieces in the up layer or the front right slot (150 cases), and holds the
+    # cheapest commands that insert the pair - a search from the solved pair backwards through top face turns and
+    # TRIGGERS, which only move the up layer and the front right slot
+    # the other slots are solved through a CubeFrame turned to put them front right
+    # a piece in another slot is moved out with a top face turn and a trigger, chosen so that the corner and edge
+    # the trigger brings into that slot are last layer pieces or the slot's own - never pieces of another pair
+
+    CORNER = ('d20', 'f22', 'r02')  # front right corner, squares listed by face d, f, r
+    EDGE = ('f21', 'r01')  # front right edge, squares listed by face f, r
+    TRIGGERS = ('r u ri', 'r ui ri', 'r u u ri', 'fi u f', 'fi ui f', 'fi u u f')
+    AUF = ('u', 'ui', 'u u')
+    SLOT_TURNS = ('', 'tl', 'tl tl', 'tr')  # turns bringing each slot front right
+    SQUARES = tuple(key for key in Cube.SQUARE_KEYS if key[0] == 'd' or key[0] in 'frbl' and key[2] != '0')
+
+    TABLE = {}  # (corner squares, edge squares): commands
+    EXTRACTIONS = []  # (commands, squares of the up layer corner and edge they bring into the slot), cheapest first
+
+    @classmethod
+    def compile(cls):
+        if not Cube.MOVES:
+            Cube.compile_moves()
+        moves = []
+        for commands in cls.AUF + cls.TRIGGERS:
+            perm = SequenceOptimizer.sequence_perm(commands)
+            for key in Cube.SQUARE_KEYS:
+                up_layer = key[0] == 'u' or key[2] == '0' and key[0] != 'd'
+                if not up_layer and key not in cls.CORNER + cls.EDGE and \
+                        perm[Cube.SQUARE_INDEX[key]] != Cube.SQUARE_INDEX[key]:
+                    raise ValueError(f'FirstTwoLayers - trigger changes the other slots: {commands}')
+            # the square at i after the commands was at perm[i] before
+            moves.append((commands, len(commands.split()), perm))
+
+        # every up layer corner and edge can be brought into the slot together (16 pairs of positions)
+        extractions = {}
+        for auf in ('',) + cls.AUF:
+            for trigger in cls.TRIGGERS:
+                commands = (auf + ' ' + trigger).strip()
+                perm = SequenceOptimizer.sequence_perm(commands)
+                corner, edge = (tuple(Cube.SQUARE_KEYS[perm[Cube.SQUARE_INDEX[key]]] for key in keys)
+                                for keys in (cls.CORNER, cls.EDGE))
+                positions = frozenset(corner), frozenset(edge)
+                if positions not in extractions or \
+                        len(commands.split()) < len(extractions[positions][0].split()):
+                    extractions[positions] = commands, corner, edge
+        if len(extractions) != 16:
+            raise ValueError('FirstTwoLayers - extractions do not reach every up layer corner and edge')
+        cls.EXTRACTIONS = sorted(extractions.values(), key=lambda extraction: len(extraction[0].split()))
+
+        goal = tuple(Cube.SQUARE_INDEX[key] for key in cls.CORNER + cls.EDGE)
+        costs = {goal: 0}
+        table = {goal: ''}
+        heap = [(0, goal)]
+        while heap:
+            cost, case = heapq.heappop(heap)
+            if cost > costs[case]:
+                continue
+            for commands, commands_cnt, perm in moves:
+                previous = tuple(perm[i] for i in case)
+                if cost + commands_cnt < costs.get(previous, cost + commands_cnt + 1):
+                    costs[previous] = cost + commands_cnt
+                    table[previous] = (commands + ' ' + table[case]).strip()
+                    heapq.heappush(heap, (cost + commands_cnt, previous))
+        # keyed by square keys
+        cls.TABLE = {(tuple(Cube.SQUARE_KEYS[i] for i in case[:3]), tuple(Cube.SQUARE_KEYS[i] for i in case[3:])):
+                     commands for case, commands in table.items()}
+
+    @classmethod
+    def get_pair(cls, cube):
+        # squares of the front right pair of a Cube or CubeFrame - the corner's (by face d, f, r), then the edge's
+        down, front, right = (cube.get_color(face + '11') for face in 'dfr')
+        return tuple(cube.find_cubelet(down, front, right)), tuple(cube.find_cubelet(front, right))
+
+    @classmethod
+    def insert(cls, cube):
+        # returns the commands that solve the front right pair ('' if solved), or None if a piece of the pair is in
+        # another slot
+        if not cls.TABLE:
+            cls.compile()
+        return cls.TABLE.get(cls.get_pair(cube))
+
+    @classmethod
+    def extract(cls, cube):
+        # returns commands that move a piece of the front right pair out of the other slot it is in, or None
+        # the slot's corner and edge go to the up layer, and it gets up layer pieces that belong to no other pair - so
+        # each extraction leaves one piece fewer in a slot of another pair, and insertions never add one: 4 pairs
+        # and 8 pieces bound the passes of Solve.step2 to 12
+        if not cls.TABLE:
+            cls.compile()
+        corner, edge = cls.get_pair(cube)
+        for turns in cls.SLOT_TURNS[1:]:
+            slot = CubeFrame(cube)
+            slot.move(turns)
+            slot_corner, slot_edge = (set(slot.keys_reverse[key] for key in keys) for keys in (corner, edge))
+            if slot_corner == set(cls.CORNER) or slot_edge == set(cls.EDGE):
+                up = slot.get_color('u11')
+                for commands, corner_keys, edge_keys in cls.EXTRACTIONS:
+                    if all(up in colors or colors == own for colors, own in (
+                            ({slot.get_color(key) for key in corner_keys},
+                             {slot.get_color(key[0] + '11') for key in cls.CORNER}),
+                            ({slot.get_color(key) for key in edge_keys},
+                             {slot.get_color(key[0] + '11') for key in cls.EDGE}))):
+                        return turns + ' ' + commands
+        return None
 
 ##########################################################################
 class Render:
 
     def __init__(self, cube, drawing_on=True):
-        self.win = GraphWin
+        self.win = None
+        self.graphics = None  # graphics backend, imported when the window is first drawn
         self.win_w = 0
         self.win_h = 0
         self.render_on = drawing_on
@@ -612,7 +1451,7 @@ class Render:
         return win_w, win_h
 
     def init_win(self, display_map, w, h):
-        self.win = GraphWin("Rubik's Cube Solver", w, h)
+        self.win = self.graphics.GraphWin("Rubik's Cube Solver", w, h)
 
         # add label of side to each face
         for element in display_map.values():
@@ -620,7 +1459,7 @@ class Render:
             y = element[3]
             label_txt = element[4]
 
-            label = Text(Point(x, y), label_txt)
+            label = self.graphics.Text(self.graphics.Point(x, y), label_txt)
             label.setSize(20)
             label.setStyle('normal')
             label.draw(self.win)
@@ -648,7 +1487,7 @@ class Render:
             px2 = x_start + square_size - outer_border
             py2 = y_start + square_size - outer_border
 
-            sqr_outer = Rectangle(Point(px1, py1), Point(px2, py2))
+            sqr_outer = self.graphics.Rectangle(self.graphics.Point(px1, py1), self.graphics.Point(px2, py2))
             sqr_outer.setFill('black')
             sqr_outer.draw(self.win)
 
@@ -658,14 +1497,14 @@ class Render:
 
             px2 = px2 - inner_border
             py2 = py2 - inner_border
-            sqr_inner = Rectangle(Point(px1, py1), Point(px2, py2))
+            sqr_inner = self.graphics.Rectangle(self.graphics.Point(px1, py1), self.graphics.Point(px2, py2))
             sqr_inner.setFill(color)
             sqr_inner.draw(self.win)
 
             # coordinate label
-            center = Point(x_start + square_size / 2, y_start + square_size / 2)
+            center = self.graphics.Point(x_start + square_size / 2, y_start + square_size / 2)
             coordinate = str(column) + ',' + str(row)
-            label = Text(center, coordinate)
+            label = self.graphics.Text(center, coordinate)
             label.draw(self.win)
 
             element = [px1, py1, sqr_outer, sqr_inner, label]
@@ -674,6 +1513,10 @@ class Render:
 
     def init_draw(self, cube):
         # init_draw
+        # graphics1 (and Tk) is only needed once something is drawn, so a headless cube or solver never imports it
+        import graphics1
+        self.graphics = graphics1
+
         self.init_win(self.display_map, self.win_w, self.win_h)
         self.init_squares(cube, self.display_map, self.cube_map, self.square_size)
 
@@ -697,7 +1540,7 @@ class Render:
             self.win.close()
 
 ##########################################################################
-def play(cube, render):
+def play(cube, render, solve):
     commands_list = cube.get_commands_display()
     COMMANDS_TURN = (('tl', 'left'), ('tr', 'right'), ('tu', 'up'), ('td', 'down'))
     COMMANDS_OTHER = (('sc', 'scramble'), ('reset', 'reset'), ('so', 'solve'), ('restart', 'restart'), ('v', 'valid'), ('t', 'test'), ('q', 'quit'), ('h', 'help'))
@@ -736,9 +1579,14 @@ def play(cube, render):
             elif inp == 'q':
                 exit()
             elif inp == 'v':
-                print('Cube Is Valid:', cube.cube_valid())
+                try:
+                    cube.check_valid()
+                    cube.check_invariants()
+                    print('Cube Is Valid: True')
+                except CubeInvalidError as error:
+                    print('Cube Is Valid: False -', error)
             elif inp == 't':
-                test(50, False)
+                test(cube, render, solve, 50, False)
             else:
                 cube.move(inp)
                 render.draw(cube)
@@ -747,83 +1595,359 @@ def play(cube, render):
     help()
     command_line(cube)
 
+##########################################################################
+class SolveProfiler:
+    # per step counters for Solve.process_step() - see Solve.set_profiling()
+    # while attached, the cube's move, find_cubelet, get_color and check_valid methods are wrapped with counters;
+    # while detached the cube runs its plain methods, so profiling costs nothing when it is off
+    # cube_turns counts the whole cube turns of the steps - with virtual turns (see Solve.set_virtual_turns) they only
+    # turn the CubeFrame and never reach the cube, so Solve.move_cube hands them to frame_move()
+
+    COUNTERS = ('quarter_turns', 'cube_turns', 'find_cubelet', 'get_color', 'cube_valid')
+    METRICS = ('seconds',) + COUNTERS
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.counts_start = {}
+        self.solve_report = {}
+        self.reports = []  # report of each solve since the profiler was created
+
+    def attach(self):
+        cube = self.cube
+        counts = self.counts
+
+        def counted(name, method):
+            def counted_method(*args):
+                counts[name] += 1
+                return method(*args)
+            return counted_method
+
+        def counted_move(commands):
+            for command in commands.split():
+                if command in cube.TURN_COMMANDS:
+                    counts['cube_turns'] += 1
+                else:
+                    counts['quarter_turns'] += 1
+            return move(commands)
+
+        move = cube.move
+        cube.move = counted_move
+        cube.find_cubelet = counted('find_cubelet', cube.find_cubelet)
+        cube.get_color = counted('get_color', cube.get_color)
+        cube.check_valid = counted('cube_valid', cube.check_valid)
+
+    def detach(self):
+        for name in ('move', 'find_cubelet', 'get_color', 'check_valid'):
+            vars(self.cube).pop(name, None)
+
+    def frame_move(self, commands):
+        # commands - given in a CubeFrame with virtual turns, before its turns are taken out
+        self.counts['cube_turns'] += sum(1 for command in commands.split() if command in Cube.TURN_COMMANDS)
+
+    def solve_start(self):
+        self.solve_report = {'success': False, 'seconds': 0.0, 'steps': []}
+
+    def solve_end(self, success):
+        self.solve_report['success'] = success
+        self.reports.append(self.solve_report)
+
+    def step_start(self):
+        self.counts_start = self.counts.copy()
+
+    def step_end(self, step_nbr, seconds):
+        step_report = {'step': step_nbr, 'seconds': seconds}
+        for name in self.COUNTERS:
+            step_report[name] = self.counts[name] - self.counts_start[name]
+        self.solve_report['steps'].append(step_report)
+        self.solve_report['seconds'] += seconds
+
+    def summary(self):
+        # aggregates the reports of all solves - {step: {metric: {'mean', 'p50', 'p99'}}}, step 'total' for whole solves
+        def percentile(values, fraction):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(fraction * len(values)))]
+
+        samples = {}
+        for report in self.reports:
+            totals = dict.fromkeys(self.METRICS, 0)
+            for step_report in report['steps']:
+                step_samples = samples.setdefault(step_report['step'], {})
+                for metric in self.METRICS:
+                    step_samples.setdefault(metric, []).append(step_report[metric])
+                    totals[metric] += step_report[metric]
+            total_samples = samples.setdefault('total', {})
+            for metric in self.METRICS:
+                total_samples.setdefault(metric, []).append(totals[metric])
+
+        summary = {}
+        for step, step_samples in samples.items():
+            summary[step] = {metric: {'mean': sum(values) / len(values), 'p50': percentile(values, 0.5),
+                                      'p99': percentile(values, 0.99)} for metric, values in step_samples.items()}
+        return summary
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f'Profile of {len(self.reports)} solves (mean / p50 / p99)')
+        for step, metrics in summary.items():
+            print(f'Step {step}:')
+            for metric, values in metrics.items():
+                print(f'  {metric:14} {values["mean"]:12.6g} {values["p50"]:12.6g} {values["p99"]:12.6g}')
+
+
 ##########################################################################
 class Solve(object):
-    def __init__(self, cube, render):
+    def __init__(self, cube, render=None):
+        # render is optional - without one the solver runs headless
         self.cube = cube
         self.render = render
-        self.fout = typing.TextIO
-        self.last_commands = ['', 0] # [command name, # of repeats] - used to determine if commands are looping
+        # limits - see set_limits()
+        self.move_budget = 5000  # commands per solve
+        self.timeout = None  # seconds per solve
+        self.visited_max = 10000  # states remembered per step
+        self.visited = {}  # hash of each (state, commands) executed in the current step: commands executed before
+        self.time_end = 0.0
+        self.paused_seconds = 0.0  # time the consumer of solve_iter() held moves of the current step
+        self.abort_error = None  # SolveAbortedError that ended the last solve
         self.log_step = ''
         self.log_squares_to_solve = tuple()
+        self.log_path = 'rubikscube_trace.txt'
+        self.log_buffer = []  # messages of the current solve, written to the trace file in one go by log_file_close
+        self.moves_cnt = 0  # commands executed by the current solve
+        self.step_stats = []  # [step_nbr, seconds, commands executed] of each step of the current solve
+        self.solution = []  # commands executed by the current solve, in order - see get_solution()
+        # logging - see set_logging()
+        self.log_rank = self.LOG_LEVELS['trace']  # most detailed level written to the trace file
+        self.console_rank = self.LOG_LEVELS['trace']  # most detailed level printed
+        self.log_max_bytes = 1000000
+        self.log_backup_cnt = 3
+        self.trace_failures = False
+        self.binary_trace_path = None  # binary trace of each solve, replayable with solve_trace.TraceReader
+        self.binary_trace = None  # solve_trace.TraceWriter while solving
+        self.profiler = None  # SolveProfiler while profiling is on
+        self.solution_cache = None  # SolutionCache consulted before solving, and filled by successful solves
+        self.cross_solver = None  # solves step1 instead of its edge by edge search - see set_cross_solver()
+        self.engine = None  # solves the whole cube instead of the steps - see set_engine()
+        self.virtual_turns = True  # whole cube turns of the steps only turn the frame - see set_virtual_turns()
+        self.frame = CubeFrame(cube)  # the cube as the steps see it - replaced as each solve starts
+
+    # logging levels, least to most detailed
+    #   silent - nothing
+    #   steps - start and result of each step, and of the solve
+    #   trace - every command and decision
+    LOG_LEVELS = {'silent': 0, 'steps': 1, 'trace': 2}
+
+    def set_logging(self, level=None, console_level=None, trace_failures=None, max_bytes=None, backup_cnt=None,
+                    binary_path=None):
+        # level - written to the trace file, console_level - printed (arguments left as None are unchanged)
+        # trace_failures - replay a failed solve at trace level into the trace file, whatever the levels
+        # the trace file is appended to, and rotated to log_path.1 ... log_path.<backup_cnt> past max_bytes
+        # binary_path - also record every solve in the compact binary format of solve_trace, each appended to the
+        # file ('' turns it off) - see solve_trace.TraceReader to read any of them
+        if level is not None:
+            self.log_rank = self.LOG_LEVELS[level]
+        if console_level is not None:
+            self.console_rank = self.LOG_LEVELS[console_level]
+        if trace_failures is not None:
+            self.trace_failures = trace_failures
+        if max_bytes is not None:
+            self.log_max_bytes = max_bytes
+        if backup_cnt is not None:
+            self.log_backup_cnt = backup_cnt
+        if binary_path is not None:
+            self.binary_trace_path = binary_path or None
 
     def log_file_init(self):
-        self.fout = open('rubikscube_trace.txt', 'w')
-        self.fout.write(str(datetime.datetime.now()) + '\n')
+        self.log_buffer = [str(datetime.datetime.now())] if self.log_rank else []
 
     def log_file_close(self):
-        self.fout.close()
-
-    def command_in_loop(self, commands):
-        max_repeat_cnt = 10
-
-        if commands != self.last_commands[0]:
-            self.last_commands[0] = commands
-            self.last_commands[1] = 1
-            return False
+        if not self.log_buffer:
+            return
+        text = '\n'.join(self.log_buffer) + '\n'
+        self.log_buffer = []
+        if os.path.isfile(self.log_path) and os.path.getsize(self.log_path) + len(text) > self.log_max_bytes:
+            self.log_file_rotate()
+        with open(self.log_path, 'a') as fout:
+            fout.write(text)
+
+    def log_file_rotate(self):
+        for i in range(self.log_backup_cnt - 1, 0, -1):
+            if os.path.exists(f'{self.log_path}.{i}'):
+                os.replace(f'{self.log_path}.{i}', f'{self.log_path}.{i + 1}')
+        if self.log_backup_cnt > 0:
+            os.replace(self.log_path, f'{self.log_path}.1')
         else:
-            if self.last_commands[1] < max_repeat_cnt:
-                repeats = self.last_commands[1] + 1
-                self.last_commands[1] = repeats
-                return False
-            else:
-                self.msg_user('Commands are looping')
-                return True
+            os.remove(self.log_path)
+
+    def set_limits(self, move_budget=None, timeout=None, visited_max=None):
+        # move_budget - commands per solve, timeout - seconds per solve (0 for no limit, None leaves unchanged)
+        # visited_max - states remembered per step for cycle detection
+        if move_budget is not None:
+            self.move_budget = move_budget or None
+        if timeout is not None:
+            self.timeout = timeout or None
+        if visited_max is not None:
+            self.visited_max = visited_max
+
+    def limits_start(self):
+        self.abort_error = None
+        self.visited = {}
+        self.time_end = time.perf_counter() + self.timeout if self.timeout is not None else None
+
+    def check_limits(self, commands):
+        # aborts the solve before the commands if the current step already executed them from the current state
+        # (the steps are deterministic, so they would repeat themselves forever), or the solve is out of commands
+        # or time
+        # a step may come back to a state (eg. a sequence and its inverse) - only the same commands again are a cycle
+        # (the cube's state and the frame's orientation are the state the steps see)
+        move_hash = hash((self.cube.state, self.frame.orientation, commands))
+        if move_hash in self.visited:
+            raise SolveAbortedError('cycle', {'commands': commands, 'cycle_cnt': self.moves_cnt - self.visited[
+                move_hash], 'moves_cnt': self.moves_cnt})
+        if len(self.visited) < self.visited_max:
+            self.visited[move_hash] = self.moves_cnt
+        if self.move_budget is not None and self.moves_cnt >= self.move_budget:
+            raise SolveAbortedError('move budget', {'moves_cnt': self.moves_cnt, 'move_budget': self.move_budget})
+        if self.time_end is not None and time.perf_counter() > self.time_end:
+            raise SolveAbortedError('timeout', {'moves_cnt': self.moves_cnt, 'timeout': self.timeout})
+
+    def set_cross_solver(self, cross_solver):
+        # cross_solver - solves the top layer edges of step1 in one move, eg. optimal.CrossSolver (None for the edge
+        # by edge search) - anything with a solve(cube) method returning commands
+        self.cross_solver = cross_solver
+
+    def set_engine(self, engine):
+        # engine - solves the cube in one move instead of the layer by layer steps, eg.
+        # thistlethwaite.ThistlethwaiteSolver or two_phase.TwoPhaseSolver (None for the steps) - anything with a
+        # solve(cube) method returning commands, or None if the cube can not be solved
+        self.engine = engine
+
+    def set_virtual_turns(self, virtual_turns):
+        # virtual_turns - the steps read the cube through a CubeFrame, and their whole cube turns only change the
+        # frame's orientation - the cube is never turned, and turns never reach the moves of solve_iter(), the
+        # solution or the traces (False executes turns on the cube like any other command)
+        self.virtual_turns = virtual_turns
+
+    def set_solution_cache(self, cache):
+        # cache - SolutionCache shared by any number of Solve instances (None turns caching off)
+        self.solution_cache = cache
+
+    def run_solve_steps(self):
+        # generator - solve_steps(), reporting an aborted solve as a failed one
+        # a cached solution of the state (or of the same state turned) is played instead, when there is one
+        state_start = self.cube.state
+        self.frame = CubeFrame(self.cube, self.virtual_turns)
+        if self.solution_cache is not None:
+            commands = self.solution_cache.get(state_start)
+            if commands is not None:
+                return (yield from self.solve_cached(commands))
+        try:
+            success = yield from self.solve_steps()
+        except SolveAbortedError as error:
+            self.abort_error = error
+            self.msg_user(str(error), 'steps')
+            return False
+        if success and self.solution_cache is not None:
+            self.solution_cache.put(state_start, ' '.join(self.solution))
+        return success
+
+    def solve_cached(self, commands):
+        # generator - plays a solution from the solution cache as a single move
+        self.msg_user('Solution found in cache.', 'steps')
+        if commands:
+            yield from self.move_cube(commands, f'Cached solution: {commands}')
+        return self.get_unsolved_squares(self.cube.SQUARE_KEYS) == []
 
-    def msg_user(self, message):
-        if isinstance(self.fout.name, str):
-            self.fout.write(message + '\n')
-        print(message)
+    def msg_user(self, message, level='trace'):
+        rank = self.LOG_LEVELS[level]
+        if rank <= self.log_rank:
+            self.log_buffer.append(message)
+        if rank <= self.console_rank:
+            print(message)
 
     def move_cube(self, commands, message):
+        # generator - makes the move on the cube, then hands it to the consumer of solve_iter()
         self.msg_user(message)
 
-        if self.command_in_loop(commands):
-            return False
-        else:
-            self.cube.move(commands)
-            self.render.draw(self.cube)
+        self.check_limits(commands)
+        if self.profiler is not None and self.frame.virtual_turns:
+            self.profiler.frame_move(commands)
+        commands = self.frame.move(commands)
+        if not commands:
+            # whole cube turns only - nothing to do on the cube
             return True
+        self.moves_cnt += len(commands.split())
+        self.solution.append(commands)
+        if self.binary_trace is not None:
+            self.binary_trace.move(commands, self.cube.state)
+        if self.render is not None:
+            self.render.draw(self.cube)
+        time_pause = time.perf_counter()
+        yield 'move', commands
+        self.paused_seconds += time.perf_counter() - time_pause
+        return True
 
     def get_unsolved_squares(self, squares_to_solve):
         unsolved_squares = []
         for square in squares_to_solve:
-            square_color = self.cube.get_color(square)
-            face_color = self.cube.get_color(square[0] + '11')
+            square_color = self.frame.get_color(square)
+            face_color = self.frame.get_color(square[0] + '11')
             if square_color != face_color:
                     unsolved_squares.append(square)
         return unsolved_squares
 
     def step_start(self, step, squares_to_solve = []):
-        self.msg_user(f'\nStep: "{step}")')
+        self.msg_user(f'\nStep: "{step}")', 'steps')
         if len(squares_to_solve) > 0:
-            self.msg_user(f'Squares to solve: {squares_to_solve}')
+            self.msg_user(f'Squares to solve: {squares_to_solve}', 'steps')
 
     def step_end(self, step, squares_to_solve = []):
         unsolved_squares = self.get_unsolved_squares(squares_to_solve)
         if unsolved_squares == []:
-            self.msg_user(f'Step "{step}" successfully solved')
+            self.msg_user(f'Step "{step}" successfully solved', 'steps')
             return True
         else:
-            self.msg_user(f'Unsolved squares of Step: "{step}" {unsolved_squares}')
+            self.msg_user(f'Unsolved squares of Step: "{step}" {unsolved_squares}', 'steps')
             return False
 
+    def get_solution(self, optimized=True):
+        # commands that solve the cube from its state before the last solve_cube() - see SequenceOptimizer
+        commands = ' '.join(self.solution)
+        return SequenceOptimizer.optimize(commands) if optimized else ' '.join(commands.split())
+
+    def set_profiling(self, profiling_on):
+        # profiling records counters for every step of every solve - see SolveProfiler
+        if profiling_on and self.profiler is None:
+            self.profiler = SolveProfiler(self.cube)
+            self.profiler.attach()
+        elif not profiling_on and self.profiler is not None:
+            self.profiler.detach()
+            self.profiler = None
+
     def process_step(self, step_func, step_nbr, step_desc, squares_to_solve):
+        # generator - see solve_iter()
         step_name = str(step_nbr) + ' - ' + step_desc
+        if self.binary_trace is not None:
+            self.binary_trace.step(step_nbr)
+        yield 'step', step_nbr, step_name
+
+        if self.profiler is not None:
+            self.profiler.step_start()
+        time_start = time.perf_counter()
+        self.paused_seconds = 0.0
+        moves_start = self.moves_cnt
+        self.visited = {}
         self.step_start(step_name, squares_to_solve)
-        if not step_func(step_name, squares_to_solve):
-            return False
-        return self.step_end(step_name, squares_to_solve)
+        success = False
+        try:
+            success = (yield from step_func(step_name, squares_to_solve)) and self.step_end(step_name, squares_to_solve)
+        finally:
+            # an aborted or cancelled step is still measured - without the time the consumer held each move
+            seconds = time.perf_counter() - time_start - self.paused_seconds
+            self.step_stats.append([step_nbr, seconds, self.moves_cnt - moves_start])
+            if self.profiler is not None:
+                self.profiler.step_end(step_nbr, seconds)
+        return success
 
     def step1(self, step_name, squares_to_solve):
         def position_edge(cube, color_f10, color_u12):
@@ -841,10 +1965,10 @@ class Solve(object):
 
             def get_cubelet_key(cubelet, target_color):
                 for key in cubelet:
-                    if target_color == self.cube.get_color(key):
+                    if target_color == self.frame.get_color(key):
                         return key
                 else:
-                    self.msg_user(f'Color: {target_color} not found in keys: {cubelet}')
+                    self.msg_user(f'Color: {target_color} not found in keys: {cubelet}', 'steps')
                     return None
 
             while True:
@@ -859,422 +1983,205 @@ class Solve(object):
                 if command == 'done':
                     return True
                 else:
-                    if not self.move_cube(command, 'Executing command:' + command):
-                        return False
+                    yield from self.move_cube(command, 'Executing command:' + command)
 
         # step1
+        if self.cross_solver is not None:
+            commands = self.cross_solver.solve(self.frame)
+            if commands is None:
+                self.msg_user('No solution found by the cross solver.', 'steps')
+                return False
+            if commands:
+                yield from self.move_cube(commands, 'Solving top layer edges: ' + commands)
+            return True
+
         for face in range(4):
-            self.msg_user('Solving face:' + self.cube.get_color('f11'))
+            self.msg_user('Solving face:' + self.frame.get_color('f11'))
 
             # set top layer edge for face
-            front_face_color = self.cube.get_color('f11')
-            top_face_color = self.cube.get_color('u11')
-            if not position_edge(self.cube, front_face_color, top_face_color):
+            front_face_color = self.frame.get_color('f11')
+            top_face_color = self.frame.get_color('u11')
+            if not (yield from position_edge(self.frame, front_face_color, top_face_color)):
                 return False
 
-            self.move_cube('tl', 'Turning left...')
+            yield from self.move_cube('tl', 'Turning left...')
         return True
 
     def step2(self, step_name, squares_to_solve):
-        def get_corner_cubelet():
-            up_face_color = self.cube.get_color('u11')
-            front_face_color = self.cube.get_color('f11')
-            right_face_color = self.cube.get_color('r11')
-            return self.cube.find_cubelet(up_face_color, front_face_color, right_face_color)
-
-        def cubelet_solved(cubelet):
-            for square in cubelet:
-                square_color = self.cube.get_color(square)
-                face_color = self.cube.get_color(square[0] + '11')
-                if square_color != face_color:
+        # first two layers - with the top layer edges turned to the bottom, each pair of a corner and middle edge is
+        # solved with one lookup in the case table of FirstTwoLayers, cheapest pair first
+        yield from self.move_cube('tu tu', 'Turning solved edges to the bottom.')
+
+        # each pass solves a pair, or moves a piece out of another slot - at most 4 and 8 of those (see
+        # FirstTwoLayers.extract), and a last pass finds every slot solved
+        for i in range(13):
+            best = None  # (commands_cnt, commands) of the cheapest pair
+            stuck = None  # (turns, slot) of a pair with a piece in another slot
+            for turns in FirstTwoLayers.SLOT_TURNS:
+                slot = CubeFrame(self.frame)
+                slot.move(turns)
+                commands = FirstTwoLayers.insert(slot)
+                if commands is None:
+                    stuck = stuck or (turns, slot)
+                elif commands and (best is None or len(commands.split()) < best[0]):
+                    best = len(commands.split()), (turns + ' ' + commands).strip()
+
+            if best is not None:
+                yield from self.move_cube(best[1], 'Inserting pair: ' + best[1])
+            elif stuck is not None:
+                commands = FirstTwoLayers.extract(stuck[1])
+                if commands is None:
+                    self.msg_user('First two layers case not found in extraction table.', 'steps')
                     return False
+                commands = (stuck[0] + ' ' + commands).strip()
+                yield from self.move_cube(commands, 'Moving pair out of slot: ' + commands)
             else:
                 return True
-
-        def pre_position_cube(cubelet):
-            key = ''
-            command = ''
-            PLAN = {'b00r20u20': 'r di di ri d', 'b02d22r22': 'di', 'b20l00u00': 'li d d l', 'b22d02l02': 'd d',
-                    'd00f02l22': 'd', 'd20f22r02': 'done', 'f00l20u02': 'l d li', 'f20r00u22': 'ri di r d'}
-
-            # check - already solved
-            if cubelet_solved(['f20', 'u22', 'r00']):
-                return
-
-            cubelet.sort()
-            key = ''.join(cubelet)
-            command = PLAN[key]
-            if command == 'done': return
-            self.move_cube(command, 'Positioning edge: ' + str(cubelet))
-
-        def final_position_cube():
-            command = ''
-
-            # check - already solved
-            if cubelet_solved(['f20', 'u22', 'r00']): return
-
-            up_face_color = self.cube.get_color('u11')
-            if up_face_color == self.cube.get_color('f22'):
-                command = 'f d fi'
-            elif up_face_color == self.cube.get_color('r02'):
-                command = 'ri di r'
-            else:
-                command = 'ri d d r d ri di r'
-            self.move_cube(command, 'Solving edge: ' + str(cubelet))
-
-        # step2
-        for face in range(4):
-            self.msg_user('Solving face:' + self.cube.get_color('f11'))
-            cubelet = get_corner_cubelet()
-            pre_position_cube(cubelet)
-            final_position_cube()
-            self.move_cube('tl', 'Turning left...')
-        return True
+        return False
 
     def step3(self, step_name, squares_to_solve):
-        INSERT_MIDDLE_EDGE_01 = 'ui li u l u f ui fi'
-        INSERT_MIDDLE_EDGE_21 = 'u r ui ri ui fi u f'
-
-        def rotate_to_front_color(new_front_color):
-            if self.cube.get_color('f11') != new_front_color:
-                if not self.move_cube('tl', 'Rotating cube to front color:' + new_front_color):
-                    return False
-                else:
-                    return rotate_to_front_color(new_front_color)
-
-        def position_top_layer_edge(key):
-            color = self.cube.get_color(key)
-            if color == self.cube.get_color(key[0] + '11'):
-                if not rotate_to_front_color(color):
-                    return False
-            else:
-                if not self.move_cube('e d', 'Rotating bottom two layers of cube to form body upside down "T"...'):
-                    return False
-                position_top_layer_edge(key)
-                return True
-
-        def next_edge():
-            misoriented_edge = []
-            unsolved_edges = get_unsolved_edges()
-            if len(unsolved_edges) == 0:
-                return True
-
-            for edge in unsolved_edges:
-                found, key = edge_in_top_row(edge)
-                if found:
-                    return swap_down(key)
-                else:
-                    misoriented_edge = edge
-            else:
-                # only misoriented edges unsolved
-                return swap_up(misoriented_edge)
-
-        def swap(commands, key, type):
-            self.move_cube(commands, f'Swapping "{type}" edge piece {key}')
-            return next_edge()
-
-        def swap_down(key):
-            commands = ''
-            position_top_layer_edge(key)
-
-            # determine edge placement algorithm
-            color_of_top_edge = self.cube.get_color('u12')
-            if color_of_top_edge == self.cube.get_color('l11'):
-                commands = INSERT_MIDDLE_EDGE_01
-            elif color_of_top_edge == self.cube.get_color('r11'):
-                commands = INSERT_MIDDLE_EDGE_21
-            return swap(commands, key, 'down')
-
-        def swap_up(edge):
-            # using 1st square but either would work
-            commands = ''
-            key = edge[0]
-            face = key[0]
-            coordinate = key[1:]
-
-            # turn so that key is on face
-            color = self.cube.get_color(face + '11')
-            rotate_to_front_color(color)
-
-            # get swap commands
-            if coordinate == '01':
-                commands = INSERT_MIDDLE_EDGE_01
-            else:
-                commands = INSERT_MIDDLE_EDGE_21
-            return swap(commands, key, 'up')
-
-        def edge_is_solved(edge):
-            # true if edge square COLORS are same as their face COLORS
-            for key in edge:
-                if self.cube.get_color(key) != self.cube.get_color(key[0] + '11'):
-                    return False
-            else:
-                return True
-
-        def get_unsolved_edges():
-            EDGES_TO_SOLVE = (('f01', 'l21'), ('f21', 'r01'), ('r21', 'b01'), ('b21', 'l01'))
-            unsolved_edges = []
-            for edge in EDGES_TO_SOLVE:
-                if not edge_is_solved(edge):
-                    unsolved_edges.append(edge)
-            return unsolved_edges
-
-        def edge_in_top_row(target_edge):
-            # target_edge represents coordinates of middle layer edge to be solved
-            # found_edge is edge to be positioned in target_edge coordinates
-            # retrns true if either color of found_edge has coordinate '10'
-            colors = []
-            found_edge = []
-            color0 = self.cube.get_color(target_edge[0][0] + '11')
-            color1 = self.cube.get_color(target_edge[1][0] + '11')
-            found_edge = self.cube.find_cubelet(color0, color1)
-
-            for key in found_edge:
-                if key in ['f10', 'l10', 'b10', 'r10']:
-                    return True, key
-            else:
-                return False, None
-
-        # step3
-        # flip cube upside down
-        if not self.move_cube('tu tu', 'Flipping cube upside down...'):
+        # one lookup in the orient table of LastLayer, and its commands
+        commands = LastLayer.orient(self.frame)
+        if commands is None:
+            self.msg_user('Top layer case not found in orient table.', 'steps')
             return False
-        return next_edge()
+        if commands:
+            yield from self.move_cube(commands, 'Orienting top layer.')
+        return True
 
     def step4(self, step_name, squares_to_solve):
-        def get_status_item(coordinates_to_check):
-            unsoloved_coordinates = []
-            top_face_color = self.cube.get_color('u11')
-
-            # create list of coordinates that should not be solved
-            for key in squares_to_solve:
-                if key[1:] not in coordinates_to_check:
-                    unsoloved_coordinates.append(key[1:])
-
-            # check coordinates that should be solved
-            for coordinate in coordinates_to_check:
-                if top_face_color != self.cube.get_color('u' + coordinate):
-                    return False
-
-            # check coordinates of that should not be solved
-            for coordinate in unsoloved_coordinates:
-                if top_face_color == self.cube.get_color('u' + coordinate):
-                    return False
-
-            return True
-
-        def get_status():
-            state = 0
-            coordinates = []
-            commands = ''
-            PLAN = (
-                (1, (), None),
-                (2, ('10', '12'), 'u'),
-                (2, ('01', '21'), None),
-                (3, ('12', '01'), 'u'),
-                (3, ('21', '12'), 'u u'),
-                (3, ('10', '21'), 'ui'),
-                (3, ('01', '10'), None),
-                (4, ('01', '10', '12', '21'), None),
-            )
-            for i in PLAN:
-                state = i[0]
-                coordinates = i[1]
-                commands = i[2]
-                if get_status_item(coordinates):
-                    return state, commands
-        # step4
-        state = 0
-        reposition_commands = ''
-
-        while True:
-            state, reposition_commands = get_status()
-            if state == 4:
-                break
-            elif reposition_commands != None:
-                self.move_cube(reposition_commands, 'Repositioning cube for state: ' + str(state))
-
-            # advance state
-            self.move_cube('ri ui fi u f r', 'Advance from state: ' + str(state))
+        # one lookup in the permute table of LastLayer, and its commands
+        commands = LastLayer.permute(self.frame)
+        if commands is None:
+            self.msg_user('Top layer case not found in permute table.', 'steps')
+            return False
+        if commands:
+            yield from self.move_cube(commands, 'Permuting top layer.')
         return True
 
-    def step5(self, step_name, squares_to_solve):
-        solved_corners_cnt = 0
-
-        def solved_squares_cnt(squares):
-            top_color = ''
-            squares_cnt = 0
-
-            top_color = self.cube.get_color('u11')
-            for square in squares:
-                if self.cube.get_color(square) == top_color:
-                    squares_cnt += 1
-            return squares_cnt
-
-        def position_cube(squares):
-            top_color = ''
-
-            top_color = self.cube.get_color('u11')
-            for i in range(0,3):
-                if len(squares) == solved_squares_cnt(squares):
-                    return
-                else:
-                    self.move_cube('u', f'Turning to have {top_color} as squares {squares}')
-
-        #step5
-        for i in range(3):
-            solved_corners_cnt = solved_squares_cnt(('u00', 'u20', 'u02', 'u22'))
-
-            if solved_corners_cnt == 0:
-                position_cube(('l20',))
-            elif solved_corners_cnt == 1:
-                position_cube(('u10', 'u01', 'u11', 'u21', 'u02', 'u12'))
-            elif solved_corners_cnt == 2:
-                position_cube(('f00',))
-            elif solved_corners_cnt == 4:
-                break
-
-            self.move_cube('r u ri u r u u ri', 'Advance from state: ' + str(solved_corners_cnt))
+    def step_engine(self, step_name, squares_to_solve):
+        # the whole solve from the engine (see set_engine), as one move
+        commands = self.engine.solve(self.frame)
+        if commands is None:
+            self.msg_user('No solution found by the engine.', 'steps')
+            return False
+        if commands:
+            yield from self.move_cube(commands, 'Solving cube: ' + commands)
         return True
 
-    def step6(self, step_name, squares_to_solve):
-        solved_corners_cnt = 0
-        solved_corners = []
-        ROTATE_COMMANDS = 'ri f ri b b r fi ri b b r r ui'
-
-        def get_solved_corners():
-            corners = []
-            CUBELETS_TO_SOLVE = (
-                ['u00', 'l00', 'b20'], ['u20', 'r20', 'b00'],
-                ['u02', 'l20', 'f00'], ['u22', 'r00', 'f20']
-            )
-            for cubelet in CUBELETS_TO_SOLVE:
-                for key in cubelet:
-                    if self.cube.get_color(key) != self.cube.get_color(key[0] + '11'):
-                        break
-                else:
-                    corners.append(cubelet)
-            else:
-                return corners, len(corners)
-
-        def solved_corners_are_adjacent(solved_corners):
-            PLAN = ((('u00', 'u20'), ''), (('u20', 'u22'), 'tr'), (('u22', 'u02'), 'tl tl'), (('u02', 'u00'), 'tl'))
-            solved_squares_combined = sum(solved_corners, [])
-
-            for item in PLAN:
-                coordinates = item[0]
-                command = item[1]
-
-                for key in coordinates:
-                    if key not in solved_squares_combined:
-                        break
-                else:
-                    # position adjacent solved corners to back
-                    if command != '':
-                        self.move_cube(command, 'Rotating cube to place 2 solved corners in back state')
-                    return True
-            else:
-                return False
-
-        def position_corners():
-            while True:
-                solved_corners, solved_corners_cnt = get_solved_corners()
-
-                if solved_corners_cnt == 4:
-                    return solved_corners, 'done'
-                elif solved_corners_cnt == 2:
-                    if solved_corners_are_adjacent(solved_corners):
-                        return solved_corners, 'adjacent'
-                    else:
-                        return solved_corners, 'diagonal'
-                self.move_cube('u', 'Rotating top face to realize 2 solved corners state')
-
-        # step6
-        solved_corners, state = position_corners()
-
-        if state == 'done':
-            return True
-        elif state == 'adjacent':
-            self.move_cube(ROTATE_COMMANDS, 'Rotating adjacent corners')
-        elif state == 'diagonal':
-            self.move_cube(ROTATE_COMMANDS, 'Rotating diagonal corners')
-            position_corners()
-            self.move_cube(ROTATE_COMMANDS, 'Rotating adjacent corners')
-
-        # step is complete
-        solved_corners, solved_corners_cnt = get_solved_corners()
-        return solved_corners_cnt == 4
-
-    def step7(self, step_name, squares_to_solve):
-        solved_edges_cnt = 0
-        solved_edges = []
-        COMMANDS_ROTATE_CLOCKWISE ='f f u l ri f f li r u f f'
-        COMMANDS_ROTATE_COUNTER_CLOCKWISE = 'f f ui l ri f f li r ui f f'
-
-        def get_solved_edges():
-            edges = []
-            CUBELETS_TO_SOLVE = (('u01', 'l10'), ('u10', 'b10'), ('u21', 'r10'), ('u12', 'f10'))
-
-            for cubelet in CUBELETS_TO_SOLVE:
-                for key in cubelet:
-                    if self.cube.get_color(key) != self.cube.get_color(key[0] + '11'):
-                        break
-                else:
-                    edges.append(cubelet)
-            else:
-                return edges, len(edges)
-
-        def move_edge_to_back(edges):
-            for edge in edges:
-                if 'u01' in edge:
-                    self.move_cube('tl', 'Rotating edge "u01" to back.')
-                elif 'u21' in edge:
-                    self.move_cube('tr', 'Rotating edge "u21" to back.')
-                elif 'u12' in edge:
-                    self.move_cube('tl tl', 'Rotating edge "u12" to back.')
-
-        def process_edges(edge, commands_clockwise, commands_counter_clockwise):
-            commands = ''
-            move_edge_to_back( edge)
-            if self.cube.get_color('r10') == self.cube.get_color('f11'):
-                commands = commands_clockwise
-            else:
-                commands = commands_counter_clockwise
-            self.move_cube(commands, 'Solving 3 top layer edges.')
-
-        # step7
-        solved_edges, solved_edges_cnt = get_solved_edges()
-
-        if solved_edges_cnt == 1:
-            process_edges(solved_edges, COMMANDS_ROTATE_CLOCKWISE, COMMANDS_ROTATE_COUNTER_CLOCKWISE)
-        else:
-            self.move_cube(COMMANDS_ROTATE_CLOCKWISE, 'Creating single solved edge.')
-            solved_edges, solved_edges_cnt = get_solved_edges()
-            process_edges(solved_edges, COMMANDS_ROTATE_CLOCKWISE, COMMANDS_ROTATE_COUNTER_CLOCKWISE)
+    def solve_steps(self):
+        # generator - see solve_iter()
+        if self.engine is not None:
+            return (yield from self.process_step(self.step_engine, 1, 'solve cube', self.cube.SQUARE_KEYS))
+        if not (yield from self.process_step(self.step1, 1, 'solve top layer edges', ('f10', 'r10', 'b10', 'l10', 'u10', 'u01', 'u21', 'u12'))): return False
+        if not (yield from self.process_step(self.step2, 2, 'solve first two layers', FirstTwoLayers.SQUARES)): return False
+        if not (yield from self.process_step(self.step3, 3, 'orient top layer', ('u00', 'u10', 'u20', 'u01', 'u21', 'u02', 'u12', 'u22'))): return False
+        if not (yield from self.process_step(self.step4, 4, 'permute top layer', LastLayer.SIDE_SQUARES)): return False
+        return True
 
-        solved_edges, solved_edges_cnt = get_solved_edges()
-        return solved_edges_cnt == 4
+    @staticmethod
+    def drain(generator):
+        # runs a generator to the end, returning its return value
+        while True:
+            try:
+                next(generator)
+            except StopIteration as stop:
+                return stop.value
 
     def solve_cube(self):
-        def solve_steps():
-            if not self.process_step(self.step1, 1, 'solve top layer edges', ('f10', 'r10', 'b10', 'l10', 'u10', 'u01', 'u21', 'u12')): return False
-            if not self.process_step(self.step2, 2, 'solve top layer corners', ('f00', 'f20', 'r00', 'r20', 'b00', 'b20', 'l00', 'l20', 'u00', 'u20', 'u02', 'u22')): return False
-            if not self.process_step(self.step3, 3, 'solve middle layer edges', ('f01', 'f21', 'l01', 'l21', 'b01', 'b21', 'r01', 'r21')): return False
-            if not self.process_step(self.step4, 4, 'permute top face edges', ('u01', 'u10', 'u12', 'u21')): return False
-            if not self.process_step(self.step5, 5, 'permute top face corners', ()): return False
-            if not self.process_step(self.step6, 6, 'solve top layer corners', ('u00', 'l00', 'b20', 'u20', 'r20', 'b00', 'u02', 'f00', 'l20', 'u22', 'f20', 'r00')): return False
-            if not self.process_step(self.step7, 7, 'solve top layer edges', ('u10', 'b10', 'u01', 'l10', 'u21', 'r10', 'u12', 'f10')): return False
-            return True
+        success = False
+        for event in self.solve_iter():
+            if event[0] == 'done':
+                success = event[1]
+        return success
 
-        # solve_cube
+    def solve_iter(self):
+        # solves the cube one move at a time - yields...
+        #   ('step', step_nbr, step_name) - as each step starts
+        #   ('move', commands) - as soon as each move is decided (and made on the cube)
+        #   ('done', success) - once the solve has ended
+        # the consumer can execute the moves as they come, stop early (closing the generator ends the solve as
+        # failed) or interleave the solves of several Solve instances in one thread
+        state_start = self.cube.state
+        self.moves_cnt = 0
+        self.step_stats = []
+        self.solution = []
+        if self.profiler is not None:
+            self.profiler.solve_start()
         self.log_file_init()
-        success = solve_steps()
-        self.msg_user('Cube solved successfully: ' + str(success))
+        if self.binary_trace_path is not None:
+            # imported here, as solve_trace builds on this module
+            from solve_trace import TraceWriter
+            self.binary_trace = TraceWriter(self.binary_trace_path, state_start)
+        self.limits_start()
+        success = False
+        try:
+            success = yield from self.run_solve_steps()
+        finally:
+            self.msg_user('Cube solved successfully: ' + str(success), 'steps')
+            self.log_file_close()
+            if self.binary_trace is not None:
+                self.binary_trace.close(success)
+                self.binary_trace = None
+            if self.profiler is not None:
+                self.profiler.solve_end(success)
+        if not success and self.trace_failures and self.log_rank < self.LOG_LEVELS['trace']:
+            self.trace_failure(state_start)
+        yield 'done', success
+
+    def trace_failure(self, state):
+        # replays a failed solve from its starting state, at trace level, into the trace file
+        self.log_buffer = [f'{datetime.datetime.now()} - trace of failed solve', f'State: {state}']
+        self.solve_private(state, self.LOG_LEVELS['trace'])
+        self.log_buffer.append('Cube solved successfully: False')
         self.log_file_close()
-        return success
-
 
-def test(solve_cnt, display_status):
+    def solve_private(self, state, log_rank):
+        # runs the solve steps on a private copy of the cube - nothing is drawn or printed, and messages up to
+        # log_rank are buffered for the trace file
+        # returns (success, stats) - stats holds the moves_cnt, step_stats, solution and abort_error of the private
+        # solve, the ones of the last solve of the cube are left as they were
+        cube, render, profiler, binary_trace, frame = self.cube, self.render, self.profiler, self.binary_trace, \
+            self.frame
+        log_ranks = self.log_rank, self.console_rank
+        results = self.moves_cnt, self.step_stats, self.solution, self.abort_error
+        self.cube = Cube()
+        self.cube.set_validation(cube.validation, cube.validation_interval)
+        self.cube.state = state
+        self.render = None
+        self.profiler = None
+        self.binary_trace = None
+        self.log_rank, self.console_rank = log_rank, self.LOG_LEVELS['silent']
+        self.moves_cnt = 0
+        self.step_stats = []
+        self.solution = []
+        self.limits_start()
+        try:
+            success = self.drain(self.run_solve_steps())
+            return success, {'moves_cnt': self.moves_cnt, 'step_stats': self.step_stats, 'solution': self.solution,
+                             'abort_error': self.abort_error}
+        finally:
+            self.cube, self.render, self.profiler, self.binary_trace, self.frame = cube, render, profiler, \
+                binary_trace, frame
+            self.log_rank, self.console_rank = log_ranks
+            self.moves_cnt, self.step_stats, self.solution, self.abort_error = results
+
+    def solve_plan(self, state=None):
+        # runs the solve on a private copy of the cube (state defaults to the cube's current state) - nothing is
+        # drawn, printed or logged, and the cube and the results of its last solve (get_solution(), step_stats, ...)
+        # are left untouched
+        # returns (success, commands, steps, stats) - commands is the list of single commands, steps is
+        # [(step_nbr, index of the step's first command, index after its last command), ...], and stats the
+        # moves_cnt, step_stats and abort_error of the plan (see solve_private)
+        success, stats = self.solve_private(self.cube.state if state is None else state, self.LOG_LEVELS['silent'])
+        steps = []
+        first = 0
+        for step_nbr, seconds, commands_cnt in stats['step_stats']:
+            steps.append((step_nbr, first, first + commands_cnt))
+            first += commands_cnt
+        return success, ' '.join(stats.pop('solution')).split(), steps, stats
+
+def test(cube, render, solve, solve_cnt, display_status):
     if display_status:
         render.display_on()
     else:
@@ -1298,13 +2205,17 @@ def test(solve_cnt, display_status):
 ##########################################################################
 # RUN PROGRAM
 
-cube = Cube()
-render = Render(cube, True)
-solve = Solve(cube, render)
+def create_game(drawing_on=True):
+    # returns a new (cube, render, solve) set - nothing is drawn until render.draw() is called
+    cube = Cube()
+    render = Render(cube, drawing_on)
+    solve = Solve(cube, render)
+    return cube, render, solve
 
 def main():
+    cube, render, solve = create_game()
     render.draw(cube)
-    play(cube, render)
+    play(cube, render, solve)
 
 if __name__ == '__main__':
     main()
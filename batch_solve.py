@@ -0,0 +1,167 @@
+# batch_solve.py
+
+"""
+Multiprocess batch runner for the cube solver - the parallel version of RCv11.test().
+
+The parent process scrambles every cube up front and writes the scrambled states into one shared memory buffer
+(54 bytes per cube, laid out as Cube.state). Worker processes attach to the buffer once and are only sent index
+ranges, so no cube state is pickled per task. Each worker plans its solves with Solve.solve_plan() (no rendering,
+printing or logging), and returns success, command count and per step timings for each cube.
+
+On the first failure the remaining work is cancelled and the failing scramble is saved to disk, so it can be
+replayed with Cube.move(), along with a full trace of the failing solve (see Solve.set_logging).
+
+Usage: python3 batch_solve.py [solve_cnt] [processes] [seed]
+"""
+
+import multiprocessing
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+
+from RCv11 import Cube, FirstTwoLayers, LastLayer, Solve
+
+STATE_SIZE = len(Cube.SQUARE_KEYS)
+
+# worker process globals - set once by worker_init()
+worker = {}
+
+
+def worker_init(shm_name, stop_event, timeout):
+    # attach to the shared states and build a headless solver for this process
+    worker['shm'] = shared_memory.SharedMemory(name=shm_name)
+    worker['stop'] = stop_event
+    worker['solve'] = Solve(Cube())
+    worker['solve'].set_limits(timeout=timeout)
+    # the case tables are built now, so the first solve of each worker does not spend its timeout on them
+    if not LastLayer.ORIENT_TABLE:
+        LastLayer.compile()
+    if not FirstTwoLayers.TABLE:
+        FirstTwoLayers.compile()
+
+
+def worker_solve(index_range):
+    # solves the cubes in index_range, returns [(index, success, commands_cnt, step_stats, error), ...]
+    solve = worker['solve']
+    buffer = worker['shm'].buf
+    results = []
+
+    for i in range(*index_range):
+        if worker['stop'].is_set():
+            break
+
+        error = ''
+        try:
+            success, commands, steps, stats = solve.solve_plan(bytes(buffer[i * STATE_SIZE:(i + 1) * STATE_SIZE]))
+            if stats['abort_error'] is not None:
+                # cycle, move budget or timeout
+                error = str(stats['abort_error'])
+        except Exception as exception:
+            # a failing solve must not take down the worker
+            success = False
+            error = repr(exception)
+            stats = {'moves_cnt': 0, 'step_stats': []}
+        results.append((i, success, stats['moves_cnt'], [tuple(stat) for stat in stats['step_stats']], error))
+
+        if not success:
+            worker['stop'].set()
+            break
+    return results
+
+
+def save_failure(path, index, scramble, error):
+    with open(path, 'w') as fout:
+        fout.write(f'Solve failed on scramble #{index}\n')
+        if error:
+            fout.write(f'Error: {error}\n')
+        fout.write(scramble + '\n')
+
+
+def save_failure_trace(path, scramble):
+    # solves the scramble again in this process - only the failing solve is traced
+    cube = Cube()
+    cube.move(scramble)
+    solve = Solve(cube)
+    solve.log_path = path
+    solve.set_logging('silent', 'silent', trace_failures=True)
+    try:
+        solve.solve_cube()
+    except Exception:
+        # the error itself is already saved with the scramble
+        solve.log_file_close()
+
+
+def run_batch(solve_cnt, scramble_cnt=100, processes=None, seed=None, chunk_size=50,
+              failure_path='rubikscube_failed_scramble.txt', trace_path='rubikscube_failed_trace.txt', timeout=10.0):
+    # returns a dict summarizing the run - see print_summary()
+    # timeout - seconds per solve, so a solve that never finishes can not hold a worker (0 for no limit)
+    rng = random.Random(seed)
+    cube = Cube()
+    cube.set_validation('off')
+    scrambles = []
+
+    shm = shared_memory.SharedMemory(create=True, size=max(solve_cnt, 1) * STATE_SIZE)
+    try:
+        for i in range(solve_cnt):
+            cube.restart()
+            scrambles.append(cube.scramble(scramble_cnt, rng))
+            shm.buf[i * STATE_SIZE:(i + 1) * STATE_SIZE] = bytes(cube.state)
+
+        chunks = [(start, min(start + chunk_size, solve_cnt)) for start in range(0, solve_cnt, chunk_size)]
+        results = []
+        time_start = time.perf_counter()
+        with multiprocessing.Manager() as manager:
+            stop_event = manager.Event()
+            with multiprocessing.Pool(processes, worker_init, (shm.name, stop_event, timeout)) as pool:
+                for chunk_results in pool.imap_unordered(worker_solve, chunks):
+                    results.extend(chunk_results)
+                    if stop_event.is_set():
+                        pool.terminate()
+                        break
+        seconds = time.perf_counter() - time_start
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results.sort()
+    failures = [result for result in results if not result[1]]
+    if failures:
+        index, success, commands_cnt, step_stats, error = failures[0]
+        save_failure(failure_path, index, scrambles[index], error)
+        if trace_path:
+            save_failure_trace(trace_path, scrambles[index])
+
+    solved = [result for result in results if result[1]]
+    step_seconds = {}
+    for result in solved:
+        for step_nbr, step_time, step_commands_cnt in result[3]:
+            step_seconds.setdefault(step_nbr, []).append(step_time)
+
+    return {
+        'solve_cnt': len(results),
+        'success_cnt': len(solved),
+        'seconds': seconds,
+        'commands_mean': sum(result[2] for result in solved) / len(solved) if solved else 0,
+        'commands_max': max((result[2] for result in solved), default=0),
+        'step_seconds_mean': {step: sum(times) / len(times) for step, times in sorted(step_seconds.items())},
+        'failure': {'index': failures[0][0], 'scramble': scrambles[failures[0][0]], 'error': failures[0][4],
+                    'path': failure_path} if failures else None}
+
+
+def print_summary(summary):
+    print(f'Solved {summary["success_cnt"]} of {summary["solve_cnt"]} cubes in {summary["seconds"]:.2f}s')
+    print(f'Commands per solve - mean {summary["commands_mean"]:.1f}, max {summary["commands_max"]}')
+    for step, seconds in summary['step_seconds_mean'].items():
+        print(f'Step {step} - mean {seconds * 1000:.3f}ms')
+    if summary['failure']:
+        failure = summary['failure']
+        print(f'Solve failed on scramble #{failure["index"]} {failure["error"]} - saved to {failure["path"]}')
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:4]]
+    solve_cnt = args[0] if len(args) > 0 else 1000
+    processes = args[1] if len(args) > 1 else None
+    seed = args[2] if len(args) > 2 else None
+    print_summary(run_batch(solve_cnt, processes=processes, seed=seed))
@@ -0,0 +1,164 @@
+# benchmark.py
+
+"""
+Benchmark suite for the cube simulator and solver hot paths.
+
+Every benchmark runs on seeded inputs, so two runs measure the same work. Results are reported in microseconds
+per operation (the median of several rounds), saved to a JSON baseline, and compared against the previous
+baseline - anything slower than the threshold is flagged as a regression.
+
+Benchmarks
+- move_quarter_turn - Cube.move() of a single quarter turn
+- scramble_1000 - Cube.scramble(1000)
+- cube_valid - Cube.cube_valid()
+- find_cubelet - Cube.find_cubelet() of an edge or corner
+- solve_cube - Solve.solve_cube() of a 100 command scramble
+- solve_step1 ... solve_step4 - each step of Solve.solve_cube()
+
+Usage: python3 benchmark.py [baseline.json] [threshold] - eg. python3 benchmark.py rubikscube_benchmark.json 0.1
+"""
+
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from RCv11 import Cube, FirstTwoLayers, LastLayer, Solve
+
+BASELINE_PATH = 'rubikscube_benchmark.json'
+THRESHOLD = 0.10  # flag benchmarks more than 10% slower than the baseline
+ROUNDS = 5
+
+
+def time_per_op(func, ops_cnt):
+    # microseconds per operation of func(), which performs ops_cnt operations
+    time_start = time.perf_counter()
+    func()
+    return (time.perf_counter() - time_start) / ops_cnt * 1e6
+
+
+def bench_move(rng):
+    cube = Cube()
+    commands = [rng.choice(cube.get_commands_execute()) for i in range(10000)]
+
+    def run():
+        for command in commands:
+            cube.move(command)
+    return time_per_op(run, len(commands))
+
+
+def bench_scramble(rng):
+    cube = Cube()
+    return time_per_op(lambda: [cube.scramble(1000, rng) for i in range(10)], 10)
+
+
+def bench_cube_valid(rng):
+    cube = Cube()
+    cube.scramble(100, rng)
+    return time_per_op(lambda: [cube.cube_valid() for i in range(1000)], 1000)
+
+
+def bench_find_cubelet(rng):
+    solved = Cube()
+    pieces = [[solved.get_color(key) for key in cubelet] for cubelet in solved.EDGE_CUBELETS + solved.CORNER_CUBELETS]
+    cube = Cube()
+    cube.scramble(100, rng)
+
+    def run():
+        for i in range(100):
+            for colors in pieces:
+                cube.find_cubelet(*colors)
+    return time_per_op(run, 100 * len(pieces))
+
+
+def bench_solve(rng, solve_cnt=20):
+    # returns microseconds per solve and per step
+    # the case tables are built before the timing starts - the first solve would otherwise build them (about 0.2 s)
+    if not LastLayer.ORIENT_TABLE:
+        LastLayer.compile()
+    if not FirstTwoLayers.TABLE:
+        FirstTwoLayers.compile()
+    cube = Cube()
+    solve = Solve(cube)
+    solve.log_path = os.devnull
+    solve_times = []
+    step_times = {}
+    for i in range(solve_cnt):
+        cube.restart()
+        cube.scramble(100, rng)
+        with contextlib.redirect_stdout(None):
+            solve_times.append(time_per_op(solve.solve_cube, 1))
+        for step_nbr, seconds, commands_cnt in solve.step_stats:
+            step_times.setdefault(step_nbr, []).append(seconds * 1e6)
+
+    results = {'solve_cube': statistics.mean(solve_times)}
+    for step_nbr, times in sorted(step_times.items()):
+        results[f'solve_step{step_nbr}'] = statistics.mean(times)
+    return results
+
+
+def run_benchmarks(seed=0, rounds=ROUNDS):
+    # returns {benchmark: microseconds per operation} - the median of rounds
+    samples = {}
+    for i in range(rounds):
+        rng = random.Random(seed)
+        round_results = {
+            'move_quarter_turn': bench_move(rng),
+            'scramble_1000': bench_scramble(rng),
+            'cube_valid': bench_cube_valid(rng),
+            'find_cubelet': bench_find_cubelet(rng)}
+        round_results.update(bench_solve(rng))
+        for name, value in round_results.items():
+            samples.setdefault(name, []).append(value)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # returns [(benchmark, baseline, result, change), ...] for results slower than baseline by more than threshold
+    regressions = []
+    for name, value in results.items():
+        previous = baseline.get(name)
+        if previous:
+            change = (value - previous) / previous
+            if change > threshold:
+                regressions.append((name, previous, value, change))
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fin:
+        return json.load(fin)['results']
+
+
+def save_baseline(path, results, seed):
+    with open(path, 'w') as fout:
+        json.dump({'seed': seed, 'python': sys.version.split()[0], 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'results': results}, fout, indent=2)
+
+
+def main(path=BASELINE_PATH, threshold=THRESHOLD, seed=0):
+    baseline = load_baseline(path)
+    results = run_benchmarks(seed)
+
+    for name, value in results.items():
+        previous = baseline.get(name)
+        change = f'{(value - previous) / previous:+.1%}' if previous else 'new'
+        print(f'{name:20} {value:12.3f} us  {change}')
+
+    regressions = compare(results, baseline, threshold)
+    for name, previous, value, change in regressions:
+        print(f'REGRESSION {name}: {previous:.3f} us -> {value:.3f} us ({change:+.1%})')
+
+    save_baseline(path, results, seed)
+    return regressions
+
+
+if __name__ == '__main__':
+    regressions = main(sys.argv[1] if len(sys.argv) > 1 else BASELINE_PATH,
+                       float(sys.argv[2]) if len(sys.argv) > 2 else THRESHOLD)
+    sys.exit(1 if regressions else 0)
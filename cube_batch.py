@@ -0,0 +1,126 @@
+# cube_batch.py
+
+"""
+Batched simulator for the Rubik's cube - applies moves to many cubes at once.
+
+The state of N cubes is held in an (N, 54) uint8 array laid out like Cube.state (see Cube.SQUARE_KEYS), where
+each value is an index into Cube.COLORS. Moves are the permutations Cube compiles from its PLAN_* tables, so a
+batch and a Cube always agree on what a command does. A vector of per-cube moves is applied with one fancy
+indexing gather, which makes the batch suited to scramble corpora, solver regression runs and RL rollouts.
+
+Requires NumPy.
+"""
+
+import numpy as np
+
+from RCv11 import Cube
+
+
+##########################################################################
+class CubeBatch:
+
+    #   primary methods
+    #   move() - applies one command per cube (or the same commands to every cube)
+    #   scramble() - applies randomized slice commands to every cube
+    #   is_solved() - true for each cube whose faces are all one color
+    #   cube_valid() - batched version of Cube.cube_valid()
+
+    def __init__(self, cube_cnt, seed=None):
+        if not Cube.MOVES:
+            Cube.compile_moves()
+
+        # commands are numbered in Cube.MOVES order - the 18 slices of Cube.SLICE_COMMANDS, then the 4 turns
+        self.commands = tuple(Cube.MOVES)
+        self.command_index = {command: i for i, command in enumerate(self.commands)}
+        self.slice_cnt = len(Cube.SLICE_COMMANDS)
+        self.perms = np.array([Cube.MOVES[command] for command in self.commands], dtype=np.intp)
+
+        index = Cube.SQUARE_INDEX
+        self.edge_index = np.array([[index[key] for key in edge] for edge in Cube.EDGE_CUBELETS], dtype=np.intp)
+        self.corner_index = np.array([[index[key] for key in corner] for corner in Cube.CORNER_CUBELETS],
+                                     dtype=np.intp)
+        self.center_index = np.array([index[face + '11'] for face in 'budlfr'], dtype=np.intp)
+
+        self.rng = np.random.default_rng(seed)
+        self.state_restart = np.repeat(np.arange(6, dtype=np.uint8), 9)
+        self.state = np.tile(self.state_restart, (cube_cnt, 1))
+        self.row_offsets = (np.arange(cube_cnt, dtype=np.intp) * self.state.shape[1])[:, np.newaxis]
+
+    def __len__(self):
+        return len(self.state)
+
+    ######### conversion
+
+    def get_command_indexes(self, commands):
+        # converts a command string (eg. 'r u ri') to an array of command indexes
+        return np.array([self.command_index[command] for command in commands.split()], dtype=np.intp)
+
+    def get_commands(self, command_indexes):
+        # converts a sequence of command indexes back to a command string for Cube.move()
+        return ' '.join(self.commands[i] for i in command_indexes)
+
+    def set_cube(self, i, cube):
+        self.state[i] = cube.state
+
+    def get_cube(self, i):
+        # the batch never checks its rows, so the cube is returned with validation 'off' - see cube_valid()
+        cube = Cube()
+        cube.set_validation('off')
+        cube.state = tuple(int(color) for color in self.state[i])
+        cube.squares_dirty = set(range(len(cube.state)))
+        return cube
+
+    ######### moves
+
+    def move(self, moves):
+        # moves is either one command index per cube, or a command string applied to every cube
+        if isinstance(moves, str):
+            for i in self.get_command_indexes(moves):
+                self.state = self.state[:, self.perms[i]]
+        else:
+            # gather through the flattened array - faster than take_along_axis for a different move per cube
+            moves = np.asarray(moves, dtype=np.intp)
+            if moves.shape != (len(self),):
+                raise ValueError(f'CubeBatch.move - expected one move per cube ({len(self)}), got shape {moves.shape}')
+            index = self.perms[moves]
+            index += self.row_offsets
+            self.state = np.take(self.state, index)
+
+    def scramble(self, commands_cnt):
+        # returns the (N, commands_cnt) command indexes applied to each cube
+        commands = self.rng.integers(0, self.slice_cnt, size=(len(self), commands_cnt))
+        for column in range(commands_cnt):
+            self.move(commands[:, column])
+        return commands
+
+    def restart(self):
+        self.state[:] = self.state_restart
+
+    ######### checks
+
+    def is_solved(self):
+        faces = self.state.reshape(len(self), 6, 9)
+        return (faces == faces[:, :, 4:5]).all(axis=(1, 2))
+
+    def cube_valid(self):
+        # mirrors Cube.cube_valid() - every color on 9 squares, no center, edge or corner repeating a color, and no
+        # two edges or corners with the same colors
+        color_cnt = np.stack([(self.state == color).sum(axis=1) for color in range(6)], axis=1)
+        valid = (color_cnt == 9).all(axis=1)
+
+        centers = self.state[:, self.center_index]
+        valid &= (np.sort(centers, axis=1) == np.arange(6)).all(axis=1)
+
+        edges = self.state[:, self.edge_index]
+        valid &= (edges[:, :, 0] != edges[:, :, 1]).all(axis=1)
+
+        corners = self.state[:, self.corner_index]
+        valid &= (corners[:, :, 0] != corners[:, :, 1]).all(axis=1)
+        valid &= (corners[:, :, 0] != corners[:, :, 2]).all(axis=1)
+        valid &= (corners[:, :, 1] != corners[:, :, 2]).all(axis=1)
+
+        # no two edges or corners with the same colors - each cubelet's set of colors as a bit mask
+        for cubelets in (edges, corners):
+            masks = np.sort(np.bitwise_or.reduce(np.left_shift(1, cubelets.astype(np.intp)), axis=2), axis=1)
+            valid &= (masks[:, 1:] != masks[:, :-1]).all(axis=1)
+        return valid
@@ -0,0 +1,198 @@
+# cubie.py
+
+"""
+Cubie level model of the Rubik's cube.
+
+Cube tracks the color of each of the 54 squares (facelets). CubieCube tracks the pieces instead:
+- the corner in each of the 8 corner positions, and its twist (0, 1, 2)
+- the edge in each of the 12 edge positions, and its flip (0, 1)
+- the color of each of the 6 centers, which records the orientation of the cube after slice and turn commands
+
+Positions and pieces use the conventional names (URF, UFL, ..., UR, UF, ...) and numbering of the two-phase
+algorithm. A piece is named after the position it occupies on the solved cube. The first square of every position
+is its reference square: the up/down square of corners and of up/down layer edges, and the front/back square of
+middle layer edges. Twist and flip count how far the reference color of the piece (its white/yellow, or for middle
+layer edges its green/blue square) is turned from the reference square of its position. Corner squares are listed
+clockwise, so a move only ever shifts a twist by a fixed amount.
+
+Moves are defined directly on cubies, derived once from the permutations Cube compiles for each command.
+"""
+
+from RCv11 import Cube
+
+
+##########################################################################
+class CubieCube:
+
+    #   primary methods
+    #   from_state() / to_state() - lossless conversion to and from a Cube state
+    #   from_squares() / to_squares() - lossless conversion to and from a squares dict (eg. cube.squares.copy())
+    #   multiply() - applies the pieces movement of another CubieCube to this one
+    #   move() - executes a list of commands in the Cube.move() vocabulary
+    #   to_bytes() / from_bytes() - compact 26 byte form
+
+    CORNER_NAMES = ('URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB')
+    CORNER_FACELETS = Cube.CORNER_REFERENCE
+
+    EDGE_NAMES = ('UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR')
+    EDGE_FACELETS = Cube.EDGE_REFERENCE
+
+    CENTER_FACELETS = Cube.CENTER_REFERENCE
+
+    # color index (see Cube.COLORS) shown on each face of the solved cube
+    FACE_COLORS = {face: i for i, face in enumerate('budlfr')}
+
+    MOVES = {}  # command: CubieCube describing the pieces movement of the command
+
+    def __init__(self, cp=None, co=None, ep=None, eo=None, centers=None):
+        self.cp = list(range(8)) if cp is None else list(cp)  # corner in each corner position
+        self.co = [0] * 8 if co is None else list(co)  # twist of each corner position
+        self.ep = list(range(12)) if ep is None else list(ep)  # edge in each edge position
+        self.eo = [0] * 12 if eo is None else list(eo)  # flip of each edge position
+        self.centers = [self.FACE_COLORS[key[0]] for key in self.CENTER_FACELETS] if centers is None \
+            else list(centers)  # color of each center position
+
+    def __eq__(self, other):
+        return isinstance(other, CubieCube) and self.to_bytes() == other.to_bytes()
+
+    def __hash__(self):
+        return hash(self.to_bytes())
+
+    def __repr__(self):
+        return f'CubieCube(cp={self.cp}, co={self.co}, ep={self.ep}, eo={self.eo}, centers={self.centers})'
+
+    def copy(self):
+        return CubieCube(self.cp, self.co, self.ep, self.eo, self.centers)
+
+    def is_solved(self):
+        # true if every face shows a single color, whatever the orientation of the cube
+        state = self.to_state()
+        return all(len(set(state[i:i + 9])) == 1 for i in range(0, len(state), 9))
+
+    ######### conversion
+
+    @classmethod
+    def piece_colors(cls, facelets):
+        # colors of a piece on the solved cube, in the order of its facelets
+        return tuple(cls.FACE_COLORS[key[0]] for key in facelets)
+
+    @classmethod
+    def from_state(cls, state):
+        # state - tuple of color indexes laid out as Cube.SQUARE_KEYS
+        index = Cube.SQUARE_INDEX
+        cubie = cls(centers=[state[index[key]] for key in cls.CENTER_FACELETS])
+
+        def find_piece(pieces_facelets, colors):
+            # returns (piece, orientation) for the colors read from a position
+            for piece, facelets in enumerate(pieces_facelets):
+                piece_colors = cls.piece_colors(facelets)
+                if sorted(piece_colors) == sorted(colors):
+                    # the first color of a piece is its reference color
+                    return piece, colors.index(piece_colors[0])
+            raise ValueError(f'CubieCube - no piece with colors {colors}')
+
+        for position, facelets in enumerate(cls.CORNER_FACELETS):
+            colors = [state[index[key]] for key in facelets]
+            cubie.cp[position], cubie.co[position] = find_piece(cls.CORNER_FACELETS, colors)
+
+        for position, facelets in enumerate(cls.EDGE_FACELETS):
+            colors = [state[index[key]] for key in facelets]
+            cubie.ep[position], cubie.eo[position] = find_piece(cls.EDGE_FACELETS, colors)
+        return cubie
+
+    def to_state(self):
+        index = Cube.SQUARE_INDEX
+        state = [0] * len(Cube.SQUARE_KEYS)
+        for key in Cube.SQUARE_KEYS:
+            if key[1:] == '11':
+                state[index[key]] = self.centers[self.CENTER_FACELETS.index(key)]
+
+        for position, facelets in enumerate(self.CORNER_FACELETS):
+            colors = self.piece_colors(self.CORNER_FACELETS[self.cp[position]])
+            for i, key in enumerate(facelets):
+                state[index[key]] = colors[(i - self.co[position]) % 3]
+
+        for position, facelets in enumerate(self.EDGE_FACELETS):
+            colors = self.piece_colors(self.EDGE_FACELETS[self.ep[position]])
+            for i, key in enumerate(facelets):
+                state[index[key]] = colors[(i - self.eo[position]) % 2]
+        return tuple(state)
+
+    @classmethod
+    def from_state_centered(cls, state):
+        # reads the colors relative to the current centers - each color is taken as the face whose center shows it,
+        # so the centers are at home and face turns alone solve the cube (whatever slices or turns were applied)
+        # raises ValueError if two centers show the same color, or the colors do not form the pieces of a cube
+        index = Cube.SQUARE_INDEX
+        face_of_color = {state[index[face + '11']]: cls.FACE_COLORS[face] for face in 'budlfr'}
+        if len(face_of_color) != len(cls.CENTER_FACELETS):
+            raise ValueError(f'CubieCube - centers with repeated colors {sorted(face_of_color)}')
+        return cls.from_state(tuple(face_of_color[color] for color in state))
+
+    def solvable(self):
+        # true if face turns can solve the cube - corner twists and edge flips cancel out, and (with the centers at
+        # home) corners and edges have the same permutation parity
+        def parity(perm):
+            perm = list(perm)
+            transpositions = 0
+            for i in range(len(perm)):
+                while perm[i] != i:
+                    j = perm[i]
+                    perm[i], perm[j] = perm[j], j
+                    transpositions += 1
+            return transpositions % 2
+
+        return sum(self.co) % 3 == 0 and sum(self.eo) % 2 == 0 and \
+            self.centers == CubieCube().centers and parity(self.cp) == parity(self.ep)
+
+    @classmethod
+    def from_squares(cls, squares, colors):
+        # squares - {key: color}, colors - color names in Cube.COLORS order
+        return cls.from_state(tuple(colors.index(squares[key]) for key in Cube.SQUARE_KEYS))
+
+    def to_squares(self, colors):
+        return {key: colors[color] for key, color in zip(Cube.SQUARE_KEYS, self.to_state())}
+
+    @classmethod
+    def from_cube(cls, cube):
+        return cls.from_state(cube.state)
+
+    def to_bytes(self):
+        # one byte per corner (piece * 3 + twist), per edge (piece * 2 + flip) and per center
+        corners = [piece * 3 + twist for piece, twist in zip(self.cp, self.co)]
+        edges = [piece * 2 + flip for piece, flip in zip(self.ep, self.eo)]
+        return bytes(corners + edges + self.centers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls([value // 3 for value in data[:8]], [value % 3 for value in data[:8]],
+                   [value // 2 for value in data[8:20]], [value % 2 for value in data[8:20]],
+                   list(data[20:26]))
+
+    ######### moves
+
+    @classmethod
+    def compile_moves(cls):
+        # derives the cubie form of every command from the permutation Cube compiles for it
+        if not Cube.MOVES:
+            Cube.compile_moves()
+        solved = Cube().state
+        for command, perm in Cube.MOVES.items():
+            cls.MOVES[command] = cls.from_state(tuple(solved[i] for i in perm))
+
+    def multiply(self, other):
+        # applies the pieces movement described by other (eg. a move) to this cube
+        self.co = [(self.co[other.cp[i]] + other.co[i]) % 3 for i in range(8)]
+        self.cp = [self.cp[other.cp[i]] for i in range(8)]
+        self.eo = [(self.eo[other.ep[i]] + other.eo[i]) % 2 for i in range(12)]
+        self.ep = [self.ep[other.ep[i]] for i in range(12)]
+        solved_centers = CubieCube().centers
+        self.centers = [self.centers[solved_centers.index(color)] for color in other.centers]
+        return self
+
+    def move(self, commands):
+        if not self.MOVES:
+            self.compile_moves()
+        for command in commands.split():
+            self.multiply(self.MOVES[command])
+        return self
@@ -0,0 +1,279 @@
+# optimal.py
+
+"""
+Optimal solver for lightly scrambled cubes - returns the shortest possible solution.
+
+Intended for cubes within roughly 12-14 quarter turns of solved (eg. the "shortest fix" for a user who applied only
+a few commands). The solver runs IDA* over the 12 face quarter turns of Cube.SLICE_COMMANDS (l, li, r, ri, u, ui,
+d, di, f, fi, b, bi - the middle slices are left out, as each is two face turns plus a whole cube turn), so a
+solution is optimal in the quarter turn metric.
+
+The heuristic is the maximum of several pattern databases - the exact number of quarter turns needed to solve a
+group of pieces on its own:
+- 2 corner databases, each with the positions and twists of 4 corners (136,080 entries)
+- 3 edge databases, each with the positions and flips of 4 edges (190,080 entries)
+
+Sequences that can not be part of a shortest solution are never searched - a turn followed by its inverse, three
+turns of a face in the same direction, a half turn written counter clockwise (ri ri is the same as r r), and
+turns of opposite faces in the non canonical order (d u is the same as u d).
+
+The databases and their move tables are generated once, saved next to the two-phase tables, and memory mapped.
+
+CrossSolver uses the database of the up face edges on its own, to solve the first step of Solve (the cross) in the
+fewest quarter turns - see Solve.set_cross_solver().
+"""
+
+import array
+import os
+import time
+
+from cubie import CubieCube
+from two_phase import TABLES_PATH, build_pruning_table, map_table, save_table, table_file
+
+FACES = 'urfdlb'  # opposite faces are 3 apart
+MOVE_CNT = 12  # move m turns face FACES[m // 2], clockwise if m is even
+
+CORNER_GROUPS = ((0, 1, 2, 3), (4, 5, 6, 7))
+EDGE_GROUPS = ((0, 1, 2, 3), (4, 5, 6, 7), (8, 9, 10, 11))
+
+PREFIX = 'optimal_'
+
+
+##########################################################################
+# pattern database coordinates - positions and orientations of a group of pieces
+
+def get_group(positions, orientations, position_cnt, orientation_cnt):
+    # ordered positions of the pieces (a partial permutation) as the major part, their orientations as the minor
+    rank = 0
+    for i, position in enumerate(positions):
+        smaller = position - sum(1 for previous in positions[:i] if previous < position)
+        rank = rank * (position_cnt - i) + smaller
+    for orientation in orientations:
+        rank = rank * orientation_cnt + orientation
+    return rank
+
+
+def set_group(rank, piece_cnt, position_cnt, orientation_cnt):
+    orientations = []
+    for i in range(piece_cnt):
+        orientations.append(rank % orientation_cnt)
+        rank //= orientation_cnt
+    orientations.reverse()
+
+    digits = []
+    for i in range(piece_cnt - 1, -1, -1):
+        digits.append(rank % (position_cnt - i))
+        rank //= position_cnt - i
+    digits.reverse()
+    free_positions = list(range(position_cnt))
+    positions = [free_positions.pop(digit) for digit in digits]
+    return positions, orientations
+
+
+def group_size(piece_cnt, position_cnt, orientation_cnt):
+    size = orientation_cnt ** piece_cnt
+    for i in range(piece_cnt):
+        size *= position_cnt - i
+    return size
+
+
+def move_cubies():
+    return [CubieCube().move(FACES[move // 2] + ('' if move % 2 == 0 else 'i')) for move in range(MOVE_CNT)]
+
+
+def piece_moves(perm_name, orientation_name, orientation_cnt):
+    # for each move - where the piece in each position goes, and the orientation it gains on the way
+    moves = []
+    for cubie in move_cubies():
+        perm = getattr(cubie, perm_name)
+        orientation = getattr(cubie, orientation_name)
+        destination = [0] * len(perm)
+        for target, source in enumerate(perm):
+            destination[source] = target
+        moves.append((destination, [orientation[destination[position]] for position in range(len(perm))]))
+    return moves
+
+
+def build_group_move_table(group, position_cnt, orientation_cnt, perm_name, orientation_name):
+    moves = piece_moves(perm_name, orientation_name, orientation_cnt)
+    size = group_size(len(group), position_cnt, orientation_cnt)
+    table = array.array('I', [0] * (size * MOVE_CNT))
+    for rank in range(size):
+        positions, orientations = set_group(rank, len(group), position_cnt, orientation_cnt)
+        for move, (destination, twist) in enumerate(moves):
+            table[rank * MOVE_CNT + move] = get_group(
+                [destination[position] for position in positions],
+                [(orientation + twist[position]) % orientation_cnt
+                 for position, orientation in zip(positions, orientations)],
+                position_cnt, orientation_cnt)
+    return table
+
+
+DATABASES = tuple(
+    [('corners' + ''.join(map(str, group)), group, 8, 3, 'cp', 'co') for group in CORNER_GROUPS] +
+    [('edges' + ''.join(map(str, group)), group, 12, 2, 'ep', 'eo') for group in EDGE_GROUPS])
+
+
+def generate_database(path, database):
+    name, group, position_cnt, orientation_cnt, perm_name, orientation_name = database
+    if os.path.exists(table_file(path, name + '_prun', PREFIX)):
+        return
+    move_table = build_group_move_table(group, position_cnt, orientation_cnt, perm_name, orientation_name)
+    save_table(path, name + '_move', move_table, PREFIX)
+    # the solved group is ranked by its home positions, not 0
+    size = group_size(len(group), position_cnt, orientation_cnt)
+    solved = get_group(list(group), [0] * len(group), position_cnt, orientation_cnt)
+    save_table(path, name + '_prun',
+               build_pruning_table(1, array.array('I', [0] * MOVE_CNT), size, move_table, MOVE_CNT, solved),
+               PREFIX)
+
+
+def generate_tables(path=TABLES_PATH):
+    for database in DATABASES:
+        generate_database(path, database)
+
+
+def get_rank(cubie, database):
+    name, group, position_cnt, orientation_cnt, perm_name, orientation_name = database
+    perm = getattr(cubie, perm_name)
+    orientation = getattr(cubie, orientation_name)
+    positions = [perm.index(piece) for piece in group]
+    return get_group(positions, [orientation[position] for position in positions], position_cnt, orientation_cnt)
+
+
+def format_moves(moves):
+    return ' '.join(FACES[move // 2] + ('' if move % 2 == 0 else 'i') for move in moves)
+
+
+##########################################################################
+class OptimalSolver:
+
+    #   primary methods
+    #   solve() - returns the shortest solution for a cube, as commands for Cube.move()
+    #   stats() - node throughput of the last search and memory footprint of the databases
+
+    def __init__(self, path=TABLES_PATH):
+        generate_tables(path)
+        self.move_tables = []
+        self.pruning_tables = []
+        for name, group, position_cnt, orientation_cnt, perm_name, orientation_name in DATABASES:
+            self.move_tables.append(map_table(path, name + '_move', 'I', PREFIX))
+            self.pruning_tables.append(map_table(path, name + '_prun', 'B', PREFIX))
+
+        self.nodes_cnt = 0
+        self.seconds = 0.0
+        self.time_end = 0.0
+        self.solution = []
+
+    @staticmethod
+    def get_ranks(cubie):
+        return [get_rank(cubie, database) for database in DATABASES]
+
+    def distance(self, ranks):
+        return max(table[rank] for table, rank in zip(self.pruning_tables, ranks))
+
+    def stats(self):
+        return {'nodes': self.nodes_cnt, 'seconds': self.seconds,
+                'nodes_per_second': self.nodes_cnt / self.seconds if self.seconds else 0.0,
+                'database_bytes': sum(table.nbytes for table in self.pruning_tables),
+                'move_table_bytes': sum(table.nbytes for table in self.move_tables)}
+
+    @staticmethod
+    def skip_move(move, last_moves):
+        # last_moves - the 2 moves before this one (None if there are fewer)
+        last_move, before_last = last_moves
+        if last_move is None:
+            return False
+        face, last_face = move // 2, last_move // 2
+        if face == last_face:
+            # only r r is allowed - never r ri, ri r, ri ri (same as r r) or r r r (same as ri)
+            return move != last_move or move % 2 == 1 or before_last == move
+        return face == last_face - 3
+
+    def solve(self, cube, max_depth=14, timeout=None):
+        # cube - a Cube or CubieCube
+        # returns the shortest solution of up to max_depth quarter turns ('' if solved), or None if there is none
+        # (or timeout seconds ran out)
+        try:
+            cubie = cube if isinstance(cube, CubieCube) else CubieCube.from_state_centered(cube.state)
+        except ValueError:
+            # colors that do not form a cube
+            return None
+        if not cubie.solvable():
+            return None
+
+        time_start = time.perf_counter()
+        self.time_end = time_start + timeout if timeout is not None else float('inf')
+        self.nodes_cnt = 0
+        self.solution = []
+        ranks = self.get_ranks(cubie)
+        found = False
+        for depth in range(self.distance(ranks), max_depth + 1):
+            if self.search(ranks, depth, (None, None)):
+                found = True
+                break
+            if time.perf_counter() > self.time_end:
+                break
+        self.seconds = time.perf_counter() - time_start
+
+        if not found:
+            return None
+        return format_moves(self.solution)
+
+    def search(self, ranks, togo, last_moves):
+        self.nodes_cnt += 1
+        if togo == 0:
+            return all(table[rank] == 0 for table, rank in zip(self.pruning_tables, ranks))
+        if self.nodes_cnt & 0xffff == 0 and time.perf_counter() > self.time_end:
+            return False
+
+        for move in range(MOVE_CNT):
+            if self.skip_move(move, last_moves):
+                continue
+            new_ranks = [table[rank * MOVE_CNT + move] for table, rank in zip(self.move_tables, ranks)]
+            if self.distance(new_ranks) >= togo:
+                continue
+            self.solution.append(move)
+            if self.search(new_ranks, togo - 1, (move, last_moves[0])):
+                return True
+            self.solution.pop()
+        return False
+
+
+##########################################################################
+class CrossSolver:
+
+    #   primary methods
+    #   solve() - returns the shortest solution of the up face edges (the cross), as commands for Cube.move()
+
+    # the edge database of the up face edges (UR, UF, UL, UB - 190,080 positions and flips) is the exact number of
+    # quarter turns needed to solve the cross, so a shortest solution is read straight from it - from any state,
+    # a move to a state one turn closer is always among the 12
+    # only this database is generated (once, with the other databases), so the cross solver is quick to set up
+
+    DATABASE = DATABASES[len(CORNER_GROUPS)]  # edges0123
+
+    def __init__(self, path=TABLES_PATH):
+        generate_database(path, self.DATABASE)
+        name = self.DATABASE[0]
+        self.move_table = map_table(path, name + '_move', 'I', PREFIX)
+        self.distance_table = map_table(path, name + '_prun', 'B', PREFIX)
+
+    def solve(self, cube):
+        # cube - a Cube, CubeFrame or CubieCube - the cross is solved relative to its centers
+        # returns the shortest solution of the cross ('' if solved), or None if the colors do not form a cube
+        try:
+            cubie = cube if isinstance(cube, CubieCube) else CubieCube.from_state_centered(cube.state)
+        except ValueError:
+            return None
+        rank = get_rank(cubie, self.DATABASE)
+        moves = []
+        while self.distance_table[rank]:
+            distance = self.distance_table[rank]
+            for move in range(MOVE_CNT):
+                new_rank = self.move_table[rank * MOVE_CNT + move]
+                if self.distance_table[new_rank] < distance:
+                    break
+            moves.append(move)
+            rank = new_rank
+        return format_moves(moves)
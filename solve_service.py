@@ -0,0 +1,317 @@
+# solve_service.py
+
+"""
+Solve service - the solver as a long lived local server, instead of one process per request.
+
+Protocol - newline delimited JSON over a Unix or TCP socket. A connection can send any number of requests without
+waiting; responses are sent as each solve completes (match them by id).
+
+Requests
+- {"id": 1, "scramble": "r u fi"} - solves the cube left by commands for Cube.move() applied to a solved cube
+- {"id": 2, "state": [...]} - solves a cube state - 54 color indexes laid out as Cube.state, or a string of 54 face
+  letters ('budlfr') naming the face whose color each square shows
+    - optional "solver" - "layers" (default, Solve), "two_phase" (TwoPhaseSolver, if the service was started with
+      --two-phase) or "thistlethwaite" (ThistlethwaiteSolver, if started with --thistlethwaite - a few MB of tables,
+      for workers that can not afford the two-phase tables)
+    - optional "optimize" - true to simplify a layers solution with SequenceOptimizer
+- {"id": 3, "metrics": true} - queue depth, request latency and batching statistics
+
+Responses
+- {"id": 1, "success": true, "solution": "...", "moves_cnt": 112, "steps": [[1, 0, 21], ...]}
+- {"id": 2, "success": false, "error": "..."}
+
+Requests are collected for up to batch_wait seconds (or batch_size requests) and handed to a worker process as one
+batch, so concurrent clients share the cost of each hand off. Requests wait in the queue while every worker is busy,
+so batches grow with load. Each worker loads the Cube move definitions, a Solve with its SolutionCache and the
+(memory mapped) two-phase and Thistlethwaite tables once, when it starts.
+
+Usage: python3 solve_service.py [--unix PATH | --host HOST --port PORT] [--processes N] [--two-phase]
+[--thistlethwaite]
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import json
+import os
+import socket
+import time
+
+from RCv11 import Cube, CubeInvalidError, SequenceOptimizer, SolutionCache, Solve
+
+BATCH_SIZE = 32  # most requests per batch
+BATCH_WAIT = 0.002  # seconds to wait for more requests once a batch is started
+LATENCY_SAMPLES = 10000  # latencies kept for the metrics
+SOLVERS = ('layers', 'two_phase', 'thistlethwaite')
+
+# worker process globals - set once by worker_init()
+worker = {}
+
+
+def worker_init(two_phase_path, thistlethwaite_path=None):
+    worker['cube'] = Cube()
+    worker['cube'].set_validation('off')  # solve_request checks each state itself, with the reason it fails
+    worker['solve'] = Solve(worker['cube'])
+    worker['solve'].set_logging('silent', 'silent')
+    worker['solve'].set_solution_cache(SolutionCache())
+    if two_phase_path is not None:
+        from two_phase import TwoPhaseSolver
+        worker['two_phase'] = TwoPhaseSolver(two_phase_path)
+    if thistlethwaite_path is not None:
+        from thistlethwaite import ThistlethwaiteSolver
+        worker['thistlethwaite'] = ThistlethwaiteSolver(thistlethwaite_path)
+
+
+def solve_request(state, solver, optimize):
+    # returns the response (without id) for one cube
+    cube = worker['cube']
+    cube.state = state
+    cube.check_valid()
+    cube.check_invariants()
+
+    if solver != 'layers':
+        if solver not in worker:
+            return {'success': False, 'error': f'{solver} solver not loaded - start the service with '
+                                               f'--{solver.replace("_", "-")}'}
+        solution = worker[solver].solve(cube)
+        if solution is None:
+            return {'success': False, 'error': 'no solution found'}
+        return {'success': True, 'solution': solution, 'moves_cnt': len(solution.split())}
+
+    solve = worker['solve']
+    success, commands, steps, stats = solve.solve_plan(state)
+    if not success:
+        return {'success': False, 'error': str(stats['abort_error']) if stats['abort_error'] else 'solve failed'}
+    if optimize:
+        # the step boundaries do not survive the optimization
+        solution = SequenceOptimizer.optimize(' '.join(commands))
+        return {'success': True, 'solution': solution, 'moves_cnt': len(solution.split())}
+    return {'success': True, 'solution': ' '.join(commands), 'moves_cnt': len(commands), 'steps': steps}
+
+
+def solve_batch(requests):
+    # requests - [(state, solver, optimize), ...]
+    # a request that fails only fails its own response, never the rest of the batch
+    responses = []
+    for state, solver, optimize in requests:
+        try:
+            responses.append(solve_request(state, solver, optimize))
+        except CubeInvalidError as error:
+            responses.append({'success': False, 'error': str(error)})
+        except Exception as error:
+            responses.append({'success': False, 'error': repr(error)})
+    return responses
+
+
+def percentile(values, fraction):
+    # values - sorted
+    return values[min(int(fraction * len(values)), len(values) - 1)] if values else 0.0
+
+
+##########################################################################
+class SolveService:
+
+    #   primary methods
+    #   serve() - accepts connections until cancelled
+    #   parse_request() - the cube state, solver and options of a request
+    #   metrics() - queue depth, latency and batching statistics
+
+    def __init__(self, processes=None, two_phase_path=None, batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT,
+                 thistlethwaite_path=None):
+        if not Cube.MOVES:
+            Cube.compile_moves()
+        self.processes = processes or os.cpu_count() or 1
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.processes, initializer=worker_init,
+                                                           initargs=(two_phase_path, thistlethwaite_path))
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue = None  # (state, solver, optimize, response future) - created by serve()
+        self.workers_free = None  # semaphore - one batch per worker at a time
+
+        self.in_flight_cnt = 0  # requests handed to workers
+        self.requests_cnt = 0  # requests handed to the workers - malformed ones only count as errors
+        self.errors_cnt = 0
+        self.batches_cnt = 0
+        self.batched_cnt = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        return {
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'in_flight': self.in_flight_cnt,
+            'requests': self.requests_cnt,
+            'errors': self.errors_cnt,
+            'batches': self.batches_cnt,
+            'batch_size_mean': self.batched_cnt / self.batches_cnt if self.batches_cnt else 0.0,
+            'latency_ms': {'mean': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                           'p50': percentile(latencies, 0.50) * 1000,
+                           'p99': percentile(latencies, 0.99) * 1000},
+            'processes': self.processes}
+
+    @staticmethod
+    def parse_request(request):
+        # returns (state, solver, optimize) - raises ValueError for a malformed request
+        solver = request.get('solver', 'layers')
+        if solver not in SOLVERS:
+            raise ValueError(f'unknown solver: {solver}')
+        optimize = bool(request.get('optimize', False))
+
+        if 'scramble' in request:
+            commands = str(request['scramble']).split()
+            undefined = [command for command in commands if command not in Cube.MOVES]
+            if undefined:
+                raise ValueError(f'undefined commands: {undefined}')
+            cube = Cube()
+            cube.set_validation('off')
+            cube.move(' '.join(commands))
+            return cube.state, solver, optimize
+
+        state = request.get('state')
+        if isinstance(state, str):
+            if len(state) != len(Cube.SQUARE_KEYS) or any(face not in 'budlfr' for face in state):
+                raise ValueError(f'state must be {len(Cube.SQUARE_KEYS)} face letters (budlfr)')
+            return tuple('budlfr'.index(face) for face in state), solver, optimize
+        if isinstance(state, list) and len(state) == len(Cube.SQUARE_KEYS) and \
+                all(isinstance(color, int) and 0 <= color < 6 for color in state):
+            return tuple(state), solver, optimize
+        raise ValueError('request needs a "scramble" or a "state"')
+
+    async def serve(self, unix_path=None, host='127.0.0.1', port=8765):
+        self.queue = asyncio.Queue()
+        self.workers_free = asyncio.Semaphore(self.processes)
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        batcher = asyncio.create_task(self.batcher())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.pool.shutdown(cancel_futures=True)
+            if unix_path is not None and os.path.exists(unix_path):
+                os.remove(unix_path)
+
+    async def handle_client(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def respond(self, line, writer):
+        time_start = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('metrics'):
+                response = self.metrics()
+            else:
+                state, solver, optimize = self.parse_request(request)
+                self.requests_cnt += 1
+                future = asyncio.get_running_loop().create_future()
+                await self.queue.put((state, solver, optimize, future))
+                response = await future
+                self.latencies.append(time.perf_counter() - time_start)
+        except (ValueError, AttributeError) as error:
+            # malformed JSON is a ValueError too
+            response = {'success': False, 'error': str(error)}
+        if response.get('success') is False:
+            self.errors_cnt += 1
+
+        writer.write(json.dumps(dict(response, id=request_id)).encode() + b'\n')
+        await writer.drain()
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.workers_free.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches_cnt += 1
+            self.batched_cnt += len(batch)
+            self.in_flight_cnt += len(batch)
+            future = loop.run_in_executor(self.pool, solve_batch, [item[:3] for item in batch])
+            future.add_done_callback(functools.partial(self.batch_done, batch))
+
+    def batch_done(self, batch, future):
+        self.workers_free.release()
+        self.in_flight_cnt -= len(batch)
+        try:
+            responses = future.result()
+        except Exception as error:
+            # eg. a worker process died - fail the batch, not the service
+            responses = [{'success': False, 'error': repr(error)}] * len(batch)
+        for item, response in zip(batch, responses):
+            if not item[3].done():
+                item[3].set_result(response)
+
+
+def client_request(request, unix_path=None, host='127.0.0.1', port=8765):
+    # sends one request to a running service and returns its response - for front ends and scripts
+    if unix_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(unix_path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps(request).encode() + b'\n')
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rubik\'s cube solve service')
+    parser.add_argument('--unix', help='Unix socket path (instead of TCP)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--two-phase', action='store_true', help='load the two-phase tables for "solver": "two_phase"')
+    parser.add_argument('--thistlethwaite', action='store_true',
+                        help='load the Thistlethwaite tables for "solver": "thistlethwaite"')
+    args = parser.parse_args()
+
+    two_phase_path = None
+    if args.two_phase:
+        from two_phase import TABLES_PATH, generate_tables
+        # generate the tables once here, so the workers only map them
+        generate_tables(TABLES_PATH)
+        two_phase_path = TABLES_PATH
+    thistlethwaite_path = None
+    if args.thistlethwaite:
+        from thistlethwaite import TABLES_PATH, generate_tables
+        generate_tables(TABLES_PATH)
+        thistlethwaite_path = TABLES_PATH
+
+    service = SolveService(args.processes, two_phase_path, thistlethwaite_path=thistlethwaite_path)
+    print(f'Solve service on {args.unix or f"{args.host}:{args.port}"} with {service.processes} worker processes')
+    try:
+        asyncio.run(service.serve(args.unix, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
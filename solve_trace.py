@@ -0,0 +1,264 @@
+# solve_trace.py
+
+"""
+Compact binary trace of solves, and a replay tool that jumps to any move.
+
+File layout - each solve is appended to the file as
+- header - magic b'RCT1', checkpoint interval (uint16), the 54 byte starting state (laid out as Cube.state)
+- records, in solve order
+    - 0x00 - 0x15 - a single command (index into COMMANDS)
+    - 0xf0 step_nbr - start of a solve step
+    - 0xf1 move_index (uint32) state (54 bytes) - checkpoint, the full state after move_index commands
+    - 0xff success - end of the solve
+- index footer - (move_index, file offset) of each checkpoint (uint32 pairs), the checkpoint count (uint32) and
+  magic b'RCTI'
+
+Replay finds a solve through the footers (each index leads to the header of its solve, and so to the footer of the
+solve before it), seeks to the nearest checkpoint before the wanted move and applies only the commands after it, so
+the state at the point a solve failed (eg. commands looping) is available in milliseconds. A trace cut short (no
+footer) is indexed with a single scan instead.
+
+Usage: python3 solve_trace.py trace_path [move_index] [solve_index] - summary of a solve (default the last one) and
+the state at move_index (default the last move)
+"""
+
+import bisect
+import struct
+import sys
+
+from RCv11 import Cube
+
+MAGIC = b'RCT1'
+INDEX_MAGIC = b'RCTI'
+HEADER = struct.Struct('<4sH54s')
+CHECKPOINT = struct.Struct('<I54s')
+INDEX_ENTRY = struct.Struct('<II')
+FOOTER = struct.Struct('<I4s')
+
+COMMANDS = tuple(command for command, desc in Cube.SLICE_COMMANDS) + Cube.TURN_COMMANDS
+OPCODES = {command: i for i, command in enumerate(COMMANDS)}
+STEP = 0xf0
+CHECKPOINT_MARK = 0xf1
+END = 0xff
+
+CHECKPOINT_INTERVAL = 256  # commands between checkpoints
+STATE_SIZE = len(Cube.SQUARE_KEYS)
+READ_SIZE = 4096
+
+
+##########################################################################
+class TraceWriter:
+
+    #   primary methods
+    #   move() - records the commands of one Cube.move() call
+    #   step() - marks the start of a solve step
+    #   close() - ends the trace and writes the checkpoint index
+
+    def __init__(self, path, state, checkpoint_interval=CHECKPOINT_INTERVAL):
+        # the solve is appended to the solves already in the file
+        self.fout = open(path, 'ab')
+        start = self.fout.tell()
+        self.fout.write(HEADER.pack(MAGIC, checkpoint_interval, bytes(state)))
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints = [(0, start + HEADER.size - STATE_SIZE)]  # the header state is the checkpoint of move 0
+        self.moves_cnt = 0
+        self.moves_checkpoint = 0
+
+    def move(self, commands, state):
+        # state - the cube state after the commands
+        opcodes = bytes(OPCODES[command] for command in commands.split())
+        self.fout.write(opcodes)
+        self.moves_cnt += len(opcodes)
+        if self.moves_cnt - self.moves_checkpoint >= self.checkpoint_interval:
+            # checkpoints are only taken between calls, where the state is known
+            self.moves_checkpoint = self.moves_cnt
+            self.fout.write(bytes((CHECKPOINT_MARK,)))
+            self.checkpoints.append((self.moves_cnt, self.fout.tell() + CHECKPOINT.size - STATE_SIZE))
+            self.fout.write(CHECKPOINT.pack(self.moves_cnt, bytes(state)))
+
+    def step(self, step_nbr):
+        self.fout.write(bytes((STEP, step_nbr)))
+
+    def close(self, success):
+        self.fout.write(bytes((END, success)))
+        for entry in self.checkpoints:
+            self.fout.write(INDEX_ENTRY.pack(*entry))
+        self.fout.write(FOOTER.pack(len(self.checkpoints), INDEX_MAGIC))
+        self.fout.close()
+
+
+##########################################################################
+class TraceReader:
+
+    #   primary methods
+    #   state_at() - the state after a number of commands, replayed from the nearest checkpoint
+    #   cube_at() - a Cube in that state
+    #   scan() - reads the whole trace of the solve - commands, step starts and the result of the solve
+
+    def __init__(self, path, solve_index=-1):
+        # solve_index - the solve read, of the solves in the file (default the last one)
+        if not Cube.MOVES:
+            Cube.compile_moves()
+        self.fin = open(path, 'rb')
+        self.solves = self.read_solves()  # [(offset of the header, offset after the footer or None), ...]
+        if not self.solves:
+            raise ValueError(f'TraceReader - not a solve trace: {path}')
+        self.start, self.end = self.solves[solve_index]
+        self.fin.seek(self.start)
+        magic, self.checkpoint_interval, self.state_start = HEADER.unpack(self.fin.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f'TraceReader - not a solve trace: {path}')
+
+        # filled in by scan()
+        self.commands = None
+        self.steps = None  # [(step_nbr, index of the first command of the step), ...]
+        self.success = None  # None if the trace was cut short
+
+        self.checkpoints = self.read_index()  # [(move_index, offset of the checkpoint state), ...]
+        if self.checkpoints is None:
+            self.scan()
+
+    def close(self):
+        self.fin.close()
+
+    def read_footer(self, end):
+        # returns the checkpoints listed by the footer ending at offset end, or None if there is none
+        if end is None or end < HEADER.size + FOOTER.size:
+            return None
+        self.fin.seek(end - FOOTER.size)
+        checkpoints_cnt, magic = FOOTER.unpack(self.fin.read(FOOTER.size))
+        if magic != INDEX_MAGIC:
+            return None
+        self.fin.seek(end - FOOTER.size - checkpoints_cnt * INDEX_ENTRY.size)
+        data = self.fin.read(checkpoints_cnt * INDEX_ENTRY.size)
+        return [INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size) for i in range(checkpoints_cnt)]
+
+    def read_index(self):
+        # returns the checkpoints of the solve, or None if it was cut short
+        return self.read_footer(self.end)
+
+    def read_solves(self):
+        # returns [(offset of the header, offset after the footer), ...] of each solve in the file - followed from
+        # the last footer back, or found with a scan of the file if the last solve was cut short (its end is None)
+        self.fin.seek(0, 2)
+        end = self.fin.tell()
+        solves = []
+        while end > 0:
+            checkpoints = self.read_footer(end)
+            if not checkpoints:
+                break
+            start = checkpoints[0][1] - (HEADER.size - STATE_SIZE)
+            solves.append((start, end))
+            end = start
+        if end == 0:
+            return solves[::-1]
+
+        solves = []
+        start = 0
+        while True:
+            self.fin.seek(start)
+            header = self.fin.read(HEADER.size)
+            if len(header) < HEADER.size or HEADER.unpack(header)[0] != MAGIC:
+                return solves
+            checkpoints_cnt = 1
+            end = None
+            for offset, opcode, value in self.records(start + HEADER.size):
+                if opcode == CHECKPOINT_MARK:
+                    checkpoints_cnt += 1
+                elif opcode == END:
+                    end = offset + 2 + checkpoints_cnt * INDEX_ENTRY.size + FOOTER.size
+            solves.append((start, end))
+            if end is None:
+                return solves
+            start = end
+
+    def records(self, offset):
+        # yields (offset, opcode, value) for each record from offset to the end of the solve - value is the step
+        # number, the move_index of a checkpoint, or the success of the solve
+        # the file is read in blocks, so replaying from a checkpoint only reads what it needs
+        self.fin.seek(offset)
+        data = b''
+        i = 0
+        while True:
+            if len(data) - i < 1 + CHECKPOINT.size:
+                # refill - keep room for the longest record
+                offset += i
+                data = data[i:] + self.fin.read(READ_SIZE)
+                i = 0
+            if i >= len(data):
+                return
+            opcode = data[i]
+            if opcode == STEP and i + 1 < len(data):
+                yield offset + i, opcode, data[i + 1]
+                i += 2
+            elif opcode == CHECKPOINT_MARK and i + CHECKPOINT.size < len(data):
+                yield offset + i, opcode, CHECKPOINT.unpack_from(data, i + 1)[0]
+                i += 1 + CHECKPOINT.size
+            elif opcode == END and i + 1 < len(data):
+                yield offset + i, opcode, bool(data[i + 1])
+                return
+            elif opcode < STEP:
+                yield offset + i, opcode, None
+                i += 1
+            else:
+                # record cut short
+                return
+
+    def scan(self):
+        # returns the commands of the trace
+        self.commands = []
+        self.steps = []
+        self.checkpoints = [(0, self.start + HEADER.size - STATE_SIZE)]
+        for offset, opcode, value in self.records(self.start + HEADER.size):
+            if opcode == STEP:
+                self.steps.append((value, len(self.commands)))
+            elif opcode == CHECKPOINT_MARK:
+                self.checkpoints.append((value, offset + 1 + CHECKPOINT.size - STATE_SIZE))
+            elif opcode == END:
+                self.success = value
+            else:
+                self.commands.append(COMMANDS[opcode])
+        return self.commands
+
+    def state_at(self, move_index):
+        # state after the first move_index commands
+        position = bisect.bisect_right([index for index, offset in self.checkpoints], move_index) - 1
+        checkpoint_index, offset = self.checkpoints[position]
+        self.fin.seek(offset)
+        state = tuple(self.fin.read(STATE_SIZE))
+
+        moves_cnt = move_index - checkpoint_index
+        for record_offset, opcode, value in self.records(offset + STATE_SIZE):
+            if moves_cnt == 0:
+                break
+            if opcode < STEP:
+                state = tuple(state[i] for i in Cube.MOVES[COMMANDS[opcode]])
+                moves_cnt -= 1
+        if moves_cnt:
+            raise IndexError(f'TraceReader - trace has fewer than {move_index} commands')
+        return state
+
+    def cube_at(self, move_index):
+        cube = Cube()
+        cube.state = self.state_at(move_index)
+        return cube
+
+
+def main(path, move_index=None, solve_index=-1):
+    reader = TraceReader(path, solve_index)
+    commands = reader.scan() if reader.commands is None else reader.commands
+    print(f'Trace {path} - solve {solve_index % len(reader.solves) + 1} of {len(reader.solves)}, '
+          f'{len(commands)} commands, {len(reader.checkpoints)} checkpoints, solved: {reader.success}')
+    for step_nbr, first in reader.steps:
+        print(f'Step {step_nbr} from command #{first}')
+
+    move_index = len(commands) if move_index is None else move_index
+    cube = reader.cube_at(move_index)
+    print(f'State after command #{move_index} ({" ".join(commands[max(move_index - 10, 0):move_index])}):')
+    for face in 'budlfr':
+        print(face, ' '.join(cube.get_color(face + str(column) + str(row)) for row in range(3) for column in range(3)))
+    reader.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else None, int(sys.argv[3]) if len(sys.argv) > 3 else -1)
@@ -0,0 +1,137 @@
+import random
+import unittest
+from unittest import mock
+
+from RCv11 import Cube, CubeInvalidError
+
+
+def apply_commands(state, commands):
+    # one command at a time through the compiled moves
+    for command in commands.split():
+        state = tuple(state[i] for i in Cube.MOVES[command])
+    return state
+
+
+class CubeMoveTest(unittest.TestCase):
+
+    def test_sequence_matches_single_commands(self):
+        cube = Cube()
+        commands = 'r u fi m s ei tl d bi l l'
+        cube.move(commands)
+        self.assertEqual(cube.state, apply_commands(Cube().state, commands))
+
+    def test_render_net_changes(self):
+        cube = Cube()
+        cube.get_render_que()
+        cube.move('r ri u u u u')
+        self.assertEqual(cube.get_render_que(), {})
+
+        # the squares whose source moved, not every square a single command touched on the way
+        cube.move('r u')
+        labels = apply_commands(tuple(range(len(Cube.SQUARE_KEYS))), 'r u')
+        expected = {key: cube.get_color(key) for i, key in enumerate(Cube.SQUARE_KEYS) if labels[i] != i}
+        self.assertEqual(cube.get_render_que(), expected)
+        self.assertEqual(cube.get_render_que(), {})
+
+
+class CubeFindTest(unittest.TestCase):
+
+    def test_find_cubelet_matches_scan(self):
+        cube = Cube()
+        rng = random.Random(13)
+        cubelets = Cube.EDGE_CUBELETS + Cube.CORNER_CUBELETS
+        for i in range(20):
+            cube.move(' '.join(rng.choice(tuple(Cube.MOVES)) for j in range(10)))
+            for cubelet in cubelets:
+                colors = [cube.get_color(key) for key in cubelet]
+                self.assertEqual(cube.find_cubelet(*colors), list(cubelet))
+                self.assertEqual(cube.find_cubelet(*colors[::-1]), list(cubelet)[::-1])
+
+    def test_missing_cubelet(self):
+        cube = Cube()
+        self.assertIsNone(cube.find_cubelet('white', 'yellow'))
+
+    def test_repeated_color(self):
+        # b00 painted red makes the back-right-up corner white/red/red, which once matched the red/white edge
+        cube = Cube()
+        state = list(cube.state)
+        state[Cube.SQUARE_INDEX['b00']] = state[-1]
+        cube.set_validation('off')
+        cube.state = tuple(state)
+        self.assertIsNone(cube.locations)
+        self.assertRaises(CubeInvalidError, cube.find_cubelet, 'red', 'white')
+
+
+class CubeValidationTest(unittest.TestCase):
+
+    def flipped_edge_state(self):
+        cube = Cube()
+        cube.move(' '.join(random.Random(2).choice(tuple(Cube.MOVES)) for i in range(30)))
+        first, second = (Cube.SQUARE_INDEX[key] for key in Cube.EDGE_CUBELETS[0])
+        state = list(cube.state)
+        state[first], state[second] = state[second], state[first]
+        return tuple(state)
+
+    def test_scrambled_cube_is_valid(self):
+        cube = Cube()
+        rng = random.Random(1)
+        for i in range(20):
+            cube.move(' '.join(rng.choice(tuple(Cube.MOVES)) for j in range(10)))
+            cube.check_valid()
+            cube.check_invariants()
+
+    def test_invalid_colors(self):
+        cube = Cube()
+        state = list(cube.state)
+        state[0] = state[-1]
+        cube.set_validation('off')
+        cube.state = tuple(state)
+        with self.assertRaises(CubeInvalidError) as error:
+            cube.check_valid()
+        self.assertEqual(error.exception.reason, 'color count')
+        self.assertFalse(cube.cube_valid())
+
+    def test_flipped_edge(self):
+        cube = Cube()
+        cube.set_validation('off')
+        cube.state = self.flipped_edge_state()
+        cube.check_valid()
+        with self.assertRaises(CubeInvalidError) as error:
+            cube.check_invariants()
+        self.assertEqual(error.exception.reason, 'edge flip')
+
+    def test_levels(self):
+        cube = Cube()
+        cube.set_validation('off')
+        cube.state = self.flipped_edge_state()
+        cube.move('r u')
+        cube.set_validation('invariants')
+        self.assertRaises(CubeInvalidError, cube.move, 'r u')
+        self.assertRaises(ValueError, cube.set_validation, 'sometimes')
+
+    def test_state_checked_on_assignment(self):
+        # the default level checks a state when it is assigned, and the cube keeps its old state
+        cube = Cube()
+        cube.move('r u')
+        state = cube.state
+        with self.assertRaises(CubeInvalidError) as error:
+            cube.state = self.flipped_edge_state()
+        self.assertEqual(error.exception.reason, 'edge flip')
+        self.assertEqual(cube.state, state)
+        cube.check_invariants()
+        with self.assertRaises(CubeInvalidError):
+            cube.squares['u22'] = cube.squares['r00']
+        self.assertEqual(cube.state, state)
+
+    def test_moves_not_checked_by_default(self):
+        cube = Cube()
+        with mock.patch.object(cube, 'check_invariants') as check_invariants:
+            cube.move('r u fi')
+            check_invariants.assert_not_called()
+            cube.set_validation('invariants')
+            cube.move('r u fi')
+            check_invariants.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import random
+import unittest
+
+from RCv11 import Cube
+
+try:
+    import numpy
+    from cube_batch import CubeBatch
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'requires NumPy')
+class CubeBatchTest(unittest.TestCase):
+
+    def test_moves_match_cube(self):
+        batch = CubeBatch(20, seed=1)
+        commands = batch.scramble(30)
+        for i in range(len(batch)):
+            cube = Cube()
+            cube.move(batch.get_commands(commands[i]))
+            self.assertEqual(tuple(int(color) for color in batch.state[i]), cube.state)
+
+    def test_move_count_mismatch(self):
+        batch = CubeBatch(5)
+        self.assertRaises(ValueError, batch.move, [0, 1])
+        self.assertRaises(ValueError, batch.move, [[0] * 5])
+        self.assertEqual(batch.state.shape, (5, 54))
+        self.assertTrue(batch.is_solved().all())
+
+    def test_cube_valid_matches_cube(self):
+        # random swaps of squares - including states whose only fault is a repeated cubelet
+        rng = random.Random(4)
+        batch = CubeBatch(400, seed=4)
+        batch.scramble(20)
+        for i in range(len(batch)):
+            if i % 2:
+                state = batch.state[i].copy()
+                a, b = rng.sample(range(54), 2)
+                state[a], state[b] = state[b], state[a]
+                batch.state[i] = state
+        valid = batch.cube_valid()
+        for i in range(len(batch)):
+            self.assertEqual(bool(valid[i]), batch.get_cube(i).cube_valid(), i)
+
+    def test_repeated_cubelet(self):
+        # the back square of the up back edge swapped with the front square of the down front edge - every color
+        # still has 9 squares and every edge 2 colors, but up front and up back, down front and down back repeat
+        cube = Cube()
+        state = list(cube.state)
+        keys = {frozenset(key[0] for key in edge): edge for edge in Cube.EDGE_CUBELETS}
+        back = next(key for key in keys[frozenset('ub')] if key[0] == 'b')
+        front = next(key for key in keys[frozenset('df')] if key[0] == 'f')
+        a, b = Cube.SQUARE_INDEX[back], Cube.SQUARE_INDEX[front]
+        state[a], state[b] = state[b], state[a]
+        cube.set_validation('off')
+        cube.state = tuple(state)
+        self.assertFalse(cube.cube_valid())
+
+        batch = CubeBatch(2)
+        batch.state[1] = state
+        self.assertEqual(batch.cube_valid().tolist(), [True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
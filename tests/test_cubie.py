@@ -0,0 +1,49 @@
+import random
+import unittest
+
+from RCv11 import Cube
+from cubie import CubieCube
+
+
+def random_commands(rng, commands_cnt):
+    return ' '.join(rng.choice(tuple(Cube.MOVES)) for i in range(commands_cnt))
+
+
+class CubieCubeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cube = Cube()
+        self.rng = random.Random(12)
+
+    def test_state_round_trip(self):
+        for i in range(100):
+            self.cube.move(random_commands(self.rng, 5))
+            cubie = CubieCube.from_state(self.cube.state)
+            self.assertEqual(cubie.to_state(), self.cube.state)
+            self.assertEqual(CubieCube.from_squares(cubie.to_squares(self.cube.COLORS), self.cube.COLORS), cubie)
+
+    def test_bytes_round_trip(self):
+        for i in range(100):
+            self.cube.move(random_commands(self.rng, 5))
+            cubie = CubieCube.from_state(self.cube.state)
+            data = cubie.to_bytes()
+            self.assertEqual(len(data), 26)
+            self.assertEqual(CubieCube.from_bytes(data), cubie)
+            self.assertEqual(CubieCube.from_bytes(data).to_state(), self.cube.state)
+
+    def test_move_matches_cube(self):
+        cubie = CubieCube()
+        for i in range(100):
+            commands = random_commands(self.rng, 5)
+            self.cube.move(commands)
+            cubie.move(commands)
+            self.assertEqual(cubie.to_state(), self.cube.state, commands)
+
+    def test_unknown_piece(self):
+        state = list(self.cube.state)
+        state[Cube.SQUARE_INDEX['u22']] = state[Cube.SQUARE_INDEX['r00']]
+        self.assertRaises(ValueError, CubieCube.from_state, tuple(state))
+
+
+if __name__ == '__main__':
+    unittest.main()
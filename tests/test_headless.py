@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class HeadlessTest(unittest.TestCase):
+
+    def test_import_without_graphics(self):
+        # a fresh interpreter, so that no other test has imported graphics1 already
+        code = ('import sys, RCv11\n'
+                'cube = RCv11.Cube()\n'
+                'solve = RCv11.Solve(cube)\n'
+                'cube.move("r u")\n'
+                'print("graphics1" in sys.modules)\n')
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split()[-1], 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
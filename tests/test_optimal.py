@@ -0,0 +1,75 @@
+import random
+import unittest
+
+from RCv11 import Cube
+from optimal import CrossSolver, OptimalSolver
+
+# the solver generates its databases into two_phase.TABLES_PATH on first use, later runs load them
+
+FACE_TURNS = ('u', 'ui', 'd', 'di', 'l', 'li', 'r', 'ri', 'f', 'fi', 'b', 'bi')
+
+
+def is_solved(cube):
+    return all(len(set(cube.state[i:i + 9])) == 1 for i in range(0, len(cube.state), 9))
+
+
+class OptimalSolverTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.solver = OptimalSolver()
+
+    def test_round_trip(self):
+        cube = Cube()
+        rng = random.Random(7)
+        for i in range(10):
+            scramble = ' '.join(rng.choice(FACE_TURNS) for j in range(6))
+            cube.restart()
+            cube.move(scramble)
+            solution = self.solver.solve(cube)
+            self.assertIsNotNone(solution, scramble)
+            # no longer than undoing the scramble
+            self.assertLessEqual(len(solution.split()), 6, scramble)
+            cube.move(solution)
+            self.assertTrue(is_solved(cube), scramble)
+
+    def test_solved_and_out_of_depth(self):
+        self.assertEqual(self.solver.solve(Cube()), '')
+        cube = Cube()
+        cube.move('r u f l d b')
+        self.assertIsNone(self.solver.solve(cube, max_depth=4))
+
+    def test_unknown_piece(self):
+        cube = Cube()
+        cube.set_validation('off')
+        cube.squares['u22'] = cube.squares['r00']
+        self.assertIsNone(self.solver.solve(cube))
+
+
+class CrossSolverTest(unittest.TestCase):
+
+    def test_cross(self):
+        # the up face edges match the centers next to them (the slices of the scramble move the centers)
+        solver = CrossSolver()
+        cube = Cube()
+        rng = random.Random(8)
+        up_edges = [cubelet for cubelet in Cube.EDGE_CUBELETS if any(key.startswith('u') for key in cubelet)]
+        for i in range(50):
+            cube.restart()
+            cube.scramble(100, rng)
+            solution = solver.solve(cube)
+            # a shortest solution - no cross needs more than 8 quarter turns
+            self.assertLessEqual(len(solution.split()), 8, i)
+            cube.move(solution)
+            for key in (key for cubelet in up_edges for key in cubelet):
+                self.assertEqual(cube.get_color(key), cube.get_color(key[0] + '11'), (i, key))
+
+    def test_unknown_piece(self):
+        cube = Cube()
+        cube.set_validation('off')
+        cube.squares['u22'] = cube.squares['r00']
+        self.assertIsNone(CrossSolver().solve(cube))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import random
+import tempfile
+import unittest
+
+from RCv11 import Cube, Solve
+
+
+def new_solve():
+    cube = Cube()
+    solve = Solve(cube)
+    solve.log_path = os.path.join(tempfile.gettempdir(), 'rubikscube_test_trace.txt')
+    return cube, solve
+
+
+class SolveProfilerTest(unittest.TestCase):
+
+    def test_reports(self):
+        cube, solve = new_solve()
+        solve.set_profiling(True)
+        rng = random.Random(5)
+        for i in range(3):
+            cube.restart()
+            cube.scramble(100, rng)
+            self.assertTrue(solve.solve_cube())
+        self.assertEqual(len(solve.profiler.reports), 3)
+        report = solve.profiler.reports[-1]
+        self.assertTrue(report['success'])
+        self.assertEqual([step['step'] for step in report['steps']], [stats[0] for stats in solve.step_stats])
+        commands = ' '.join(solve.solution).split()
+        self.assertEqual(sum(step['quarter_turns'] for step in report['steps']),
+                         sum(command not in Cube.TURN_COMMANDS for command in commands))
+        self.assertGreater(sum(step['find_cubelet'] for step in report['steps']), 0)
+
+        summary = solve.profiler.summary()
+        self.assertIn('total', summary)
+        self.assertEqual(set(summary['total']), set(solve.profiler.METRICS))
+
+    def test_detach(self):
+        cube, solve = new_solve()
+        solve.set_profiling(True)
+        self.assertIn('move', vars(cube))
+        solve.set_profiling(False)
+        self.assertIsNone(solve.profiler)
+        self.assertNotIn('move', vars(cube))
+
+
+    def test_cube_turns(self):
+        # the same solve counts the same whole cube turns, whether they turn the cube or only the frame
+        turns = {}
+        for virtual_turns in (True, False):
+            cube, solve = new_solve()
+            solve.set_logging('silent', 'silent')
+            solve.set_virtual_turns(virtual_turns)
+            solve.set_profiling(True)
+            cube.scramble(100, random.Random(5))
+            self.assertTrue(solve.solve_cube())
+            turns[virtual_turns] = [step['cube_turns'] for step in solve.profiler.reports[-1]['steps']]
+        self.assertGreater(sum(turns[True]), 0)
+        self.assertEqual(turns[True], turns[False])
+
+
+if __name__ == '__main__':
+    unittest.main()
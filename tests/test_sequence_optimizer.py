@@ -0,0 +1,40 @@
+import random
+import unittest
+
+from RCv11 import Cube, SequenceOptimizer
+
+COMMANDS = tuple(command for command, desc in Cube.SLICE_COMMANDS) + Cube.TURN_COMMANDS
+
+
+def random_commands(rng, commands_cnt):
+    return ' '.join(rng.choice(COMMANDS) for i in range(commands_cnt))
+
+
+class SequenceOptimizerTest(unittest.TestCase):
+
+    def test_equivalent(self):
+        rng = random.Random(1)
+        for i in range(500):
+            commands = random_commands(rng, rng.randint(1, 30))
+            optimized = SequenceOptimizer.optimize(commands)
+            self.assertEqual(SequenceOptimizer.sequence_perm(optimized), SequenceOptimizer.sequence_perm(commands),
+                             commands)
+
+    def test_never_longer(self):
+        # reducing runs to whole cube turns once made these longer ('s bi di li' came out as 6 commands)
+        for commands in ('s bi di li', 'bi d bi f f si di'):
+            self.assertLessEqual(len(SequenceOptimizer.optimize(commands).split()), len(commands.split()))
+        rng = random.Random(2)
+        for i in range(2000):
+            commands = random_commands(rng, rng.randint(1, 12))
+            for keep_orientation in (True, False):
+                optimized = SequenceOptimizer.optimize(commands, keep_orientation)
+                self.assertLessEqual(len(optimized.split()), len(commands.split()), commands)
+
+    def test_cancels(self):
+        self.assertEqual(SequenceOptimizer.optimize('r ri u u u u'), '')
+        self.assertEqual(SequenceOptimizer.optimize('r r r'), 'ri')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from RCv11 import Cube, SolutionCache, Solve
+
+
+def is_solved(state):
+    return all(len(set(state[i:i + 9])) == 1 for i in range(0, len(state), 9))
+
+
+class SolutionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        # a few scrambles and their solutions
+        self.path = tempfile.mkdtemp()
+        cube = Cube()
+        solve = Solve(cube)
+        solve.set_logging('silent', 'silent')
+        solve.log_path = os.path.join(self.path, 'trace.txt')
+        rng = random.Random(14)
+        self.solved = []
+        for i in range(5):
+            cube.restart()
+            cube.scramble(100, rng)
+            state = cube.state
+            self.assertTrue(solve.solve_cube())
+            self.solved.append((state, solve.get_solution(optimized=False)))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def assert_solves(self, state, commands):
+        self.assertIsNotNone(commands)
+        cube = Cube()
+        # a mirror image has the mirrored color scheme, which the invariants of Cube do not allow for
+        cube.set_validation('off')
+        cube.state = state
+        cube.move(commands)
+        self.assertTrue(is_solved(cube.state))
+
+    def test_rotated(self):
+        cache = SolutionCache()
+        cube = Cube()
+        for state, commands in self.solved:
+            cache.put(state, commands)
+            self.assert_solves(state, cache.get(state))
+            # the same cube turned as a whole, in the caller's frame
+            for turns in ('tl', 'tu tu', 'tr td', 'td tl tl'):
+                cube.state = state
+                cube.move(turns)
+                self.assert_solves(cube.state, cache.get(cube.state))
+        self.assertEqual(cache.misses_cnt, 0)
+
+    def test_mirrored(self):
+        cache = SolutionCache(reflections=True)
+        cache_turns = SolutionCache()
+        for state, commands in self.solved:
+            cache.put(state, commands)
+            cache_turns.put(state, commands)
+            mirrored = tuple(state[i] for i in SolutionCache.MIRROR)
+            self.assert_solves(mirrored, cache.get(mirrored))
+            self.assertIsNone(cache_turns.get(mirrored))
+
+    def test_disk(self):
+        path = os.path.join(self.path, 'cache')
+        cache = SolutionCache(max_size=2, path=path)
+        for state, commands in self.solved:
+            cache.put(state, commands)
+        self.assertEqual(len(cache.entries), 2)
+        # evicted from memory, still on disk
+        self.assert_solves(self.solved[0][0], cache.get(self.solved[0][0]))
+        cache.close()
+
+        cache = SolutionCache(path=path)
+        for state, commands in self.solved:
+            self.assert_solves(state, cache.get(state))
+        self.assertEqual(cache.hits_cnt, len(self.solved))
+        cache.close()
+
+    def test_solve(self):
+        cube = Cube()
+        solve = Solve(cube)
+        solve.set_logging('silent', 'silent')
+        solve.log_path = os.path.join(self.path, 'trace.txt')
+        solve.set_solution_cache(SolutionCache())
+        state = self.solved[0][0]
+        for turns in ('', 'tl tu'):
+            cube.state = state
+            cube.move(turns)
+            self.assertTrue(solve.solve_cube())
+            self.assertTrue(is_solved(cube.state))
+        self.assertEqual(solve.solution_cache.hits_cnt, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
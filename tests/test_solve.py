@@ -0,0 +1,270 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from RCv11 import Cube, FirstTwoLayers, Solve
+from optimal import CrossSolver
+from solve_trace import TraceReader
+
+
+def is_solved(cube):
+    return all(len(set(cube.state[i:i + 9])) == 1 for i in range(0, len(cube.state), 9))
+
+
+def new_solve():
+    cube = Cube()
+    solve = Solve(cube)
+    solve.set_logging('silent', 'silent')
+    solve.log_path = os.path.join(tempfile.gettempdir(), 'rubikscube_test_trace.txt')
+    return cube, solve
+
+
+def scrambled_states(seed, states_cnt):
+    cube = Cube()
+    rng = random.Random(seed)
+    states = []
+    for i in range(states_cnt):
+        cube.restart()
+        cube.scramble(100, rng)
+        states.append(cube.state)
+    return states
+
+
+class SolveTest(unittest.TestCase):
+
+    def assert_solves(self, solve, cube, states):
+        for i, state in enumerate(states):
+            cube.state = state
+            self.assertTrue(solve.solve_cube(), i)
+            self.assertTrue(is_solved(cube), i)
+            # the recorded solution, optimized or not, solves the scrambled cube too
+            for optimized in (True, False):
+                cube.state = state
+                cube.move(solve.get_solution(optimized))
+                self.assertTrue(is_solved(cube), (i, optimized))
+
+    def test_round_trip(self):
+        cube, solve = new_solve()
+        states = scrambled_states(3, 200)
+        for virtual_turns in (True, False):
+            with self.subTest(virtual_turns=virtual_turns):
+                solve.set_virtual_turns(virtual_turns)
+                self.assert_solves(solve, cube, states)
+
+    def test_round_trip_cross_solver(self):
+        cube, solve = new_solve()
+        solve.set_cross_solver(CrossSolver())
+        self.assert_solves(solve, cube, scrambled_states(4, 100))
+
+    def test_cross_solver_unknown_piece(self):
+        # a cube the cross solver can not read fails step1 instead of raising
+        cube, solve = new_solve()
+        solve.set_cross_solver(CrossSolver())
+        cube.set_validation('off')
+        cube.squares['u22'] = cube.squares['r00']
+        self.assertFalse(solve.solve_cube())
+
+
+class SolvePlanTest(unittest.TestCase):
+
+    def test_plan_leaves_cube_untouched(self):
+        cube, solve = new_solve()
+        state = scrambled_states(5, 1)[0]
+        cube.state = state
+        success, commands, steps, stats = solve.solve_plan()
+        self.assertTrue(success)
+        self.assertEqual(cube.state, state)
+        cube.move(' '.join(commands))
+        self.assertTrue(is_solved(cube))
+
+        # the steps cover the commands, in order
+        self.assertEqual(steps[0][1], 0)
+        self.assertEqual(steps[-1][2], len(commands))
+        for step, next_step in zip(steps, steps[1:]):
+            self.assertEqual(step[2], next_step[1])
+        self.assertEqual(stats['moves_cnt'], len(commands))
+        self.assertIsNone(stats['abort_error'])
+
+    def test_plan_of_state(self):
+        cube, solve = new_solve()
+        state = scrambled_states(6, 1)[0]
+        success, commands, steps, stats = solve.solve_plan(state)
+        self.assertTrue(success)
+        self.assertTrue(is_solved(cube))
+        cube.state = state
+        cube.move(' '.join(commands))
+        self.assertTrue(is_solved(cube))
+
+
+    def test_plan_keeps_last_solve(self):
+        cube, solve = new_solve()
+        cube.state = scrambled_states(7, 1)[0]
+        self.assertTrue(solve.solve_cube())
+        results = solve.get_solution(), solve.moves_cnt, [list(stat) for stat in solve.step_stats]
+        success, commands, steps, stats = solve.solve_plan(scrambled_states(8, 1)[0])
+        self.assertTrue(success)
+        self.assertEqual((solve.get_solution(), solve.moves_cnt, solve.step_stats), results)
+        self.assertEqual(stats['moves_cnt'], len(commands))
+
+
+class SolveLoggingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cube, self.solve = new_solve()
+        self.solve.log_path = os.path.join(self.path, 'trace.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_rotation(self):
+        self.solve.set_logging('steps', max_bytes=500, backup_cnt=2)
+        for state in scrambled_states(7, 6):
+            self.cube.state = state
+            self.assertTrue(self.solve.solve_cube())
+        self.assertEqual(sorted(os.listdir(self.path)), ['trace.txt', 'trace.txt.1', 'trace.txt.2'])
+        for name in os.listdir(self.path):
+            with open(os.path.join(self.path, name)) as fin:
+                text = fin.read()
+            self.assertIn('Cube solved successfully: True', text)
+            self.assertNotIn('Cube solved successfully: True', text.split('\n', 1)[0])
+
+    def test_trace_only_failures(self):
+        self.solve.set_logging(trace_failures=True)
+        self.cube.state = scrambled_states(8, 1)[0]
+        self.assertTrue(self.solve.solve_cube())
+        self.assertFalse(os.path.exists(self.solve.log_path))
+
+        # the first step does its work, then reports failure
+        step1 = self.solve.step1
+
+        def failing_step1(*args):
+            yield from step1(*args)
+            return False
+
+        self.solve.step1 = failing_step1
+        self.cube.state = scrambled_states(9, 1)[0]
+        self.assertFalse(self.solve.solve_cube())
+        with open(self.solve.log_path) as fin:
+            lines = fin.read().splitlines()
+        self.assertIn('trace of failed solve', lines[0])
+        self.assertEqual(lines[-1], 'Cube solved successfully: False')
+        self.assertGreater(len(lines), 10)
+
+
+class SolveLimitsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cube, self.solve = new_solve()
+        self.cube.state = scrambled_states(10, 1)[0]
+
+    def assert_aborted(self, reason):
+        self.assertFalse(self.solve.solve_cube())
+        self.assertIsNotNone(self.solve.abort_error)
+        self.assertEqual(self.solve.abort_error.reason, reason)
+
+    def test_cycle(self):
+        # a step that turns the right face for ever - the fifth turn starts from the same state as the first
+        def looping_step(*args):
+            while True:
+                yield from self.solve.move_cube('r', 'Turning right.')
+
+        self.solve.step1 = looping_step
+        self.assert_aborted('cycle')
+        self.assertEqual(self.solve.abort_error.details['cycle_cnt'], 4)
+
+    def test_move_budget(self):
+        self.solve.set_limits(move_budget=20)
+        self.assert_aborted('move budget')
+        self.assertEqual(self.solve.abort_error.details['move_budget'], 20)
+        self.assertGreaterEqual(self.solve.moves_cnt, 20)
+
+    def test_timeout(self):
+        self.solve.set_limits(timeout=1e-9)
+        self.assert_aborted('timeout')
+
+    def test_no_limits(self):
+        self.solve.set_limits(move_budget=20, timeout=1e-9)
+        self.solve.set_limits(move_budget=0, timeout=0)
+        self.assertTrue(self.solve.solve_cube())
+        self.assertIsNone(self.solve.abort_error)
+
+
+class SolveIterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cube, self.solve = new_solve()
+        self.solve.log_path = os.path.join(self.path, 'trace.txt')
+        self.cube.state = scrambled_states(11, 1)[0]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_events(self):
+        events = list(self.solve.solve_iter())
+        self.assertEqual(events[0][:2], ('step', 1))
+        self.assertEqual(events[-1], ('done', True))
+        moves = [event[1] for event in events if event[0] == 'move']
+        self.assertEqual(' '.join(moves).split(), ' '.join(self.solve.solution).split())
+        self.assertTrue(is_solved(self.cube))
+
+    def test_close_mid_solve(self):
+        binary_path = os.path.join(self.path, 'trace.rct')
+        self.solve.set_logging('steps', binary_path=binary_path)
+        self.solve.set_profiling(True)
+        solve_iter = self.solve.solve_iter()
+        moves_cnt = 0
+        for event in solve_iter:
+            moves_cnt += event[0] == 'move'
+            if moves_cnt == 10:
+                break
+        solve_iter.close()
+
+        self.assertFalse(self.solve.profiler.reports[-1]['success'])
+        with open(self.solve.log_path) as fin:
+            self.assertEqual(fin.read().splitlines()[-1], 'Cube solved successfully: False')
+        self.assertIsNone(self.solve.binary_trace)
+        reader = TraceReader(binary_path)
+        self.assertEqual(reader.scan(), ' '.join(self.solve.solution).split())
+        self.assertIs(reader.success, False)
+        reader.close()
+
+
+
+class FirstTwoLayersTest(unittest.TestCase):
+
+    def test_extractions_reach_every_up_layer_pair(self):
+        FirstTwoLayers.compile()
+        positions = {(frozenset(corner), frozenset(edge)) for commands, corner, edge in FirstTwoLayers.EXTRACTIONS}
+        self.assertEqual(len(positions), 16)
+
+    def test_pieces_stuck_in_other_slots(self):
+        # scramble #1100 of this seed once made step2 extract pairs into each other's slots until it gave up
+        cube, solve = new_solve()
+        rng = random.Random(42)
+        for i in range(1101):
+            cube.restart()
+            cube.scramble(100, rng)
+        state = cube.state
+        for virtual_turns in (True, False):
+            with self.subTest(virtual_turns=virtual_turns):
+                cube.state = state
+                solve.set_virtual_turns(virtual_turns)
+                self.assertTrue(solve.solve_cube())
+                self.assertTrue(is_solved(cube))
+
+    def test_extraction_not_found(self):
+        # every pair stuck and no extraction for them fails the step instead of raising
+        cube, solve = new_solve()
+        cube.scramble(100, random.Random(8))
+        with mock.patch.object(FirstTwoLayers, 'insert', return_value=None), \
+                mock.patch.object(FirstTwoLayers, 'extract', return_value=None):
+            self.assertFalse(solve.solve_cube())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from RCv11 import Cube
+import solve_service
+from solve_service import SolveService
+
+
+def is_solved_by(state, solution):
+    cube = Cube()
+    cube.state = state
+    cube.move(solution)
+    return all(len(set(cube.state[i:i + 9])) == 1 for i in range(0, len(cube.state), 9))
+
+
+class ParseRequestTest(unittest.TestCase):
+
+    def test_scramble_and_state(self):
+        cube = Cube()
+        cube.move('r u fi')
+        self.assertEqual(SolveService.parse_request({'scramble': 'r u fi'}), (cube.state, 'layers', False))
+        letters = ''.join('budlfr'[color] for color in cube.state)
+        self.assertEqual(SolveService.parse_request({'state': letters, 'optimize': True}),
+                         (cube.state, 'layers', True))
+        self.assertEqual(SolveService.parse_request({'state': list(cube.state), 'solver': 'two_phase'}),
+                         (cube.state, 'two_phase', False))
+
+    def test_malformed(self):
+        for request in ({'scramble': 'r q'}, {'state': 'budlfr'}, {'state': [9] * 54}, {},
+                        {'scramble': 'r', 'solver': 'magic'}):
+            self.assertRaises(ValueError, SolveService.parse_request, request)
+
+
+class SolveBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        solve_service.worker_init(None)
+
+    def test_failed_request_fails_alone(self):
+        cube = Cube()
+        cube.move('r u fi')
+        responses = solve_service.solve_batch([
+            (cube.state, 'layers', False),
+            ((0,) * 10, 'layers', False),  # wrong length
+            (cube.state, 'two_phase', False),  # solver not loaded
+            (cube.state, 'layers', True)])
+        self.assertEqual([response['success'] for response in responses], [True, False, False, True])
+        for response in responses[::3]:
+            self.assertTrue(is_solved_by(cube.state, response['solution']))
+
+
+class SolveServiceTest(unittest.TestCase):
+
+    def serve(self, requests):
+        # sends the requests over one connection without waiting, returns the responses by id
+        path = self.path = os.path.join(tempfile.mkdtemp(), 'solve.sock')
+        service = self.service = SolveService(1)
+        responses = {}
+
+        async def run():
+            server = asyncio.create_task(service.serve(path))
+            while not os.path.exists(path):
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_unix_connection(path)
+            for request in requests:
+                writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            for request in requests:
+                response = json.loads(await reader.readline())
+                responses[response['id']] = response
+            writer.close()
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(run())
+        return responses
+
+    def test_serve(self):
+        cube = Cube()
+        cube.move('b l di')
+        responses = self.serve([{'id': 1, 'scramble': 'r u'}, {'id': 2, 'state': list(cube.state)},
+                                {'id': 3, 'scramble': 'f ri', 'optimize': True}])
+        self.assertTrue(is_solved_by(SolveService.parse_request({'scramble': 'r u'})[0], responses[1]['solution']))
+        self.assertTrue(is_solved_by(cube.state, responses[2]['solution']))
+        self.assertEqual(responses[2]['moves_cnt'], len(responses[2]['solution'].split()))
+        self.assertEqual(responses[2]['steps'][-1][2], responses[2]['moves_cnt'])
+        self.assertTrue(is_solved_by(SolveService.parse_request({'scramble': 'f ri'})[0], responses[3]['solution']))
+
+        responses = self.serve([{'id': 1, 'scramble': 'r u'}, {'id': 2, 'metrics': True}])
+        self.assertTrue(responses[1]['success'])
+        self.assertEqual(responses[2]['errors'], 0)
+
+
+    def test_errors(self):
+        # a malformed request is answered and counted as an error, but not as a request
+        responses = self.serve([{'id': 1, 'scramble': 'r u'}, {'id': 2, 'scramble': 'r q'}])
+        self.assertTrue(responses[1]['success'])
+        self.assertFalse(responses[2]['success'])
+        self.assertEqual(self.service.metrics()['requests'], 1)
+        self.assertEqual(self.service.metrics()['errors'], 1)
+        # the socket is removed on shutdown
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import random
+import tempfile
+import unittest
+
+from RCv11 import Cube, Solve
+from solve_trace import TraceReader
+
+
+class SolveTraceTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.rct')
+        os.close(handle)
+        os.remove(self.path)
+
+    def tearDown(self):
+        for path in (self.path, self.path + '.txt'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def solve_traced(self, solves_cnt):
+        # returns [(starting state, solution commands), ...] of solves_cnt seeded solves traced to self.path
+        cube = Cube()
+        solve = Solve(cube)
+        solve.set_logging('silent', 'silent', binary_path=self.path)
+        solve.log_path = self.path + '.txt'
+        rng = random.Random(3)
+        solves = []
+        for i in range(solves_cnt):
+            cube.restart()
+            cube.scramble(50, rng)
+            state = cube.state
+            self.assertTrue(solve.solve_cube())
+            solves.append((state, ' '.join(solve.solution).split()))
+        return solves
+
+    def test_replay(self):
+        [(state, commands)] = self.solve_traced(1)
+        reader = TraceReader(self.path)
+        self.assertEqual(reader.state_start, bytes(state))
+        self.assertEqual(reader.scan(), commands)
+        self.assertTrue(reader.success)
+        self.assertEqual(reader.steps[0], (1, 0))
+
+        # every state, whichever checkpoint it is replayed from, matches replaying the commands one at a time
+        cube = Cube()
+        cube.state = state
+        for move_index, command in enumerate(commands + [None]):
+            self.assertEqual(reader.state_at(move_index), cube.state, move_index)
+            if command is not None:
+                cube.move(command)
+        self.assertTrue(all(len(set(cube.state[i:i + 9])) == 1 for i in range(0, 54, 9)))
+        self.assertRaises(IndexError, reader.state_at, len(commands) + 1)
+        reader.close()
+
+
+    def test_every_solve_recorded(self):
+        solves = self.solve_traced(3)
+        for solve_index, (state, commands) in enumerate(solves):
+            reader = TraceReader(self.path, solve_index)
+            self.assertEqual(len(reader.solves), 3)
+            self.assertEqual(reader.state_start, bytes(state))
+            self.assertEqual(reader.scan(), commands)
+            self.assertTrue(reader.success)
+            cube = reader.cube_at(len(commands))
+            self.assertTrue(all(len(set(cube.state[i:i + 9])) == 1 for i in range(0, 54, 9)))
+            reader.close()
+
+    def test_cut_short(self):
+        solves = self.solve_traced(2)
+        with open(self.path, 'rb+') as fout:
+            fout.truncate(os.path.getsize(self.path) - 30)
+        reader = TraceReader(self.path)
+        self.assertEqual(len(reader.solves), 2)
+        self.assertIsNone(reader.success)
+        self.assertEqual(reader.state_start, bytes(solves[1][0]))
+        cube = Cube()
+        cube.state = solves[1][0]
+        cube.move(' '.join(solves[1][1][:10]))
+        self.assertEqual(reader.state_at(10), cube.state)
+        reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import random
+import tempfile
+import unittest
+
+from RCv11 import Cube, Solve
+from cubie import CubieCube
+from thistlethwaite import ThistlethwaiteSolver
+
+# the solver generates its tables into two_phase.TABLES_PATH on first use, later runs load them
+
+
+def is_solved(cube):
+    return all(len(set(cube.state[i:i + 9])) == 1 for i in range(0, len(cube.state), 9))
+
+
+def scrambled_states(seed, states_cnt):
+    cube = Cube()
+    rng = random.Random(seed)
+    states = []
+    for i in range(states_cnt):
+        cube.restart()
+        cube.scramble(100, rng)
+        states.append(cube.state)
+    return states
+
+
+class ThistlethwaiteSolverTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.solver = ThistlethwaiteSolver()
+
+    def test_round_trip(self):
+        cube = Cube()
+        for i, state in enumerate(scrambled_states(9, 50)):
+            cube.state = state
+            solution = self.solver.solve(cube)
+            self.assertIsNotNone(solution, i)
+            self.assertEqual(len(self.solver.phase_lengths), 4)
+            cube.move(solution)
+            self.assertTrue(is_solved(cube), i)
+
+    def test_solved_and_unsolvable(self):
+        self.assertEqual(self.solver.solve(Cube()), '')
+        cubie = CubieCube()
+        cubie.eo[0] = 1
+        self.assertIsNone(self.solver.solve(cubie))
+
+    def test_engine(self):
+        # the whole solve in one step of Solve, the cube turned as a whole first
+        cube = Cube()
+        solve = Solve(cube)
+        solve.set_logging('silent', 'silent')
+        solve.log_path = os.path.join(tempfile.gettempdir(), 'rubikscube_test_trace.txt')
+        solve.set_engine(self.solver)
+        for i, state in enumerate(scrambled_states(10, 20)):
+            cube.state = state
+            if i % 2:
+                cube.move('tl tu')
+            state = cube.state
+            self.assertTrue(solve.solve_cube(), i)
+            self.assertTrue(is_solved(cube), i)
+            self.assertEqual([stats[0] for stats in solve.step_stats], [1])
+            cube.state = state
+            cube.move(solve.get_solution())
+            self.assertTrue(is_solved(cube), i)
+
+    def test_unknown_piece(self):
+        # fails the solve, as a solver and as the engine of Solve
+        cube = Cube()
+        cube.set_validation('off')
+        cube.squares['u22'] = cube.squares['r00']
+        self.assertIsNone(self.solver.solve(cube))
+        solve = Solve(cube)
+        solve.set_logging('silent', 'silent')
+        solve.log_path = os.path.join(tempfile.gettempdir(), 'rubikscube_test_trace.txt')
+        solve.set_engine(self.solver)
+        self.assertFalse(solve.solve_cube())
+
+
+if __name__ == '__main__':
+    unittest.main()
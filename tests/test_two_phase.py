@@ -0,0 +1,48 @@
+import random
+import unittest
+
+from RCv11 import Cube
+from cubie import CubieCube
+from two_phase import TwoPhaseSolver
+
+# the solver generates its tables into two_phase.TABLES_PATH on first use, later runs load them
+
+
+def is_solved(cube):
+    return all(len(set(cube.state[i:i + 9])) == 1 for i in range(0, len(cube.state), 9))
+
+
+class TwoPhaseSolverTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.solver = TwoPhaseSolver()
+
+    def test_round_trip(self):
+        cube = Cube()
+        rng = random.Random(6)
+        for i in range(20):
+            cube.restart()
+            cube.scramble(100, rng)
+            solution = self.solver.solve(cube, max_length=30, timeout=1.0)
+            self.assertIsNotNone(solution, i)
+            cube.move(solution)
+            self.assertTrue(is_solved(cube), i)
+
+    def test_solved_and_unsolvable(self):
+        self.assertEqual(self.solver.solve(Cube()), '')
+        cubie = CubieCube()
+        cubie.co[0] = 1
+        self.assertIsNone(self.solver.solve(cubie))
+
+    def test_unknown_piece(self):
+        cube = Cube()
+        cube.set_validation('off')
+        cube.squares['u22'] = cube.squares['r00']
+        self.assertIsNone(self.solver.solve(cube))
+        cube.squares['u11'] = cube.squares['f11']
+        self.assertIsNone(self.solver.solve(cube))
+
+
+if __name__ == '__main__':
+    unittest.main()
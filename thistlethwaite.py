@@ -0,0 +1,351 @@
+# thistlethwaite.py
+
+"""
+Thistlethwaite solver for the Rubik's cube - a table light alternative to the layer by layer method of Solve.
+
+The cube is taken through 4 nested groups, each phase using only the moves of the group it starts in:
+- phase 1 - G0 = <U, D, R, L, F, B> to G1 = <U, D, R, L, F2, B2> - orients the edges
+- phase 2 - G1 to G2 = <U, D, R2, L2, F2, B2> - orients the corners, and moves the 4 middle layer edges into the
+  middle layer
+- phase 3 - G2 to G3 = <U2, D2, R2, L2, F2, B2> - moves the up and down layer edges into their slice (UF, UB, DF, DB
+  between the left and right faces, UR, UL, DR, DL between the front and back faces), and the corners into a
+  permutation half turns can solve
+- phase 4 - G3 to solved, with half turns only
+
+The pruning table of each phase holds the exact number of commands of Cube.move() from each of its states to the
+next group (a half turn is written as two quarter turns, eg. 'r r'), so the solution of a phase is read straight from
+its table (like optimal.CrossSolver) - there is no search, and every phase is as short as possible. As the phases
+reduce the cube about fixed axes, solving the cube in a few orientations gives different solutions - the shortest of
+4 orientations averages about 44 commands (31 face turns), in about 6 ms.
+
+Coordinates and pruning tables (about 2.7 MB in all, with the move tables)
+- phase 1 - flip (0 - 2047) - 2,048 entries
+- phase 2 - twist (0 - 2186) x slice (0 - 494) - 1,082,565 entries
+- phase 3 - corner coset (0 - 419) x tetrad (0 - 69) - 29,400 entries
+    - only 96 of the 40,320 corner permutations can be solved with half turns - a coset holds the permutations those
+      96 take to each other, when applied first
+    - tetrad - which 4 of the 8 up and down layer edge positions hold UF, UB, DF, DB
+- phase 4 - corners (the 96 half turn permutations) x the permutation of the edges within each of the 3 slices
+  (0 - 23 each) - 1,327,104 entries, half of them reachable
+
+The tables are generated once (well under a minute), saved to TABLES_PATH next to the two-phase tables, and memory
+mapped read only when they are loaded.
+
+Solve.set_engine() plugs the solver into Solve.solve_cube() and solve_iter(), in place of the layer by layer steps.
+"""
+
+import array
+import os
+from math import comb
+
+from RCv11 import SequenceOptimizer
+from cubie import CubieCube
+from two_phase import CORNERS_CNT, FLIP_CNT, MOVE_NAMES, NOT_VISITED, PHASE2_MOVES, SLICE_CNT, TABLES_PATH, \
+    TWIST_CNT, TwoPhaseSolver, apply_corner_orientation, apply_corner_perm, apply_edge_orientation, \
+    apply_edge_perm, build_move_table, face_move_cubies, get_flip, get_perm, get_slice, \
+    get_twist, map_table, save_table, set_flip, set_perm, set_slice, set_twist, table_file
+
+PREFIX = 'thistlethwaite_'
+
+# moves of each phase (the face turn numbers of two_phase) - the moves of the group the phase starts in
+PHASE_MOVES = (
+    tuple(range(len(MOVE_NAMES))),
+    tuple(MOVE_NAMES.index(name) for name in (
+        'u', 'u2', "u'", 'd', 'd2', "d'", 'r', 'r2', "r'", 'l', 'l2', "l'", 'f2', 'b2')),
+    PHASE2_MOVES,
+    tuple(MOVE_NAMES.index(name) for name in ('u2', 'r2', 'f2', 'd2', 'l2', 'b2')))
+
+# the edges of each slice - a half turn never moves an edge out of its slice
+M_EDGES = (1, 3, 5, 7)  # UF, UB, DF, DB
+S_EDGES = (0, 2, 4, 6)  # UR, UL, DR, DL
+E_EDGES = (8, 9, 10, 11)  # FR, FL, BL, BR
+
+CORNER_COSET_CNT = 420
+TETRAD_CNT = 70
+HALF_TURN_CORNERS_CNT = 96
+SLICE_EDGES_CNT = 24
+
+ORIENTATIONS = 4  # orientations of the cube solved by default - see ThistlethwaiteSolver.solve()
+
+
+##########################################################################
+# coordinates
+
+def get_tetrad(ep):
+    # combination of the up and down layer positions (0 - 7) holding UF, UB, DF, DB
+    a = 0
+    x = 0
+    for j in range(7, -1, -1):
+        if ep[j] in M_EDGES:
+            a += comb(7 - j, x + 1)
+            x += 1
+    return a
+
+
+def set_tetrad(a):
+    ep = [-1] * 8
+    x = 4
+    for j in range(8):
+        if x > 0 and a - comb(7 - j, x) >= 0:
+            ep[j] = M_EDGES[4 - x]
+            a -= comb(7 - j, x)
+            x -= 1
+    other_edges = iter(S_EDGES)
+    return [edge if edge >= 0 else next(other_edges) for edge in ep] + list(E_EDGES)
+
+
+def get_slice_edges(ep, edges):
+    # permutation of the edges of a slice, within the slice
+    return get_perm([edges.index(ep[position]) for position in edges])
+
+
+def set_slice_edges(rank, edges):
+    ep = list(range(12))
+    for position, i in zip(edges, set_perm(rank, 4)):
+        ep[position] = edges[i]
+    return ep
+
+
+def get_commands_cnt(move):
+    # a half turn is written as 2 quarter turns
+    return 2 if move % 3 == 1 else 1
+
+
+def half_turn_corners():
+    # the 96 corner permutations half turns can reach, the identity first
+    cubies = face_move_cubies()
+    perms = [tuple(range(8))]
+    seen = set(perms)
+    for perm in perms:
+        for move in PHASE_MOVES[3]:
+            new_perm = tuple(apply_corner_perm(perm, cubies[move]))
+            if new_perm not in seen:
+                seen.add(new_perm)
+                perms.append(new_perm)
+    return perms
+
+
+##########################################################################
+# tables
+
+def build_pruning_table(size_a, move_table_a, size_b, move_table_b, moves, start=0):
+    # like two_phase.build_pruning_table, but counting the commands of Cube.move() instead of face turns - a half
+    # turn is 2 commands, so it reaches the frontier after next
+    moves_cnt = len(moves)
+    table = bytearray([NOT_VISITED]) * (size_a * size_b)
+    table[start] = 0
+    frontiers = {0: [start]}
+    depth = 0
+    while frontiers:
+        for index in frontiers.pop(depth, []):
+            if table[index] < depth:
+                # reached sooner through a shorter path
+                continue
+            a, b = divmod(index, size_b)
+            a *= moves_cnt
+            b *= moves_cnt
+            for m, move in enumerate(moves):
+                new_depth = depth + get_commands_cnt(move)
+                new_index = move_table_a[a + m] * size_b + move_table_b[b + m]
+                if new_depth < table[new_index]:
+                    table[new_index] = new_depth
+                    frontiers.setdefault(new_depth, []).append(new_index)
+        depth += 1
+    return table
+
+
+def build_corner_cosets():
+    # returns (coset of each corner permutation by rank, a permutation of each coset) - coset 0 is the half turn
+    # permutations themselves
+    half_turns = half_turn_corners()
+    cosets = array.array('H', [0xffff] * CORNERS_CNT)
+    representatives = []
+    for rank in range(CORNERS_CNT):
+        if cosets[rank] == 0xffff:
+            cp = set_perm(rank, 8)
+            for perm in half_turns:
+                cosets[get_perm([perm[corner] for corner in cp])] = len(representatives)
+            representatives.append(cp)
+    return cosets, representatives
+
+
+def build_tables():
+    # returns {name: table} of every table
+    tables = {
+        'flip_move': build_move_table(FLIP_CNT, PHASE_MOVES[0], get_flip, set_flip, apply_edge_orientation),
+        'twist_move': build_move_table(TWIST_CNT, PHASE_MOVES[1], get_twist, set_twist, apply_corner_orientation),
+        'slice_move': build_move_table(SLICE_CNT, PHASE_MOVES[1], get_slice, set_slice, apply_edge_perm),
+        'tetrad_move': build_move_table(TETRAD_CNT, PHASE_MOVES[2], get_tetrad, set_tetrad, apply_edge_perm)}
+
+    cosets, representatives = build_corner_cosets()
+    tables['corner_coset'] = cosets
+    tables['coset_move'] = build_move_table(
+        CORNER_COSET_CNT, PHASE_MOVES[2], lambda cp: cosets[get_perm(cp)], lambda coset: representatives[coset],
+        apply_corner_perm)
+
+    half_turns = half_turn_corners()
+    index = {perm: i for i, perm in enumerate(half_turns)}
+    tables['corners_move'] = build_move_table(
+        HALF_TURN_CORNERS_CNT, PHASE_MOVES[3], lambda cp: index[tuple(cp)], lambda i: half_turns[i],
+        apply_corner_perm)
+    for name, edges in (('e_edges_move', E_EDGES), ('m_edges_move', M_EDGES), ('s_edges_move', S_EDGES)):
+        tables[name] = build_move_table(
+            SLICE_EDGES_CNT, PHASE_MOVES[3], lambda ep, edges=edges: get_slice_edges(ep, edges),
+            lambda rank, edges=edges: set_slice_edges(rank, edges), apply_edge_perm)
+
+    tables['phase1_prun'] = build_pruning_table(1, array.array('H', [0] * len(PHASE_MOVES[0])), FLIP_CNT,
+                                                tables['flip_move'], PHASE_MOVES[0])
+    tables['phase2_prun'] = build_pruning_table(TWIST_CNT, tables['twist_move'], SLICE_CNT, tables['slice_move'],
+                                                PHASE_MOVES[1], get_slice(list(range(12))))
+    tables['phase3_prun'] = build_pruning_table(CORNER_COSET_CNT, tables['coset_move'], TETRAD_CNT,
+                                                tables['tetrad_move'], PHASE_MOVES[2], get_tetrad(list(range(12))))
+
+    # phase 4 pairs the corners with the middle layer edges, and the other 2 slices
+    moves_cnt = len(PHASE_MOVES[3])
+    pairs = []
+    for (name_a, size_a), (name_b, size_b) in ((('corners_move', HALF_TURN_CORNERS_CNT),
+                                                  ('e_edges_move', SLICE_EDGES_CNT)),
+                                                 (('m_edges_move', SLICE_EDGES_CNT),
+                                                  ('s_edges_move', SLICE_EDGES_CNT))):
+        pair = array.array('H', [0] * (size_a * size_b * moves_cnt))
+        for a in range(size_a):
+            for b in range(size_b):
+                for m in range(moves_cnt):
+                    pair[(a * size_b + b) * moves_cnt + m] = \
+                        tables[name_a][a * moves_cnt + m] * size_b + tables[name_b][b * moves_cnt + m]
+        pairs.append((size_a * size_b, pair))
+    tables['phase4_prun'] = build_pruning_table(pairs[0][0], pairs[0][1], pairs[1][0], pairs[1][1], PHASE_MOVES[3])
+    return tables
+
+
+TABLES = (
+    # name, type code
+    ('flip_move', 'H'), ('twist_move', 'H'), ('slice_move', 'H'), ('tetrad_move', 'H'), ('corner_coset', 'H'),
+    ('coset_move', 'H'), ('corners_move', 'H'), ('e_edges_move', 'H'), ('m_edges_move', 'H'), ('s_edges_move', 'H'),
+    ('phase1_prun', 'B'), ('phase2_prun', 'B'), ('phase3_prun', 'B'), ('phase4_prun', 'B'))
+
+PHASES = (
+    # pruning table, (move table, size) of each coordinate
+    ('phase1_prun', (('flip_move', FLIP_CNT),)),
+    ('phase2_prun', (('twist_move', TWIST_CNT), ('slice_move', SLICE_CNT))),
+    ('phase3_prun', (('coset_move', CORNER_COSET_CNT), ('tetrad_move', TETRAD_CNT))),
+    ('phase4_prun', (('corners_move', HALF_TURN_CORNERS_CNT), ('e_edges_move', SLICE_EDGES_CNT),
+                     ('m_edges_move', SLICE_EDGES_CNT), ('s_edges_move', SLICE_EDGES_CNT))))
+
+
+def generate_tables(path=TABLES_PATH):
+    # builds and saves the tables, unless they are all there
+    if all(os.path.exists(table_file(path, name, PREFIX)) for name, type_code in TABLES):
+        return
+    for name, table in build_tables().items():
+        save_table(path, name, table, PREFIX)
+
+
+##########################################################################
+class ThistlethwaiteSolver:
+
+    #   primary methods
+    #   solve() - returns a solution for a cube, as commands for Cube.move()
+    #   table_bytes() - memory mapped by the solver
+
+    def __init__(self, path=TABLES_PATH):
+        generate_tables(path)
+        self.tables = {name: map_table(path, name, type_code, PREFIX) for name, type_code in TABLES}
+        self.half_turn_corners = {perm: i for i, perm in enumerate(half_turn_corners())}
+        self.move_cubies = face_move_cubies()
+        self.phase_lengths = []  # face turns of each phase of the last solve
+
+    def table_bytes(self):
+        return sum(table.nbytes for table in self.tables.values())
+
+    def get_coordinates(self, phase, cubie):
+        if phase == 0:
+            return [get_flip(cubie.eo)]
+        if phase == 1:
+            return [get_twist(cubie.co), get_slice(cubie.ep)]
+        if phase == 2:
+            return [self.tables['corner_coset'][get_perm(cubie.cp)], get_tetrad(cubie.ep)]
+        return [self.half_turn_corners[tuple(cubie.cp)], get_slice_edges(cubie.ep, E_EDGES),
+                get_slice_edges(cubie.ep, M_EDGES), get_slice_edges(cubie.ep, S_EDGES)]
+
+    def solve(self, cube, orientations=ORIENTATIONS):
+        # cube - a Cube, CubeFrame or CubieCube - solved relative to its centers
+        # orientations - number of orientations of the cube solved (1 - 24), the shortest solution is returned - the
+        # phases reduce the cube about fixed axes, so each orientation finds a different solution
+        # returns the solution ('' if solved), or None if the cube can not be solved
+        state = cube.to_state() if isinstance(cube, CubieCube) else cube.state
+        try:
+            if not CubieCube.from_state_centered(state).solvable():
+                return None
+        except ValueError:
+            # colors that do not form a cube
+            return None
+        if not SequenceOptimizer.ROTATIONS:
+            SequenceOptimizer.compile()
+
+        best_solution = None
+        for rotation in list(SequenceOptimizer.ROTATIONS)[:orientations]:
+            # solved as the cube turned by the rotation, then each command is relabeled to the face it turns
+            # before the rotation
+            cubie = CubieCube.from_state_centered(tuple(state[i] for i in rotation))
+            moves, phase_lengths = self.solve_cubie(cubie)
+            commands = TwoPhaseSolver.get_commands(moves).split()
+            if best_solution is None or len(commands) < len(best_solution):
+                best_solution = [SequenceOptimizer.CONJUGATES[(rotation, command)] for command in commands]
+                self.phase_lengths = phase_lengths
+        return ' '.join(best_solution)
+
+    def solve_cubie(self, cubie):
+        # returns (face turns solving cubie, face turns of each phase)
+        moves = []
+        phase_lengths = []
+        for phase in range(len(PHASES)):
+            phase_moves = self.solve_phase(phase, cubie)
+            for move in phase_moves:
+                cubie.multiply(self.move_cubies[move])
+            moves += phase_moves
+            phase_lengths.append(len(phase_moves))
+        return self.merge_moves(moves), phase_lengths
+
+    def solve_phase(self, phase, cubie):
+        # the moves taking cubie to the next group in the fewest commands - from any state, a move to a state closer
+        # by exactly the commands of the move is always among the moves of the phase
+        name, coordinate_tables = PHASES[phase]
+        distance_table = self.tables[name]
+        move_tables = [(self.tables[move_name], size) for move_name, size in coordinate_tables]
+        moves_cnt = len(PHASE_MOVES[phase])
+
+        def get_index(coordinates):
+            index = 0
+            for coordinate, (move_table, size) in zip(coordinates, move_tables):
+                index = index * size + coordinate
+            return index
+
+        coordinates = self.get_coordinates(phase, cubie)
+        distance = distance_table[get_index(coordinates)]
+        if distance == NOT_VISITED:
+            raise ValueError(f'ThistlethwaiteSolver - phase {phase + 1} can not be solved')
+        moves = []
+        while distance:
+            for i, move in enumerate(PHASE_MOVES[phase]):
+                new_coordinates = [move_table[coordinate * moves_cnt + i]
+                                   for coordinate, (move_table, size) in zip(coordinates, move_tables)]
+                if distance_table[get_index(new_coordinates)] == distance - get_commands_cnt(move):
+                    break
+            moves.append(move)
+            coordinates = new_coordinates
+            distance -= get_commands_cnt(move)
+        return moves
+
+    @staticmethod
+    def merge_moves(moves):
+        # turns of the same face meeting at the end of a phase are merged (eg. f then f2 is fi)
+        merged = []
+        for move in moves:
+            if merged and merged[-1] // 3 == move // 3:
+                quarter_turns = (merged.pop() % 3 + move % 3 + 2) % 4
+                if quarter_turns:
+                    merged.append(move // 3 * 3 + quarter_turns - 1)
+            else:
+                merged.append(move)
+        return merged
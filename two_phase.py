@@ -0,0 +1,412 @@
+# two_phase.py
+
+"""
+Two-phase (Kociemba) solver for the Rubik's cube - an alternative to the layer by layer method of Solve.
+
+Phase 1 turns the cube into the subgroup G1 = <U, D, R2, L2, F2, B2>, where every corner and edge is oriented and
+the 4 middle layer edges are in the middle layer. Phase 2 solves the cube using only G1 moves. Both phases are
+IDA* searches guided by pruning tables, and phase 1 keeps searching deeper for as long as that shortens the total
+solution, which typically ends at 20-22 face turns.
+
+Coordinates (numbers that describe part of the cube state)
+- twist (0 - 2186) - orientation of the corners
+- flip (0 - 2047) - orientation of the edges
+- slice (0 - 494) - which 4 positions hold the middle layer edges
+- corners (0 - 40319) - permutation of the corners (phase 2)
+- ud_edges (0 - 40319) - permutation of the up and down layer edges (phase 2)
+- slice_perm (0 - 23) - permutation of the middle layer edges (phase 2)
+
+The move and pruning tables are generated once (well under a minute), saved to TABLES_PATH, and memory mapped read only
+when they are loaded - so worker processes share the same pages instead of each building their own copy.
+
+Solutions use the slice command vocabulary of Cube.move() - a half turn is written as two quarter turns (eg. 'r r').
+"""
+
+import array
+import mmap
+import os
+import time
+from math import comb
+
+from cubie import CubieCube
+
+TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables')
+
+# face turns - move m turns face FACES[m // 3] by (m % 3 + 1) quarter turns clockwise
+FACES = 'urfdlb'
+MOVE_NAMES = tuple(face + power for face in FACES for power in ('', '2', "'"))
+PHASE2_MOVES = tuple(MOVE_NAMES.index(name) for name in ('u', 'u2', "u'", 'd', 'd2', "d'", 'r2', 'f2', 'l2', 'b2'))
+
+TWIST_CNT = 2187
+FLIP_CNT = 2048
+SLICE_CNT = 495
+CORNERS_CNT = 40320
+UD_EDGES_CNT = 40320
+SLICE_PERM_CNT = 24
+
+NOT_VISITED = 255
+
+
+##########################################################################
+# coordinates
+
+def get_twist(co):
+    twist = 0
+    for i in range(7):
+        twist = twist * 3 + co[i]
+    return twist
+
+
+def set_twist(twist):
+    co = [0] * 8
+    for i in range(6, -1, -1):
+        co[i] = twist % 3
+        twist //= 3
+    co[7] = -sum(co) % 3
+    return co
+
+
+def get_flip(eo):
+    flip = 0
+    for i in range(11):
+        flip = flip * 2 + eo[i]
+    return flip
+
+
+def set_flip(flip):
+    eo = [0] * 12
+    for i in range(10, -1, -1):
+        eo[i] = flip % 2
+        flip //= 2
+    eo[11] = sum(eo) % 2
+    return eo
+
+
+def get_slice(ep):
+    # combination of the positions holding the middle layer edges (FR, FL, BL, BR are edges 8 - 11)
+    a = 0
+    x = 0
+    for j in range(11, -1, -1):
+        if ep[j] >= 8:
+            a += comb(11 - j, x + 1)
+            x += 1
+    return a
+
+
+def set_slice(a):
+    ep = [-1] * 12
+    x = 4
+    for j in range(12):
+        if x > 0 and a - comb(11 - j, x) >= 0:
+            ep[j] = 12 - x
+            a -= comb(11 - j, x)
+            x -= 1
+    other_edges = iter(range(8))
+    return [edge if edge >= 0 else next(other_edges) for edge in ep]
+
+
+def get_perm(perm):
+    # rank of a permutation of 0 .. n-1 (Lehmer code), the identity is 0
+    rank = 0
+    n = len(perm)
+    for i in range(n):
+        smaller = 0
+        for j in range(i + 1, n):
+            if perm[j] < perm[i]:
+                smaller += 1
+        rank = rank * (n - i) + smaller
+    return rank
+
+
+def set_perm(rank, n):
+    digits = []
+    for radix in range(1, n + 1):
+        digits.append(rank % radix)
+        rank //= radix
+    digits.reverse()
+    elements = list(range(n))
+    return [elements.pop(digit) for digit in digits]
+
+
+##########################################################################
+# tables
+
+def face_move_cubies():
+    # CubieCube of each of the 18 face turns, built from the quarter turns of Cube.move()
+    cubies = []
+    for move in range(len(MOVE_NAMES)):
+        cubies.append(CubieCube().move(' '.join([FACES[move // 3]] * (move % 3 + 1))))
+    return cubies
+
+
+def build_move_table(size, moves, get_coordinate, set_coordinate, apply):
+    # table[coordinate * len(moves) + i] - the coordinate after moves[i]
+    cubies = face_move_cubies()
+    table = array.array('H', [0] * (size * len(moves)))
+    for coordinate in range(size):
+        values = set_coordinate(coordinate)
+        for i, move in enumerate(moves):
+            table[coordinate * len(moves) + i] = get_coordinate(apply(values, cubies[move]))
+    return table
+
+
+def build_pruning_table(size_a, move_table_a, size_b, move_table_b, moves_cnt, start=0):
+    # breadth first search from the solved state - table[a * size_b + b] is the number of moves needed to solve
+    # coordinates a and b together (start - index of the solved state)
+    table = bytearray([NOT_VISITED]) * (size_a * size_b)
+    table[start] = 0
+    frontier = [start]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for index in frontier:
+            a, b = divmod(index, size_b)
+            a *= moves_cnt
+            b *= moves_cnt
+            for m in range(moves_cnt):
+                new_index = move_table_a[a + m] * size_b + move_table_b[b + m]
+                if table[new_index] == NOT_VISITED:
+                    table[new_index] = depth
+                    next_frontier.append(new_index)
+        frontier = next_frontier
+    return table
+
+
+def apply_corner_orientation(co, move):
+    return [(co[move.cp[i]] + move.co[i]) % 3 for i in range(8)]
+
+
+def apply_edge_orientation(eo, move):
+    return [(eo[move.ep[i]] + move.eo[i]) % 2 for i in range(12)]
+
+
+def apply_corner_perm(cp, move):
+    return [cp[move.cp[i]] for i in range(8)]
+
+
+def apply_edge_perm(ep, move):
+    return [ep[move.ep[i]] for i in range(12)]
+
+
+TABLES = (
+    # name, type code, builder
+    ('twist_move', 'H', lambda: build_move_table(
+        TWIST_CNT, range(18), get_twist, set_twist, apply_corner_orientation)),
+    ('flip_move', 'H', lambda: build_move_table(
+        FLIP_CNT, range(18), get_flip, set_flip, apply_edge_orientation)),
+    ('slice_move', 'H', lambda: build_move_table(
+        SLICE_CNT, range(18), get_slice, set_slice, apply_edge_perm)),
+    ('corners_move', 'H', lambda: build_move_table(
+        CORNERS_CNT, PHASE2_MOVES, get_perm, lambda rank: set_perm(rank, 8), apply_corner_perm)),
+    ('ud_edges_move', 'H', lambda: build_move_table(
+        UD_EDGES_CNT, PHASE2_MOVES, lambda ep: get_perm(ep[:8]),
+        lambda rank: set_perm(rank, 8) + [8, 9, 10, 11], apply_edge_perm)),
+    ('slice_perm_move', 'H', lambda: build_move_table(
+        SLICE_PERM_CNT, PHASE2_MOVES, lambda ep: get_perm([edge - 8 for edge in ep[8:]]),
+        lambda rank: list(range(8)) + [edge + 8 for edge in set_perm(rank, 4)], apply_edge_perm)),
+)
+
+PRUNING_TABLES = (
+    # name, (size, move table) of each coordinate, moves
+    ('twist_slice_prun', ('twist_move', TWIST_CNT), ('slice_move', SLICE_CNT), 18),
+    ('flip_slice_prun', ('flip_move', FLIP_CNT), ('slice_move', SLICE_CNT), 18),
+    ('corners_slice_prun', ('corners_move', CORNERS_CNT), ('slice_perm_move', SLICE_PERM_CNT), len(PHASE2_MOVES)),
+    ('ud_edges_slice_prun', ('ud_edges_move', UD_EDGES_CNT), ('slice_perm_move', SLICE_PERM_CNT),
+     len(PHASE2_MOVES)),
+)
+
+
+def table_file(path, name, prefix='two_phase_'):
+    return os.path.join(path, prefix + name + '.bin')
+
+
+def save_table(path, name, table, prefix='two_phase_'):
+    # written to a temporary file and renamed, so a concurrent reader never maps a partial table
+    os.makedirs(path, exist_ok=True)
+    temp_file = table_file(path, name, prefix) + '.' + str(os.getpid())
+    with open(temp_file, 'wb') as fout:
+        fout.write(table.tobytes() if isinstance(table, array.array) else bytes(table))
+    os.replace(temp_file, table_file(path, name, prefix))
+
+
+def map_table(path, name, type_code, prefix='two_phase_'):
+    with open(table_file(path, name, prefix), 'rb') as fin:
+        mapped = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(type_code)
+
+
+def generate_tables(path=TABLES_PATH):
+    # builds every missing table and saves it to path
+    tables = {}
+    for name, type_code, builder in TABLES:
+        if os.path.exists(table_file(path, name)):
+            tables[name] = map_table(path, name, type_code)
+        else:
+            tables[name] = builder()
+            save_table(path, name, tables[name])
+
+    for name, (move_a, size_a), (move_b, size_b), moves_cnt in PRUNING_TABLES:
+        if not os.path.exists(table_file(path, name)):
+            save_table(path, name, build_pruning_table(size_a, tables[move_a], size_b, tables[move_b], moves_cnt))
+
+
+##########################################################################
+class TwoPhaseSolver:
+
+    #   primary methods
+    #   solve() - returns a solution for a cube, as commands for Cube.move()
+
+    def __init__(self, path=TABLES_PATH):
+        generate_tables(path)
+        self.tables = {name: map_table(path, name, type_code) for name, type_code, builder in TABLES}
+        for name, *coordinates in PRUNING_TABLES:
+            self.tables[name] = map_table(path, name, 'B')
+
+        self.move_cubies = face_move_cubies()
+        self.solution = []
+        self.best_solution = None
+        self.time_end = 0.0
+        self.cubie = None
+        self.nodes_cnt = 0
+
+    def table_bytes(self):
+        # memory mapped by the solver (shared between processes)
+        return sum(table.nbytes for table in self.tables.values())
+
+    @staticmethod
+    def skip_move(move, last_move):
+        # no two turns of the same face in a row, and opposite faces only in one order (eg. u d, never d u)
+        if last_move is None:
+            return False
+        face, last_face = move // 3, last_move // 3
+        return face == last_face or face == last_face - 3
+
+    def solve(self, cube, max_length=22, timeout=10.0):
+        # cube - a Cube or CubieCube
+        # returns the shortest solution found within timeout, stopping at the first of max_length face turns or
+        # fewer; None if the cube can not be solved
+        try:
+            cubie = cube if isinstance(cube, CubieCube) else CubieCube.from_state_centered(cube.state)
+        except ValueError:
+            # colors that do not form a cube
+            return None
+        if not cubie.solvable():
+            return None
+
+        self.cubie = cubie
+        self.best_solution = None
+        self.nodes_cnt = 0
+        self.time_end = time.perf_counter() + timeout
+        max_total = 30  # no position needs more than 20 face turns, this is just a bound for the first solution
+
+        twist = get_twist(cubie.co)
+        flip = get_flip(cubie.eo)
+        slice_ = get_slice(cubie.ep)
+        for depth in range(max_total + 1):
+            self.solution = []
+            if self.search_phase1(twist, flip, slice_, depth, max_length):
+                break
+            if time.perf_counter() > self.time_end or \
+                    (self.best_solution is not None and depth >= len(self.best_solution)):
+                break
+
+        if self.best_solution is None:
+            return None
+        return self.get_commands(self.best_solution)
+
+    def phase1_distance(self, twist, flip, slice_):
+        return max(self.tables['twist_slice_prun'][twist * SLICE_CNT + slice_],
+                   self.tables['flip_slice_prun'][flip * SLICE_CNT + slice_])
+
+    def search_phase1(self, twist, flip, slice_, togo, max_length):
+        # returns True once a solution of max_length or fewer face turns is found (or time is up)
+        self.nodes_cnt += 1
+        if togo == 0:
+            if twist == 0 and flip == 0 and slice_ == 0:
+                last_move = self.solution[-1] if self.solution else None
+                # a phase 1 ending in a G1 move would have reached G1 one move earlier
+                if last_move is None or last_move not in PHASE2_MOVES:
+                    return self.start_phase2(max_length)
+            return False
+
+        twist_move = self.tables['twist_move']
+        flip_move = self.tables['flip_move']
+        slice_move = self.tables['slice_move']
+        last_move = self.solution[-1] if self.solution else None
+        for move in range(18):
+            if self.skip_move(move, last_move):
+                continue
+            new_twist = twist_move[twist * 18 + move]
+            new_flip = flip_move[flip * 18 + move]
+            new_slice = slice_move[slice_ * 18 + move]
+            if self.phase1_distance(new_twist, new_flip, new_slice) >= togo:
+                continue
+            self.solution.append(move)
+            found = self.search_phase1(new_twist, new_flip, new_slice, togo - 1, max_length)
+            self.solution.pop()
+            if found or time.perf_counter() > self.time_end:
+                return True
+        return False
+
+    def start_phase2(self, max_length):
+        cp = self.cubie.cp
+        ep = self.cubie.ep
+        for move in self.solution:
+            cp = apply_corner_perm(cp, self.move_cubies[move])
+            ep = apply_edge_perm(ep, self.move_cubies[move])
+        corners = get_perm(cp)
+        ud_edges = get_perm(ep[:8])
+        slice_perm = get_perm([edge - 8 for edge in ep[8:]])
+
+        depth1 = len(self.solution)
+        limit = (len(self.best_solution) if self.best_solution is not None else 31) - 1 - depth1
+        distance = self.phase2_distance(corners, ud_edges, slice_perm)
+        for depth2 in range(distance, limit + 1):
+            phase2 = []
+            if self.search_phase2(corners, ud_edges, slice_perm, depth2, phase2):
+                self.best_solution = self.solution + phase2
+                return len(self.best_solution) <= max_length
+        return False
+
+    def phase2_distance(self, corners, ud_edges, slice_perm):
+        return max(self.tables['corners_slice_prun'][corners * SLICE_PERM_CNT + slice_perm],
+                   self.tables['ud_edges_slice_prun'][ud_edges * SLICE_PERM_CNT + slice_perm])
+
+    def search_phase2(self, corners, ud_edges, slice_perm, togo, phase2):
+        self.nodes_cnt += 1
+        if togo == 0:
+            return corners == 0 and ud_edges == 0 and slice_perm == 0
+
+        corners_move = self.tables['corners_move']
+        ud_edges_move = self.tables['ud_edges_move']
+        slice_perm_move = self.tables['slice_perm_move']
+        moves_cnt = len(PHASE2_MOVES)
+        last_move = phase2[-1] if phase2 else (self.solution[-1] if self.solution else None)
+        for i, move in enumerate(PHASE2_MOVES):
+            if self.skip_move(move, last_move):
+                continue
+            new_corners = corners_move[corners * moves_cnt + i]
+            new_ud_edges = ud_edges_move[ud_edges * moves_cnt + i]
+            new_slice_perm = slice_perm_move[slice_perm * moves_cnt + i]
+            if self.phase2_distance(new_corners, new_ud_edges, new_slice_perm) >= togo:
+                continue
+            phase2.append(move)
+            if self.search_phase2(new_corners, new_ud_edges, new_slice_perm, togo - 1, phase2):
+                return True
+            phase2.pop()
+        return False
+
+    @staticmethod
+    def get_commands(moves):
+        # face turns to Cube.move() commands - u2 is 'u u', u' is 'ui'
+        commands = []
+        for move in moves:
+            face, power = FACES[move // 3], move % 3
+            if power == 0:
+                commands.append(face)
+            elif power == 1:
+                commands += [face, face]
+            else:
+                commands.append(face + 'i')
+        return ' '.join(commands)